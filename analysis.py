@@ -0,0 +1,868 @@
+"""LLM analysis of news entries
+
+Ticker extraction, relevance triage, question generation, answer workers and
+the fused single-call analysis, plus the LLM client, response cache,
+near-duplicate index and metrics they share. The poller (main) and the
+`cli.py enrich` worker both import this module; it doesn't pull in the feed
+fetching, pipeline, storage or email stack.
+"""
+import os
+import json
+import time
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+from feeds import URLS
+from llm_cache import LLMResponseCache, cache_key
+from near_duplicates import NearDuplicateDetector
+from ticker_extractor import LocalTickerExtractor, TickerUniverse
+from metrics import MetricsRegistry, Tracer
+from llm_client import LLMRequestError, RateLimitedLLMClient
+from prompt_builder import PromptBuilder, count_message_tokens, count_tokens
+
+
+load_dotenv()
+
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+
+# Clients, caches and dictionaries are built on first use, so importing this
+# module doesn't pay for the openai import, open the LLM cache file or load
+# the ticker universe
+openai_client = None
+llm_client = None
+llm_cache = None
+near_duplicates = None
+ticker_extractor = None
+_clients_lock = threading.Lock()
+
+
+def get_openai_client():
+    """Shared OpenAI client, created on first use"""
+    global openai_client
+    with _clients_lock:
+        if openai_client is None:
+            from openai import OpenAI
+
+            openai_client = OpenAI(api_key=OPENAI_API_KEY)
+        return openai_client
+
+
+def get_llm_client():
+    """Shared rate-limited LLM client wrapping the OpenAI client, created on first use"""
+    global llm_client
+    with _clients_lock:
+        if llm_client is None:
+            llm_client = RateLimitedLLMClient(
+                get_openai_client,
+                requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+                tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+                max_concurrency=LLM_MAX_CONCURRENT_REQUESTS,
+                max_retries=LLM_MAX_RETRIES,
+                request_timeout=LLM_REQUEST_TIMEOUT_SECONDS,
+            )
+        return llm_client
+
+
+# Variants of the same story from different feeds within the window reuse one analysis.
+# A variant waits at most NEAR_DUPLICATE_WAIT_SECONDS for the story's analysis in
+# flight on another worker before analyzing itself.
+NEAR_DUPLICATE_THRESHOLD = 0.6
+NEAR_DUPLICATE_WINDOW_SECONDS = 6 * 3600
+NEAR_DUPLICATE_WAIT_SECONDS = 120
+
+
+def get_near_duplicates():
+    """Shared NearDuplicateDetector, created on first use"""
+    global near_duplicates
+    with _clients_lock:
+        if near_duplicates is None:
+            near_duplicates = NearDuplicateDetector(
+                threshold=NEAR_DUPLICATE_THRESHOLD,
+                window_seconds=NEAR_DUPLICATE_WINDOW_SECONDS,
+            )
+        return near_duplicates
+
+
+# Concurrent chain of thought: how many entries are analyzed at once, and a
+# global cap on in-flight LLM requests shared by every stage to stay inside
+# provider rate limits
+CHAIN_CONCURRENT = True
+CHAIN_MAX_ENTRIES_IN_FLIGHT = 4
+LLM_MAX_CONCURRENT_REQUESTS = 8
+# Every LLM call goes through one RateLimitedLLMClient paced to the account's
+# requests/tokens per minute; 429s, 5xx and timeouts are retried with backoff
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "500"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "200000"))
+LLM_MAX_RETRIES = 5
+LLM_REQUEST_TIMEOUT_SECONDS = 120
+
+# Model per analysis stage: fast, cheap models read the headline (extraction,
+# relevance triage, question drafting) and o1 is kept for the answer workers
+# that do the actual reasoning. LLM_MODEL_<STAGE> overrides one stage, e.g.
+# LLM_MODEL_ANSWER_WORKER=gpt-4o.
+LLM_STAGE_MODELS = {
+    stage: os.getenv(f"LLM_MODEL_{stage.upper()}", default)
+    for stage, default in {
+        "ticker_extraction": "gpt-4o-mini",
+        "relevance_triage": "gpt-4o-mini",
+        "question_prompter": "gpt-4o",
+        "answer_worker": "o1",
+        "evaluation_judge": "o1",
+        "fused_analysis": "o1",
+    }.items()
+}
+# Analysis mode per source key of URLS (or per feed URL): "chain" runs
+# extraction, triage, questions and one answer worker per question as separate
+# calls; "fused" asks for the whole analysis in one structured call, falling
+# back to the chain when its answer is unusable. ANALYSIS_MODE is the default.
+ANALYSIS_MODE = os.getenv("ANALYSIS_MODE", "chain")
+ANALYSIS_MODES = {"fmp_press_releases": "fused"}
+# Headlines the triage stage finds no tradeable angle in skip the question and
+# answer stages; entries the feed already tagged with tickers are taken as
+# tradeable without asking. RELEVANCE_TRIAGE=0 runs the full chain on everything.
+RELEVANCE_TRIAGE = os.getenv("RELEVANCE_TRIAGE", "1") == "1"
+
+# Content-addressed cache of LLM responses; set LLM_CACHE_BYPASS=1 to always hit the API
+# and LLM_CACHE_PATH="" to keep it in memory only
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite3") or None
+LLM_CACHE_TTL_SECONDS = 7 * 24 * 3600
+LLM_CACHE_BYPASS = os.getenv("LLM_CACHE_BYPASS", "") == "1"
+
+
+def get_llm_cache():
+    """Shared LLMResponseCache, opened on first use"""
+    global llm_cache
+    with _clients_lock:
+        if llm_cache is None:
+            llm_cache = LLMResponseCache(LLM_CACHE_PATH, ttl_seconds=LLM_CACHE_TTL_SECONDS, bypass=LLM_CACHE_BYPASS)
+        return llm_cache
+
+
+# With PIPELINE_TRACING=1 every headline gets a trace of its stage and LLM
+# spans; the poller serves it and the metrics below under /traces and /metrics.
+PIPELINE_TRACING = os.getenv("PIPELINE_TRACING", "") == "1"
+# USD per million (prompt, completion) tokens
+LLM_MODEL_PRICES = {"o1": (15.00, 60.00), "gpt-4o": (2.50, 10.00), "gpt-4o-mini": (0.15, 0.60)}
+
+metrics = MetricsRegistry()
+tracer = Tracer(enabled=PIPELINE_TRACING)
+llm_request_seconds = metrics.histogram("news_llm_request_seconds", "LLM request latency, including rate "
+                                        "limit pacing and retries", ["stage", "model"])
+llm_requests = metrics.counter("news_llm_requests_total", "LLM requests by outcome", ["stage", "model", "outcome"])
+llm_retries = metrics.counter("news_llm_retries_total", "Retries taken by the LLM client", ["stage", "model"])
+llm_tokens = metrics.counter("news_llm_tokens_total", "LLM tokens used", ["stage", "model", "kind"])
+llm_local_tokens = metrics.counter("news_llm_local_tokens_total", "LLM tokens sent and received, counted "
+                                   "with the local tokenizer", ["stage", "kind"])
+llm_cost = metrics.counter("news_llm_cost_usd_total", "Estimated LLM cost from LLM_MODEL_PRICES", ["stage", "model"])
+near_duplicate_waits = metrics.counter("news_near_duplicate_waits_total", "Near-duplicates that waited on their "
+                                       "story's analysis, by outcome (reused, timeout)", ["outcome"])
+triage_verdicts = metrics.counter("news_triage_verdicts_total", "Relevance triage verdicts "
+                                  "(tradeable, not_tradeable, feed_tagged)", ["verdict"])
+headline_llm_seconds = metrics.histogram("news_headline_llm_seconds", "Summed LLM request time per analyzed "
+                                         "headline, by the stage that decided it", ["decided_by"])
+headline_llm_tokens = metrics.histogram("news_headline_llm_tokens", "Prompt + completion tokens per analyzed "
+                                        "headline, counted locally, by the stage that decided it", ["decided_by"],
+                                        buckets=(250, 500, 1000, 2000, 4000, 8000, 16000, 32000))
+headline_llm_cost = metrics.histogram("news_headline_llm_cost_usd", "Estimated LLM cost per analyzed headline, "
+                                      "by the stage that decided it", ["decided_by"],
+                                      buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25))
+
+
+# LLM calls, request seconds and cost of the headline being analyzed; answer
+# workers run in copies of the analyzing context, so they add to the same dict
+_headline_llm_usage = contextvars.ContextVar("headline_llm_usage", default=None)
+_headline_llm_usage_lock = threading.Lock()
+
+
+def add_headline_llm_usage(calls=0, seconds=0.0, cost=0.0, prompt_tokens=0, completion_tokens=0):
+    """Add to the LLM usage of the headline being analyzed, if any"""
+    usage = _headline_llm_usage.get()
+    if usage is None:
+        return
+    with _headline_llm_usage_lock:
+        usage["calls"] += calls
+        usage["seconds"] += seconds
+        usage["cost_usd"] += cost
+        usage["prompt_tokens"] += prompt_tokens
+        usage["completion_tokens"] += completion_tokens
+
+
+def record_llm_usage(stage, model, response, retries_taken=0):
+    """Record token usage, estimated cost and retries of one LLM response"""
+    llm_requests.inc(stage=stage, model=model, outcome="ok")
+    if retries_taken:
+        llm_retries.inc(retries_taken, stage=stage, model=model)
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    prompt_tokens = usage.prompt_tokens or 0
+    completion_tokens = usage.completion_tokens or 0
+    llm_tokens.inc(prompt_tokens, stage=stage, model=model, kind="prompt")
+    llm_tokens.inc(completion_tokens, stage=stage, model=model, kind="completion")
+    prompt_price, completion_price = LLM_MODEL_PRICES.get(model, (0.0, 0.0))
+    cost = (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1e6
+    llm_cost.inc(cost, stage=stage, model=model)
+    add_headline_llm_usage(cost=cost)
+
+
+def create_chat_completion(stage, model, messages, response_format=None):
+    """
+    Call the OpenAI chat completions API through the shared rate-limited LLM client.
+    
+    Responses are served from the LLM cache when the same (model, system prompt,
+    user prompt, response_format) was answered before.
+    
+    Args:
+        stage (str): Analysis stage name, used for cache accounting
+        model (str): Model name
+        messages (list): System and user messages
+        response_format (dict, optional): response_format passed to the API
+    Returns:
+        str: The response message content
+    Raises:
+        LLMRequestError: The request failed after the client's retries
+    """
+    system_prompt = next((m["content"] for m in messages if m["role"] == "system"), "")
+    user_prompt = next((m["content"] for m in messages if m["role"] == "user"), "")
+    key = cache_key(model, system_prompt, user_prompt, response_format)
+    cache = get_llm_cache()
+    cached = cache.get(stage, key)
+    if cached is not None:
+        llm_requests.inc(stage=stage, model=model, outcome="cache_hit")
+        return cached
+
+    with tracer.span(f"llm.{stage}", model=model):
+        start = time.perf_counter()
+        try:
+            response, retries_taken = get_llm_client().create(
+                model=model,
+                messages=messages,
+                response_format=response_format,
+            )
+        except LLMRequestError:
+            llm_requests.inc(stage=stage, model=model, outcome="error")
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            llm_request_seconds.observe(elapsed, stage=stage, model=model)
+            add_headline_llm_usage(calls=1, seconds=elapsed)
+    record_llm_usage(stage, model, response, retries_taken)
+    content = response.choices[0].message.content.strip()
+    prompt_tokens = count_message_tokens(messages, model)
+    completion_tokens = count_tokens(content, model)
+    llm_local_tokens.inc(prompt_tokens, stage=stage, kind="prompt")
+    llm_local_tokens.inc(completion_tokens, stage=stage, kind="completion")
+    add_headline_llm_usage(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+    # Only cache answers the stage can actually parse
+    if response_format and response_format.get("type") == "json_object":
+        try:
+            json.loads(content)
+        except json.JSONDecodeError:
+            return content
+    cache.put(stage, key, content)
+    return content
+
+
+# Local ticker/company extraction (feed tags, $TICKER notation, company-name
+# dictionary) answers the extraction stage when it is confident; the LLM runs
+# when it finds nothing, only ambiguous names ("Target", "Visa") or a company
+# outside the universe
+TICKER_UNIVERSE_PATH = os.getenv("TICKER_UNIVERSE_PATH", "ticker_universe.csv")
+
+
+def get_ticker_extractor():
+    """Shared LocalTickerExtractor over TICKER_UNIVERSE_PATH, built on first use"""
+    global ticker_extractor
+    with _clients_lock:
+        if ticker_extractor is None:
+            ticker_extractor = LocalTickerExtractor(
+                TickerUniverse.load(TICKER_UNIVERSE_PATH) if os.path.exists(TICKER_UNIVERSE_PATH) else None
+            )
+        return ticker_extractor
+
+
+# Prompts put each stage's static instructions first and the headline after
+# them, so provider-side prefix caching applies; summaries (FMP 'text' can run
+# to thousands of words) are compacted and capped at PROMPT_SUMMARY_TOKEN_BUDGET
+PROMPT_SUMMARY_TOKEN_BUDGET = 300
+prompt_builder = PromptBuilder(summary_token_budget=PROMPT_SUMMARY_TOKEN_BUDGET)
+
+STAGE_PROMPTS = {
+    "ticker_extraction": {
+        "system": "You are a financial analyst expert at identifying company names and stock tickers in text. Return only valid tickers.",
+        "instructions": """
+            Identify the stock tickers and company names mentioned in the news article below.
+            Only include directly mentioned companies and tickers, do not infer or speculate.
+
+            Return a JSON object with two keys:
+            1. "tickers_mentioned": list of stock tickers mentioned (actual tickers, not made up ones)
+            2. "companies_mentioned": list of company names mentioned
+        """,
+    },
+    "relevance_triage": {
+        "system": "You are a buy-side triage analyst deciding whether a headline has a tradeable equity angle.",
+        "instructions": """
+            Decide whether the news headline below could plausibly move the price of specific U.S.-listed stocks,
+            sectors or ETFs. Lifestyle, opinion, local politics and foreign sovereign debt stories are usually not
+            tradeable.
+
+            Return a JSON object with two keys:
+            1. "tradeable": true or false
+            2. "reason": one short sentence
+        """,
+    },
+    "question_prompter": {
+        "system": "You are a financial analyst expert at formulating precise questions about market implications.",
+        "instructions": """
+            Generate thought-provoking research questions about the implications of the news headline below. Analysts
+            will answer them with the relevant companies, which are then evaluated as trade or investment candidates.
+
+            Ask about:
+            1. Which tickers related to details in the headline might be relevant
+            2. 3rd or 4th order implications: supply chain and downstream effects
+            3. Sector-wide implications
+            4. Trading opportunities or risks
+
+            Return a JSON object: {"questions": [{"question": "..."}]}
+        """,
+    },
+    "answer_worker": {
+        "system": "You are a financial analyst providing specific market analysis. Only use real stock tickers.",
+        "instructions": """
+            You are an elite quantitative analyst at a top hedge fund. Answer the question at the end about the news
+            headline below with the specific U.S. stocks (by ticker) that answer it, and precise reasoning for why each
+            ticker is relevant. The answer drives immediate trading decisions, so be accurate and clear.
+
+            Rules:
+            1. Cover both obvious first-order effects and less obvious second/third-order impacts
+            2. Consider competitive dynamics and industry structure
+
+            Respond with raw JSON only, no markdown or explanation:
+            {"tickers": [{"symbol": "TICKER", "reasoning": "Brief explanation of why"}]}
+        """,
+    },
+    "evaluation_judge": {
+        "system": "You are a senior financial analyst evaluating market analysis. Be critical and only keep well-justified points.",
+        "instructions": """
+            Review the merged analysis of the financial news article below and remove any speculative or weakly
+            supported points.
+
+            Return a JSON object with:
+            1. "tickers": list of the most relevant tickers (remove any that aren't strongly justified)
+            2. "reason": list of the most important and well-justified reasons
+        """,
+    },
+    "fused_analysis": {
+        "system": "You are a financial analyst producing a complete structured analysis of a news headline in one pass. Only use real stock tickers.",
+        "instructions": """
+            Analyze the financial news headline below end to end. First identify the stock tickers and company names
+            directly mentioned (do not infer or speculate; take any already identified as given). Then, if the headline
+            is tradeable, write three to five research questions about its implications: which tickers tied to its
+            details are relevant, 3rd or 4th order supply chain and downstream effects, sector-wide implications, and
+            trading opportunities or risks. Answer every question with the specific real U.S. stock tickers that answer
+            it and precise reasoning for each, covering both first-order and second/third-order impacts.
+
+            Respond with raw JSON only, with these keys:
+            1. "tickers_mentioned": list of stock tickers mentioned
+            2. "companies_mentioned": list of company names mentioned
+            3. "tradeable": true if the headline could plausibly move specific U.S.-listed stocks, sectors or ETFs
+            4. "reason": one short sentence explaining the tradeable verdict
+            5. "questions": list of {"question": "...", "tickers": [{"symbol": "TICKER", "reasoning": "..."}]},
+               empty when the headline is not tradeable
+        """,
+    },
+}
+
+
+def stage_messages(stage, context, task=""):
+    """Chat messages of an analysis stage: its STAGE_PROMPTS, then context, then task"""
+    prompts = STAGE_PROMPTS[stage]
+    return prompt_builder.messages(prompts["system"], prompts["instructions"], context, task)
+
+
+def analysis_context(title, summary, companies_tickers=None):
+    """Headline context shared by the stages that follow extraction"""
+    context = prompt_builder.headline_context(title, summary)
+    if companies_tickers is not None:
+        context += (f'\nTickers mentioned: {", ".join(companies_tickers.get("tickers_mentioned") or []) or "none"}'
+                    f'\nCompanies mentioned: {", ".join(companies_tickers.get("companies_mentioned") or []) or "none"}')
+    return context
+
+
+def determine_companies_tickers(entry):
+    """
+    Identify tickers and companies directly mentioned in an entry, locally when possible.
+    
+    Args:
+        entry (dict): News entry with 'title', 'summary' and optionally feed-tagged 'tickers'
+    Returns:
+        dict: {"tickers_mentioned": [...], "companies_mentioned": [...]}
+    """
+    local = get_ticker_extractor().extract(entry['title'], entry['summary'], entry.get('tickers'))
+    if local.confident:
+        return local.as_companies_tickers()
+    return determine_direct_ticker_companies_mentioned(entry['title'], entry['summary'])
+
+
+def determine_direct_ticker_companies_mentioned(title, summary):
+    """
+    Analyze text to extract mentioned tickers and companies.
+    """
+    try:
+        content = create_chat_completion(
+            stage="ticker_extraction",
+            model=LLM_STAGE_MODELS["ticker_extraction"],
+            messages=stage_messages("ticker_extraction", prompt_builder.headline_context(title, summary)),
+            response_format={ "type": "json_object" }
+        )
+        return json.loads(content)
+    except json.JSONDecodeError:
+        return {"tickers_mentioned": [], "companies_mentioned": []}
+
+
+def invoke_relevance_triage(entry, companies_tickers):
+    """
+    Decide whether a headline has a tradeable equity angle worth the full question chain.
+
+    Entries the feed tagged with tickers are tradeable without an LLM call.
+    An unusable response counts as tradeable, so triage never loses a headline.
+
+    Args:
+        entry (dict): News entry with 'title', 'summary' and optionally feed-tagged 'tickers'
+        companies_tickers (dict): Output of determine_companies_tickers
+    Returns:
+        dict: {"tradeable": bool, "reason": str}
+    """
+    if entry.get('tickers'):
+        triage_verdicts.inc(verdict="feed_tagged")
+        return {"tradeable": True, "reason": "Tagged with tickers by the feed"}
+
+    try:
+        content = create_chat_completion(
+            stage="relevance_triage",
+            model=LLM_STAGE_MODELS["relevance_triage"],
+            messages=stage_messages("relevance_triage", analysis_context(entry['title'], entry['summary'],
+                                                                         companies_tickers)),
+            response_format={ "type": "json_object" }
+        )
+        triage = json.loads(content)
+        tradeable = triage["tradeable"]
+    except (json.JSONDecodeError, KeyError, TypeError):
+        triage_verdicts.inc(verdict="tradeable")
+        return {"tradeable": True, "reason": "Unusable triage response"}
+    # Models sometimes answer "false" as a string
+    tradeable = tradeable if isinstance(tradeable, bool) else str(tradeable).strip().lower() == "true"
+    triage_verdicts.inc(verdict="tradeable" if tradeable else "not_tradeable")
+    return {"tradeable": tradeable, "reason": str(triage.get("reason", ""))}
+
+
+def analysis_mode(entry):
+    """"chain" or "fused": the analysis mode of an entry's feed, see ANALYSIS_MODES"""
+    source = entry.get('source')
+    if source in ANALYSIS_MODES:
+        return ANALYSIS_MODES[source]
+    source_key = next((key for key, urls in URLS.items() if source in urls), None)
+    return ANALYSIS_MODES.get(source_key, ANALYSIS_MODE)
+
+
+def invoke_fused_analysis(entry, companies_tickers=None):
+    """
+    Extract tickers, triage, and generate and answer research questions in one call.
+
+    Args:
+        entry (dict): News entry with 'title' and 'summary'
+        companies_tickers (dict, optional): Tickers and companies already found locally;
+            the model is told to take them as given
+    Returns:
+        dict: The parsed response with "tickers_mentioned", "companies_mentioned",
+            "tradeable", "reason" and "questions" (each {"question", "tickers"}),
+            or None if the response is unusable
+    """
+    try:
+        content = create_chat_completion(
+            stage="fused_analysis",
+            model=LLM_STAGE_MODELS["fused_analysis"],
+            messages=stage_messages(
+                "fused_analysis",
+                analysis_context(entry['title'], entry['summary'], companies_tickers),
+                "" if RELEVANCE_TRIAGE else 'Treat the headline as tradeable: "tradeable" is true and "reason" empty.',
+            ),
+            response_format={ "type": "json_object" }
+        )
+        analysis = json.loads(content)
+        for qa in analysis["questions"]:
+            if not isinstance(qa["question"], str) or not isinstance(qa.get("tickers", []), list):
+                raise TypeError("malformed question")
+        return analysis
+    except (json.JSONDecodeError, KeyError, TypeError) as e:
+        print(f"Unusable fused analysis response: {e}")
+        return None
+
+
+def invoke_question_prompter(title, summary, companies_tickers):
+    """
+    Generate relevant questions based on the article and identified companies/tickers.
+    """
+    try:
+        content = create_chat_completion(
+            stage="question_prompter",
+            model=LLM_STAGE_MODELS["question_prompter"],
+            messages=stage_messages("question_prompter", analysis_context(title, summary, companies_tickers)),
+            response_format={ "type": "json_object" }
+        )
+        questions = json.loads(content)["questions"]
+    except (json.JSONDecodeError, KeyError, TypeError) as e:
+        print(f"Unusable questions response: {e}")
+        return []
+    if not isinstance(questions, list):
+        print(f"Unusable questions response: {type(questions).__name__} instead of a list")
+        return []
+    # Models return either {"question": "..."} objects or bare strings
+    return [
+        {"question": question["question"] if isinstance(question, dict) else str(question)}
+        for question in questions
+        if not isinstance(question, dict) or question.get("question")
+    ]
+    
+
+def invoke_answer_worker(question, title, summary, companies_tickers):
+    """
+    Answer a specific question about market implications.
+    """
+    question_text = question["question"] if isinstance(question, dict) else str(question)
+    try:
+        content = create_chat_completion(
+            stage="answer_worker",
+            model=LLM_STAGE_MODELS["answer_worker"],
+            # The question goes last, so the answer workers of a headline share their whole prefix
+            messages=stage_messages("answer_worker", analysis_context(title, summary, companies_tickers),
+                                    f"Question: {question_text}"),
+            response_format={ "type": "json_object" }
+        )
+        answer = json.loads(content)
+    except json.JSONDecodeError:
+        return {"tickers": [], "reason": []}
+    if not isinstance(answer, dict):
+        return {"tickers": [], "reason": []}
+    # Keep only well-formed ticker entries, so formatting and routing can index them
+    tickers = answer.get("tickers", [])
+    answer["tickers"] = [
+        {"symbol": str(t["symbol"]), "reasoning": str(t.get("reasoning", ""))}
+        for t in (tickers if isinstance(tickers, list) else [])
+        if isinstance(t, dict) and t.get("symbol")
+    ]
+    return answer
+    
+
+def invoke_evaluation_judge(merged_analysis, title, summary):
+    """
+    Evaluate and refine the merged analysis from answer workers.
+    """
+    try:
+        content = create_chat_completion(
+            stage="evaluation_judge",
+            model=LLM_STAGE_MODELS["evaluation_judge"],
+            messages=stage_messages("evaluation_judge", prompt_builder.headline_context(title, summary),
+                                    f"Merged Analysis:\n{json.dumps(merged_analysis, indent=2)}"),
+            response_format={ "type": "json_object" }
+        )
+        return json.loads(content)
+    except json.JSONDecodeError:
+        return merged_analysis
+
+
+def analyze_entry(entry, answer_executor=None):
+    """
+    Run the GPT analysis of a single news entry, chained or fused per its source.
+    
+    Args:
+        entry (dict): News entry with 'title', 'summary' and 'source'
+        answer_executor (ThreadPoolExecutor, optional): When given, the answer
+            workers for this entry's questions run on it in parallel
+    Returns:
+        dict: The analyzed entry; "decided_by" names the stage that settled it
+            ("relevance_triage" when the chain stopped early, "answer_worker" or
+            "fused_analysis"), "analysis_mode" the mode used and "llm_usage" its
+            LLM calls, request seconds and estimated cost
+    """
+    mode = analysis_mode(entry)
+    usage = {"calls": 0, "seconds": 0.0, "cost_usd": 0.0, "prompt_tokens": 0, "completion_tokens": 0}
+    token = _headline_llm_usage.set(usage)
+    try:
+        analyzed_entry = None
+        if mode == "fused":
+            analyzed_entry = _analyze_entry_fused(entry)
+            if analyzed_entry is None:
+                mode = "chain"
+        if analyzed_entry is None:
+            analyzed_entry = _analyze_entry_chain(entry, answer_executor)
+    finally:
+        _headline_llm_usage.reset(token)
+    analyzed_entry["analysis_mode"] = mode
+    analyzed_entry["llm_usage"] = usage
+    headline_llm_seconds.observe(usage["seconds"], decided_by=analyzed_entry["decided_by"])
+    headline_llm_cost.observe(usage["cost_usd"], decided_by=analyzed_entry["decided_by"])
+    headline_llm_tokens.observe(usage["prompt_tokens"] + usage["completion_tokens"],
+                                decided_by=analyzed_entry["decided_by"])
+    return analyzed_entry
+
+
+def _analyze_entry_chain(entry, answer_executor=None):
+    # Step 1: Identify companies and tickers
+    with tracer.span("analyze.extract"):
+        companies_tickers = determine_companies_tickers(entry)
+
+    # Step 1b: Cheap relevance triage; headlines with no tradeable angle stop here
+    triage = None
+    if RELEVANCE_TRIAGE:
+        with tracer.span("analyze.triage"):
+            triage = invoke_relevance_triage(entry, companies_tickers)
+        if not triage["tradeable"]:
+            return {
+                "title": entry['title'],
+                "summary": entry['summary'],
+                "source": entry['source'],
+                "companies_tickers": companies_tickers,
+                "question_and_answers": [],
+                "questions": [],
+                "triage": triage,
+                "decided_by": "relevance_triage",
+            }
+    
+    # Step 2: Generate questions
+    with tracer.span("analyze.questions"):
+        questions = invoke_question_prompter(
+            entry['title'], 
+            entry['summary'], 
+            companies_tickers
+        )
+    
+    # Step 3: Get answers for each question
+    with tracer.span("analyze.answers", questions=len(questions)):
+        if answer_executor is not None:
+            # Each answer worker runs in a copy of this context so its LLM spans join the headline's trace
+            futures = [
+                answer_executor.submit(contextvars.copy_context().run, invoke_answer_worker,
+                                       question, entry['title'], entry['summary'], companies_tickers)
+                for question in questions
+            ]
+            all_answers = [future.result() for future in futures]
+        else:
+            all_answers = [
+                invoke_answer_worker(question, entry['title'], entry['summary'], companies_tickers)
+                for question in questions
+            ]
+
+    entry["question_and_answers"] = []
+    for question, answer in zip(questions, all_answers):
+        entry["question_and_answers"].append({"question": question["question"], "answer": answer["tickers"]})
+
+    # Combine all analysis into a single result
+    return {
+        "title": entry['title'],
+        "summary": entry['summary'],
+        "source": entry['source'],
+        "companies_tickers": companies_tickers,
+        "question_and_answers": entry["question_and_answers"],
+        "questions": questions,
+        "triage": triage,
+        "decided_by": "answer_worker",
+    }
+
+
+def _analyze_entry_fused(entry):
+    # Local extraction is free; when it is confident the model only adds questions and answers
+    local = get_ticker_extractor().extract(entry['title'], entry['summary'], entry.get('tickers'))
+    known = local.as_companies_tickers() if local.confident else None
+    with tracer.span("analyze.fused"):
+        analysis = invoke_fused_analysis(entry, known)
+    if analysis is None:
+        return None
+
+    companies_tickers = known or {
+        "tickers_mentioned": analysis.get("tickers_mentioned") or [],
+        "companies_mentioned": analysis.get("companies_mentioned") or [],
+    }
+    triage = None
+    if RELEVANCE_TRIAGE:
+        if entry.get('tickers'):
+            triage = {"tradeable": True, "reason": "Tagged with tickers by the feed"}
+            triage_verdicts.inc(verdict="feed_tagged")
+        else:
+            tradeable = analysis.get("tradeable", True)
+            tradeable = tradeable if isinstance(tradeable, bool) else str(tradeable).strip().lower() == "true"
+            triage = {"tradeable": tradeable, "reason": str(analysis.get("reason", ""))}
+            triage_verdicts.inc(verdict="tradeable" if tradeable else "not_tradeable")
+    question_and_answers = [
+        {"question": qa["question"], "answer": qa.get("tickers") or []} for qa in analysis["questions"]
+    ] if triage is None or triage["tradeable"] else []
+    return {
+        "title": entry['title'],
+        "summary": entry['summary'],
+        "source": entry['source'],
+        "companies_tickers": companies_tickers,
+        "question_and_answers": question_and_answers,
+        "questions": [{"question": qa["question"]} for qa in question_and_answers],
+        "triage": triage,
+        "decided_by": "fused_analysis",
+    }
+
+
+def analyze_entry_brief(entry):
+    """
+    Cheap analysis of a stale entry: tickers and companies only, no question chain.
+    
+    Args:
+        entry (dict): News entry with 'title', 'summary' and 'source'
+    Returns:
+        dict: The analyzed entry, marked "analysis_depth": "brief"
+    """
+    with tracer.span("analyze.extract"):
+        companies_tickers = determine_companies_tickers(entry)
+    return {
+        "title": entry['title'],
+        "summary": entry['summary'],
+        "source": entry['source'],
+        "companies_tickers": companies_tickers,
+        "question_and_answers": [],
+        "questions": [],
+        "analysis_depth": "brief",
+    }
+
+
+def invoke_chain_of_thought(entries, concurrent=None, max_entries_in_flight=None, analyze_fn=None):
+    """
+    Process news entries using a chain of GPT analyses.
+    
+    In concurrent mode up to max_entries_in_flight entries are analyzed at
+    once and each entry's answer workers fan out in parallel. Every LLM call
+    still goes through the shared rate-limited LLM client.
+    
+    Args:
+        entries (list): List of dictionaries containing news entries
+        concurrent (bool, optional): Override CHAIN_CONCURRENT
+        max_entries_in_flight (int, optional): Override CHAIN_MAX_ENTRIES_IN_FLIGHT
+        analyze_fn (callable, optional): Per-entry analysis, analyze_entry by default
+    Returns:
+        list: List of analyzed entries with their evaluations, in input order
+    """
+    concurrent = CHAIN_CONCURRENT if concurrent is None else concurrent
+    max_entries_in_flight = max_entries_in_flight or CHAIN_MAX_ENTRIES_IN_FLIGHT
+    analyze_fn = analyze_fn or analyze_entry
+
+    if not concurrent:
+        analyzed_entries = []
+        for entry in entries:
+            try:
+                analyzed_entries.append(analyze_fn(entry))
+            except Exception as e:
+                print(f"Error analyzing entry {entry['title']}: {str(e)}")
+        return analyzed_entries
+
+    # Separate pools so entry workers never block waiting on their own answer workers
+    with ThreadPoolExecutor(max_workers=max_entries_in_flight, thread_name_prefix="chain-entry") as entry_executor, \
+            ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENT_REQUESTS, thread_name_prefix="chain-answer") as answer_executor:
+        futures = [entry_executor.submit(analyze_fn, entry, answer_executor) for entry in entries]
+
+        analyzed_entries = []
+        for entry, future in zip(entries, futures):
+            try:
+                analyzed_entries.append(future.result())
+            except Exception as e:
+                print(f"Error analyzing entry {entry['title']}: {str(e)}")
+    
+    return analyzed_entries
+
+
+def reuse_story_analysis(entry, cluster):
+    """
+    Build an analyzed entry for a near-duplicate from its story cluster's analysis.
+    
+    Args:
+        entry (dict): The near-duplicate news entry
+        cluster (StoryCluster): Cluster whose representative was already analyzed
+    Returns:
+        dict: Analyzed entry carrying this entry's own title, summary and source
+    """
+    # Storage fields (Mongo _id, id, stored_at) belong to the representative's own document
+    analysis = {k: v for k, v in cluster.analysis.items() if k not in ("_id", "id", "stored_at")}
+    return {
+        **analysis,
+        "title": entry['title'],
+        "summary": entry['summary'],
+        "source": entry['source'],
+        "story_cluster_id": cluster.cluster_id,
+        "near_duplicate_of": cluster.analysis["title"],
+    }
+
+
+def analyze_story_entry(entry, answer_executor=None, brief=False):
+    """
+    Analyze an entry once per story, reusing the analysis for near-duplicates.
+    
+    The entry is attached to its near-duplicate cluster. The first entry of
+    a story runs the LLM chain; entries of a story whose analysis is done
+    (or in flight on another worker) get a copy of it tagged with
+    "near_duplicate_of" instead. An entry that waits longer than
+    NEAR_DUPLICATE_WAIT_SECONDS for the analysis in flight is analyzed on its own.
+    
+    Args:
+        entry (dict): News entry with 'title', 'summary' and 'source'
+        answer_executor (ThreadPoolExecutor, optional): Passed through to analyze_entry
+        brief (bool): Reuse the story's analysis if it is done, else run analyze_entry_brief
+            without claiming the story, so a later full analysis can still be shared
+    Returns:
+        dict: The analyzed entry
+    """
+    detector = get_near_duplicates()
+    cluster, _ = detector.assign(entry['title'], entry['summary'], entry['source'])
+    if brief:
+        if cluster.analysis is not None:
+            return reuse_story_analysis(entry, cluster)
+        analyzed_entry = analyze_entry_brief(entry)
+        analyzed_entry["story_cluster_id"] = cluster.cluster_id
+        return analyzed_entry
+    deadline = time.monotonic() + NEAR_DUPLICATE_WAIT_SECONDS
+    while not detector.claim(cluster):
+        if not cluster.ready.wait(max(0.0, deadline - time.monotonic())):
+            # The claimant is stuck; analyze this entry alone rather than hold the enrich worker
+            near_duplicate_waits.inc(outcome="timeout")
+            analyzed_entry = analyze_entry(entry, answer_executor)
+            analyzed_entry["story_cluster_id"] = cluster.cluster_id
+            return analyzed_entry
+        if cluster.analysis is not None:
+            near_duplicate_waits.inc(outcome="reused")
+            return reuse_story_analysis(entry, cluster)
+        # The claimant failed; try to analyze the story ourselves
+
+    analyzed_entry = None
+    try:
+        analyzed_entry = analyze_entry(entry, answer_executor)
+        analyzed_entry["story_cluster_id"] = cluster.cluster_id
+        return analyzed_entry
+    finally:
+        detector.resolve(cluster, analyzed_entry)
+
+
+def invoke_chain_of_thought_with_story_clusters(entries):
+    """
+    Process news entries like invoke_chain_of_thought, analyzing each story only once.
+    
+    Args:
+        entries (list): List of dictionaries containing news entries
+    Returns:
+        list: List of analyzed entries, representatives and near-duplicates alike
+    """
+    analyzed_entries = invoke_chain_of_thought(entries, analyze_fn=analyze_story_entry)
+    reused = sum(1 for a in analyzed_entries if a.get("near_duplicate_of"))
+    if reused:
+        print(f"Reused story analysis for {reused} near-duplicate entries")
+    return analyzed_entries
+
+test_entries = [
+    {'title': 'Vanguard\'s Record Fee CutPuts Rivals BlackRock, Invesco in Tough Spot', 'title_detail': {'type': 'text/plain', 'language': None, 'base': 'https://feeds.bloomberg.com/markets/news.rss', 'value': 'Vanguard\'s Record Fee CutPuts Rivals BlackRock, Invesco in Tough Spot'}, 'summary': 'Vanguard Group Inc.\'s biggest salvo yet in its campaign to cut fees for the investing masses presents industry rivals with a painful choice. Follow suit and lose potentially hundreds of millions in revenue &mdash; or hold the line and risk losing badly needed market share.', 'summary_detail': {'type': 'text/html', 'language': None, 'base': 'https://feeds.bloomberg.com/markets/news.rss', 'value': 'Vanguard Group Inc.\'s biggest salvo yet in its campaign to cut fees for the investing masses presents industry rivals with a painful choice. Follow suit and lose potentially hundreds of millions in revenue &mdash; or hold the line and risk losing badly needed market share.'}, 'links': [{'rel': 'alternate', 'type': 'text/html', 'href': 'https://www.bloomberg.com/news/articles/2025-02-05/vanguard-s-record-fee-cuts-tighten-screws-on-blackrock-invesco'}], 'link': 'https://www.bloomberg.com/news/articles/2025-02-05/vanguard-s-record-fee-cuts-tighten-screws-on-blackrock-invesco', 'id': 'https://www.bloomberg.com/news/articles/2025-02-05/vanguard-s-record-fee-cuts-tighten-screws-on-blackrock-invesco', 'guidislink': False, 'authors': [{'name': 'Katie Greifeld, Vildana Hajric'}], 'author': 'Katie Greifeld, Vildana Hajric', 'author_detail': {'name': 'Katie Greifeld, Vildana Hajric'}, 'published': 'Wed, 05 Feb 2025 14:46:46 GMT', 'tags': [{'term': 'NYS:IVZ', 'scheme': 'stock-symbol', 'label': None}, {'term': 'NYS:BLK', 'scheme': 'stock-symbol', 'label': None}], 'media_content': [{'url': 'https://assets.bwbx.io/images/users/iqjWHBFdfxIU/igTb3jvPuPtw/v1/1200x-1.jpg', 'type': 'image/jpeg'}], 'media_thumbnail': [{'url': 'https://assets.bwbx.io/images/users/iqjWHBFdfxIU/igTb3jvPuPtw/v1/1200x-1.jpg'}], 'href': '', 'content': [{'type': 'text/plain', 'language': None, 'base': 'https://feeds.bloomberg.com/markets/news.rss', 'value': 'A history of consistent cost cutting has created a sense of goodwill and loyalty among Vanguard\'s client base.'}]},
+{'title': 'Poland Re-enters Regional FX Debt Rush With Dollar Bond Offer', 'title_detail': {'type': 'text/plain', 'language': None, 'base': 'https://feeds.bloomberg.com/markets/news.rss', 'value': 'Poland Re-enters Regional FX Debt Rush With Dollar Bond Offer'}, 'summary': 'Poland is returning to international markets for a second time in as many months, selling dollar-denominated bonds as part of efforts to cover record financing needs.', 'summary_detail': {'type': 'text/html', 'language': None, 'base': 'https://feeds.bloomberg.com/markets/news.rss', 'value': 'Poland is returning to international markets for a second time in as many months, selling dollar-denominated bonds as part of efforts to cover record financing needs.'}, 'links': [{'rel': 'alternate', 'type': 'text/html', 'href': 'https://www.bloomberg.com/news/articles/2025-02-05/poland-re-enters-regional-fx-debt-rush-with-dollar-bond-offer'}], 'link': 'https://www.bloomberg.com/news/articles/2025-02-05/poland-re-enters-regional-fx-debt-rush-with-dollar-bond-offer', 'id': 'https://www.bloomberg.com/news/articles/2025-02-05/poland-re-enters-regional-fx-debt-rush-with-dollar-bond-offer', 'guidislink': False, 'authors': [{'name': 'Agnieszka Barteczko, Kevin Kingsbury'}], 'author': 'Agnieszka Barteczko, Kevin Kingsbury', 'author_detail': {'name': 'Agnieszka Barteczko, Kevin Kingsbury'}, 'published': 'Wed, 05 Feb 2025 14:43:45 GMT', 'media_content': [{'url': 'https://assets.bwbx.io/images/users/iqjWHBFdfxIU/iq7Jau_xHBVg/v0/1200x-1.jpg', 'type': 'image/jpeg'}], 'media_thumbnail': [{'url': 'https://assets.bwbx.io/images/users/iqjWHBFdfxIU/iq7Jau_xHBVg/v0/1200x-1.jpg'}], 'href': '', 'content': [{'type': 'text/plain', 'language': None, 'base': 'https://feeds.bloomberg.com/markets/news.rss', 'value': 'The Ministry of Finance, Warsaw. Source: picture alliance/Getty Images'}]},
+]
@@ -1,134 +1,63 @@
 import streamlit as st
-import time
 import os
 from mongo_adapter import MongoAdapter
+from live_headlines import HeadlineTail
+from query_cache import QueryResultCache, query_key
 from datetime import datetime
-import pandas as pd
 import json
 from bson import ObjectId
 import math
-import networkx as nx
-import matplotlib.pyplot as plt
-import io
-from PIL import Image
+import streamlit.components.v1 as components
+from visualization import VisualizationCache, VisualizationRenderer, analysis_graph_html
 
 
-def save_and_display_visualization(analysis, container):
+# Rendered graphs are cached per document and content; set VIZ_CACHE_DIR to keep them across restarts
+VIZ_CACHE_DIR = os.getenv("VIZ_CACHE_DIR") or None
+VIZ_RENDER_WORKERS = 2
+
+
+@st.cache_resource
+def get_visualization_renderer():
+    """Process-wide renderer shared by every session"""
+    return VisualizationRenderer(VisualizationCache(directory=VIZ_CACHE_DIR), max_workers=VIZ_RENDER_WORKERS)
+
+
+def save_and_display_visualization(analysis, container, doc_id=None, interactive=True):
     """
-    Create and save a networkx visualization, then display it in the given container.
+    Display a graph of the analysis in the given container.
+    
+    Interactive graphs are drawn in the browser from JSON, with no server-side
+    rendering. Otherwise the image is rendered once on the shared worker pool
+    and cached by document id and content hash; while it renders the container
+    shows a placeholder and the script carries on instead of waiting.
     
     Args:
         analysis (dict): Dictionary containing analysis results
         container: Streamlit container to display the visualization
-    """
-    # Create a directed graph
-    G = nx.DiGraph()
-    
-    # Create a root node with title and subject (orange)
-    title = str(analysis.get('title', ''))
-    companies = analysis.get('companies_tickers', {}).get('companies_mentioned', [])
-    companies_str = ', '.join(companies) if companies else 'No companies mentioned'
-    root_text = f"{title}\n{companies_str}"
-    G.add_node(root_text, pos=(0, 0), color='orange')  # Root at left middle
-    
-    # Get questions and answers
-    qa_pairs = analysis.get('question_and_answers', [])
-    
-    # Calculate layout positions
-    num_questions = len(qa_pairs)
-    vertical_spacing = 4.0  # Increased vertical spacing between question nodes
-    
-    # Add question nodes (blue) and their answer nodes (light purple)
-    for i, qa in enumerate(qa_pairs):
-        # Calculate y position to center questions vertically
-        y_pos = ((num_questions - 1) / 2 - i) * vertical_spacing
-        
-        # Add question node (blue)
-        question = str(qa.get('question', {}))
-        # Keep the full question text intact for the blue node
-        G.add_node(question, pos=(2, y_pos), color='lightblue')
-        G.add_edge(root_text, question)
-        
-        # Add answer nodes (light purple) for this question
-        answers = qa.get('answer', [])
-        num_answers = len(answers)
-        for j, answer in enumerate(answers):
-            # Calculate position for answer nodes with more spacing
-            answer_y = y_pos + (j - (num_answers - 1) / 2) * (vertical_spacing / 3)
-            
-            # Create answer node text with ticker and reasoning
-            ticker = str(answer.get('symbol', ''))
-            reasoning = str(answer.get('reasoning', ''))
-            answer_text = f"{ticker}\n{reasoning}"
-            
-            G.add_node(answer_text, pos=(4, answer_y), color='plum')
-            G.add_edge(question, answer_text)
-    
-    # Get node positions and colors
-    pos = nx.get_node_attributes(G, 'pos')
-    colors = [G.nodes[node]['color'] for node in G.nodes()]
-    
-    # Create new figure with larger size for better readability
-    plt.figure(figsize=(20, 15))
-    
-    # Draw the graph with adjusted parameters for better readability
-    nx.draw(G, pos,
-            node_color=colors,
-            node_size=8000,  # Increased node size
-            font_size=7,     # Slightly smaller font to fit more text
-            font_weight='bold',
-            arrows=True,
-            edge_color='gray',
-            width=2,
-            arrowsize=20,
-            with_labels=True,
-            bbox=dict(facecolor='white', edgecolor='none', alpha=0.7))  # Add white background to text
+        doc_id (str, optional): Document id used as the cache key
+        interactive (bool): Draw client-side instead of rendering an image
     
-    # Adjust layout to prevent text cutoff
-    plt.margins(0.2)
-    
-    # Save the plot to a bytes buffer
-    buf = io.BytesIO()
-    plt.savefig(buf, format='jpg', bbox_inches='tight', dpi=300)
-    buf.seek(0)
-    plt.close()
-    
-    # Display the image in the container
-    image = Image.open(buf)
-    container.image(image, use_column_width=True)
-    
-    # Get node positions and colors
-    pos = nx.get_node_attributes(G, 'pos')
-    colors = [G.nodes[node]['color'] for node in G.nodes()]
-    
-    # Create new figure with larger size
-    plt.figure(figsize=(15, 10))
-    
-    # Draw the graph
-    nx.draw(G, pos,
-            with_labels=True,
-            node_color=colors,
-            node_size=4000,
-            font_size=8,
-            font_weight='bold',
-            arrows=True,
-            edge_color='gray',
-            width=2,
-            arrowsize=20)
-    
-    # Adjust layout
-    plt.title(f"Analysis Visualization: {analysis['title'][:50]}...")
-    plt.tight_layout()
-    
-    # Save the plot to a bytes buffer
-    buf = io.BytesIO()
-    plt.savefig(buf, format='jpg', bbox_inches='tight')
-    buf.seek(0)
-    plt.close()
-    
-    # Display the image in the container
-    image = Image.open(buf)
-    container.image(image, use_column_width=True)
+    Returns:
+        The render future while the image isn't ready yet, otherwise None
+    """
+    if interactive:
+        with container:
+            components.html(analysis_graph_html(analysis), height=620, scrolling=True)
+        return None
+
+    future = get_visualization_renderer().submit(doc_id or analysis.get('id', ''), analysis)
+    if not future.done():
+        container.info("⏳ Rendering visualization...")
+        return future
+    container.image(future.result(), use_column_width=True)
+    return None
+
+
+def poll_pending_visualizations():
+    """Rerun the page once a visualization left as a placeholder has finished rendering"""
+    pending = st.session_state.get('viz_pending', {})
+    if any(future.done() for future in pending.values()):
+        _rerun()
 
 # Custom JSON encoder to handle ObjectId
 class MongoJSONEncoder(json.JSONEncoder):
@@ -137,7 +66,21 @@ class MongoJSONEncoder(json.JSONEncoder):
             return str(obj)
         return super().default(obj)
 
-# Initialize MongoDB connection
+# New headlines are followed by one process-wide HeadlineTail (a change stream,
+# or a stored_at poll on standalone servers) and each session's live section
+# re-renders every LIVE_REFRESH_SECONDS with only the headlines it hasn't shown
+LIVE_REFRESH_SECONDS = 10
+LIVE_POLL_SECONDS = 5
+LIVE_MAX_ITEMS = 50
+# st.fragment (st.experimental_fragment before 1.37) reruns part of the page on a timer
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+_rerun = getattr(st, "rerun", None) or st.experimental_rerun
+# How often a page with visualizations still rendering checks whether they're done
+VIZ_POLL_SECONDS = 1
+
+# Initialize MongoDB connection. The dashboard only reads: the news-headlines
+# indexes (and the legacy id backfill they depend on) are managed by the
+# pipeline on startup and by `cli.py ensure-indexes`
 @st.cache_resource
 def init_mongo():
     mongo_adapter = MongoAdapter(
@@ -146,23 +89,107 @@ def init_mongo():
     )
     return mongo_adapter
 
+# Fields rendered by display_json_structure; everything else stays on the server
+HEADLINE_PROJECTION = {
+    "title": 1,
+    "summary": 1,
+    "source": 1,
+    "companies_tickers": 1,
+    "question_and_answers": 1,
+    "questions": 1,
+    "id": 1,
+    "stored_at": 1,
+}
+
+# Page reads (documents plus total count) are shared across sessions until a
+# headline is stored or deleted; QUERY_CACHE_MAX_AGE bounds in-place updates
+QUERY_CACHE_MAX_BYTES = 64 * 1024 * 1024
+QUERY_CACHE_MAX_AGE = 300
+
+@st.cache_resource
+def get_query_cache():
+    """Process-wide query result cache shared by every session"""
+    return QueryResultCache(max_bytes=QUERY_CACHE_MAX_BYTES, max_age_seconds=QUERY_CACHE_MAX_AGE)
+
+
+@st.cache_resource
+def get_headline_tail():
+    """Process-wide tail of new headlines shared by every session"""
+    return HeadlineTail(init_mongo(), "news-headlines", projection=HEADLINE_PROJECTION,
+                        poll_interval=LIVE_POLL_SECONDS).start()
+
+
+def reset_live_headlines():
+    """Start the session's live section over: the page about to be fetched shows everything up to now"""
+    st.session_state.live_sequence = get_headline_tail().latest_sequence
+    st.session_state.live_headlines = []
+    st.session_state.live_shown_ids = set()
+
+
+def display_live_headlines():
+    """Prepend the headlines stored since this session last looked; never blocks the script"""
+    new, sequence = get_headline_tail().since(st.session_state.get('live_sequence', 0))
+    st.session_state.live_sequence = sequence
+    shown = st.session_state.setdefault('live_shown_ids', set())
+    new = [headline for headline in new if str(headline['_id']) not in shown]
+    shown.update(str(headline['_id']) for headline in new)
+    live = (new + st.session_state.get('live_headlines', []))[:LIVE_MAX_ITEMS]
+    st.session_state.live_headlines = live
+
+    if live:
+        st.caption(f"🟢 {len(live)} new since this page loaded · checked "
+                   f"{datetime.now().strftime('%H:%M:%S')} ({get_headline_tail().mode})")
+        for headline in live:
+            display_json_structure(headline, key_prefix="live_")
+
+
+if _fragment is not None:
+    display_live_headlines = _fragment(run_every=LIVE_REFRESH_SECONDS)(display_live_headlines)
+    poll_pending_visualizations = _fragment(run_every=VIZ_POLL_SECONDS)(poll_pending_visualizations)
+
+
 # Function to fetch headlines with pagination
-def fetch_headlines(mongo_adapter, query=None, page=1, per_page=25):
-    # Calculate skip value
-    skip = (page - 1) * per_page
+def fetch_headlines(mongo_adapter, query=None, page=1, per_page=25, anchors=None, cache=None):
+    """Fetch one page of headlines, newest first, plus the total match count
     
-    # First get the total count
-    cursor = mongo_adapter.read_from_collection("news-headlines", **(query if query else {}))
-    total_count = len(list(cursor))
+    anchors maps a page number to the keyset cursor it starts after. Pages
+    reached with Previous/Next always have one, so they seek straight through
+    the stored_at index; only jumps to an unvisited page fall back to skip.
+    The cursor for the following page is recorded in anchors.
     
-    # Then fetch the paginated results
-    cursor = mongo_adapter.read_from_collection("news-headlines", **(query if query else {}))
-    paginated_results = list(cursor)[skip:skip + per_page]
+    With a QueryResultCache the read is keyed on the normalized query, page
+    and projection and reused while the collection watermark is unchanged.
+    """
+    anchors = anchors if anchors is not None else {}
+
+    def read():
+        total_count = mongo_adapter.count_documents("news-headlines", query)
+        if page == 1 or page in anchors:
+            headlines, next_cursor = mongo_adapter.paginate(
+                "news-headlines", query, page_size=per_page, after=anchors.get(page),
+                projection=HEADLINE_PROJECTION
+            )
+        else:
+            headlines, next_cursor = mongo_adapter.paginate(
+                "news-headlines", query, page_size=per_page, skip=(page - 1) * per_page,
+                projection=HEADLINE_PROJECTION
+            )
+        return headlines, total_count, next_cursor
+
+    if cache is None:
+        headlines, total_count, next_cursor = read()
+    else:
+        key = query_key(query, page, per_page, HEADLINE_PROJECTION, anchors.get(page))
+        headlines, total_count, next_cursor = cache.get_or_compute(
+            key, mongo_adapter.collection_watermark("news-headlines"), read
+        )
+    if next_cursor is not None:
+        anchors[page + 1] = next_cursor
     
-    return paginated_results, total_count
+    return headlines, total_count
 
 # Function to display JSON-like structure
-def display_json_structure(headline):
+def display_json_structure(headline, key_prefix=""):
     # Create expandable container for each headline
     with st.expander(f"📰 {headline.get('title', 'No Title')}", expanded=True):
         # Format the headline data
@@ -191,25 +218,77 @@ def display_json_structure(headline):
         
         # Place each button in its own column
         with cols[0]:
-            if st.button("✏️", key=f"edit_{str(headline.get('_id'))}", help="Edit"):
+            if st.button("✏️", key=f"{key_prefix}edit_{str(headline.get('_id'))}", help="Edit"):
                 pass
         with cols[1]:
-            if st.button("📋", key=f"copy_{str(headline.get('_id'))}", help="Copy"):
+            if st.button("📋", key=f"{key_prefix}copy_{str(headline.get('_id'))}", help="Copy"):
                 pass
         with cols[2]:
-            if st.button("💬", key=f"comment_{str(headline.get('_id'))}", help="Comment"):
+            if st.button("💬", key=f"{key_prefix}comment_{str(headline.get('_id'))}", help="Comment"):
                 pass
         with cols[3]:
-            if st.button("🗑️", key=f"delete_{str(headline.get('_id'))}", help="Delete"):
+            if st.button("🗑️", key=f"{key_prefix}delete_{str(headline.get('_id'))}", help="Delete"):
                 pass
         with cols[4]:
-            if st.button("📊", key=f"viz_{str(headline.get('_id'))}", help="Visualize"):
+            # A visualization still rendering on the last run is shown again until it's ready
+            viz_key = f"{key_prefix}viz_{str(headline.get('_id'))}"
+            if st.button("📊", key=viz_key, help="Visualize") or viz_key in st.session_state.get('viz_rendering', {}):
                 # Create visualization below the JSON and buttons
                 viz_container = st.container()
-                save_and_display_visualization(json_data, viz_container)
+                future = save_and_display_visualization(
+                    json_data, viz_container, doc_id=str(headline.get('_id')),
+                    interactive=st.session_state.get('viz_mode', 'Interactive') == 'Interactive',
+                )
+                if future is not None:
+                    st.session_state.setdefault('viz_pending', {})[viz_key] = future
         
        
 
+def display_query_cache_stats(cache):
+    """Sidebar summary of how much the shared query cache is saving"""
+    lookups = cache.stats["hits"] + cache.stats["misses"]
+    st.sidebar.metric("Query cache hit ratio", f"{cache.hit_ratio:.0%}",
+                      help=f"{cache.stats['hits']} of {lookups} page reads served from the cache, "
+                           f"across all sessions")
+    st.sidebar.caption(f"Saved {cache.stats['saved_seconds'] * 1000:,.0f} ms of query time · "
+                       f"{cache.size_bytes / 1024 / 1024:.1f} MB cached · "
+                       f"{cache.stats['stale']} invalidated · {cache.stats['evictions']} evicted")
+
+
+def display_query_plan(mongo_adapter, query, cache=None):
+    """Show the explain plan summary for a dashboard query
+    
+    Explaining with executionStats runs the query again, so with a
+    QueryResultCache the plan is kept alongside the page reads and only
+    re-explained once the collection watermark moves.
+    """
+    def explain():
+        return mongo_adapter.explain_query(
+            "news-headlines", query, sort=[("stored_at", -1), ("_id", -1)], limit=25
+        )
+
+    try:
+        if cache is None:
+            plan = explain()
+        else:
+            plan = cache.get_or_compute(
+                "explain:" + query_key(query, 1, 25), mongo_adapter.collection_watermark("news-headlines"), explain
+            )
+    except Exception as e:
+        st.warning(f"Could not explain query: {e}")
+        return
+
+    indexes = ", ".join(plan["indexes_used"]) or "none"
+    summary = (f"Index used: {indexes} · docs examined {plan['docs_examined']} · "
+               f"keys examined {plan['keys_examined']} · returned {plan['returned']} · "
+               f"{plan['execution_time_ms']} ms")
+    with st.expander("🔍 Query plan", expanded=plan["collection_scan"]):
+        if plan["collection_scan"]:
+            st.warning(f"Collection scan: this query is not served by an index. {summary}")
+        else:
+            st.info(summary)
+        st.code(" → ".join(plan["stages"]))
+
 # Query examples
 QUERY_EXAMPLES = '''// Case-insensitive search for "Vanguard" in title
 {"title": {"$regex": "Vanguard", "$options": "i"}}
@@ -220,6 +299,9 @@ QUERY_EXAMPLES = '''// Case-insensitive search for "Vanguard" in title
 // Find articles with specific tickers
 {"companies_tickers.tickers_mentioned": {"$in": ["AAPL", "GOOGL"]}}
 
+// Full-text search on title and summary (uses the text index, unlike $regex)
+{"$text": {"$search": "Vanguard"}}
+
 // Complex query with multiple conditions
 {
     "$and": [
@@ -231,11 +313,14 @@ QUERY_EXAMPLES = '''// Case-insensitive search for "Vanguard" in title
 def main():
     # Main app
     st.title('📰 Financial News Headlines')
-    st.write('Auto-refreshing news headlines from various financial sources')
+    st.write('Live-updating news headlines from various financial sources')
 
     # Initialize MongoDB connection
     mongo = init_mongo()
 
+    st.sidebar.radio("Visualization", ["Interactive", "Image"], key="viz_mode",
+                     help="Interactive graphs are drawn in the browser; images are rendered on the server")
+
     # Initialize session state for pagination if not exists
     if 'page' not in st.session_state:
         st.session_state.page = 1
@@ -267,12 +352,33 @@ def main():
     if search_button:
         st.session_state.page = 1
 
+    # Keyset cursors are only valid for the query they were recorded under
+    query_signature = json.dumps(query_dict, sort_keys=True)
+    if st.session_state.get('anchors_query') != query_signature:
+        st.session_state.anchors_query = query_signature
+        st.session_state.page_anchors = {}
+
     # Add a placeholder for the data
     data_placeholder = st.empty()
 
+    # Live updates follow the unfiltered newest-first view only
+    live = st.session_state.page == 1 and not query_dict
+    if live:
+        # Headlines stored from here on belong to the live section, not this page
+        reset_live_headlines()
+
+    # Visualizations still rendering on the last run; those not ready by the end of this one stay pending
+    st.session_state.viz_rendering = st.session_state.pop('viz_pending', {})
+
     # Fetch headlines with pagination
-    headlines, total_count = fetch_headlines(mongo, query_dict, st.session_state.page)
+    query_cache = get_query_cache()
+    headlines, total_count = fetch_headlines(
+        mongo, query_dict, st.session_state.page, anchors=st.session_state.page_anchors, cache=query_cache
+    )
+    display_query_cache_stats(query_cache)
     total_pages = math.ceil(total_count / 25)
+    if live:
+        st.session_state.live_shown_ids.update(str(headline['_id']) for headline in headlines)
 
     with data_placeholder.container():
         # Display last update time and pagination info
@@ -282,12 +388,29 @@ def main():
         with col2:
             st.write(f"Page {st.session_state.page} of {total_pages} (Total items: {total_count})")
         
+        # Show how the server executed the user's query so slow searches are visible
+        if query_dict:
+            display_query_plan(mongo, query_dict, cache=query_cache)
+
+        if live:
+            if _fragment is not None:
+                display_live_headlines()
+            else:
+                # Without fragments a rerun is the only way to update; it reloads just this page
+                st.button("🔄 Check for new headlines", key="live_refresh")
+
         # Display headlines in JSON format
         if headlines:
             for headline in headlines:
                 display_json_structure(headline)
         else:
             st.warning("No headlines found")
+
+        if st.session_state.get('viz_pending'):
+            if _fragment is not None:
+                poll_pending_visualizations()
+            else:
+                st.button("🔄 Show rendered visualizations", key="viz_refresh")
         
         # Pagination controls
         if total_pages > 1:
@@ -317,8 +440,5 @@ def main():
                         st.session_state.page += 1
                         st.experimental_rerun()
 
-        # Wait for 2 minutes before refreshing
-        time.sleep(120)
-
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,54 @@
+"""Wall-clock benchmark of invoke_chain_of_thought, serial vs concurrent
+
+Runs both modes against MockOpenAIServer with injected latency:
+
+    python benchmarks/bench_chain_of_thought.py --entries 8 --latency 0.5
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Measure raw LLM latency, not cache hits
+os.environ["LLM_CACHE_PATH"] = ""
+os.environ["LLM_CACHE_BYPASS"] = "1"
+
+from openai import OpenAI
+
+import analysis
+from benchmarks.mock_openai_server import MockOpenAIServer
+
+
+def make_entries(count):
+    return [
+        {"title": f"Benchmark headline {i}", "summary": f"Benchmark summary {i}", "source": "benchmark"}
+        for i in range(count)
+    ]
+
+
+def run(mode_name, concurrent, entries, server):
+    server.requests.clear()
+    start = time.perf_counter()
+    analyzed = analysis.invoke_chain_of_thought(entries, concurrent=concurrent)
+    elapsed = time.perf_counter() - start
+    print(f"{mode_name:<11} entries={len(analyzed):<4} llm_calls={len(server.requests):<5} "
+          f"wall={elapsed:7.2f}s per_entry={elapsed / max(len(analyzed), 1):6.2f}s")
+    return elapsed
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--entries", type=int, default=8)
+    arg_parser.add_argument("--latency", type=float, default=0.5)
+    arg_parser.add_argument("--questions", type=int, default=4)
+    args = arg_parser.parse_args()
+
+    server = MockOpenAIServer(latency=args.latency, questions_per_headline=args.questions).start()
+    analysis.openai_client = OpenAI(api_key="mock", base_url=server.base_url)
+    try:
+        serial = run("serial", False, make_entries(args.entries), server)
+        concurrent = run("concurrent", True, make_entries(args.entries), server)
+        print(f"speedup: {serial / concurrent:.1f}x")
+    finally:
+        server.stop()
@@ -0,0 +1,88 @@
+"""Restart latency and memory footprint of DedupStore
+
+Fills a store with N fingerprints, reopens it as a restarted poller would,
+and reports time-to-ready, first-new-headline latency, lookup cost and the
+RSS growth compared with the old in-memory set of (title, summary) tuples,
+and checks that fingerprints still in flight at a crash are forgotten:
+
+    python benchmarks/bench_dedup_store.py --entries 200000
+"""
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dedup_store import DedupStore, content_fingerprint
+
+
+def current_rss_mb():
+    # Linux exposes the live resident set in /proc; fall back to the peak elsewhere
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+
+def fake_entry(i):
+    return f"Headline number {i} about markets", f"Summary text for headline {i}. " * 8
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--entries", type=int, default=200_000)
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "dedup.sqlite3")
+
+        store = DedupStore(path, max_entries=args.entries * 2)
+        start = time.perf_counter()
+        with store._lock:
+            store.conn.executemany(
+                "INSERT INTO fingerprints (fp, first_seen) VALUES (?, ?)",
+                ((content_fingerprint(*fake_entry(i)), time.time())
+                 for i in range(args.entries)),
+            )
+            store.conn.commit()
+        store.close()
+        print(f"populated {args.entries} fingerprints in {time.perf_counter() - start:.2f}s")
+
+        rss_before = current_rss_mb()
+        start = time.perf_counter()
+        store = DedupStore(path, max_entries=args.entries * 2)
+        ready = time.perf_counter() - start
+        is_new = store.check_and_add("A brand new headline", "never seen before")
+        first_new = time.perf_counter() - start
+        rss_store = current_rss_mb() - rss_before
+        print(f"restart: ready in {ready * 1e3:.1f}ms, first new headline at {first_new * 1e3:.1f}ms (new={is_new})")
+
+        start = time.perf_counter()
+        for i in range(10_000):
+            store.contains(*fake_entry(i))
+        seen_us = (time.perf_counter() - start) / 10_000 * 1e6
+        start = time.perf_counter()
+        for i in range(10_000):
+            store.contains(*fake_entry(args.entries + i))
+        new_us = (time.perf_counter() - start) / 10_000 * 1e6
+        print(f"lookup: seen={seen_us:.1f}us new={new_us:.1f}us stats={store.stats}")
+
+        # A crash between dedup and storage: only the confirmed entry may stay processed
+        store.check_and_add("Stored before the crash", "confirmed", in_flight=True)
+        store.confirm("Stored before the crash", "confirmed")
+        store.check_and_add("Analyzing during the crash", "never stored", in_flight=True)
+        store.close()
+        store = DedupStore(path, max_entries=args.entries * 2)
+        assert store.released_in_flight == 1, store.released_in_flight
+        assert store.contains("Stored before the crash", "confirmed")
+        assert not store.contains("Analyzing during the crash", "never stored")
+        store.close()
+
+        rss_before = current_rss_mb()
+        legacy = {fake_entry(i) for i in range(args.entries)}
+        rss_set = current_rss_mb() - rss_before
+        print(f"rss: DedupStore +{rss_store:.1f}MB vs in-memory tuple set +{rss_set:.1f}MB ({len(legacy)} items)")
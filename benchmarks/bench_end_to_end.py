@@ -0,0 +1,269 @@
+"""Offline end-to-end benchmark: feeds -> pipeline -> Mongo -> email
+
+Runs main.build_pipeline with every external service replaced by a local
+stand-in: FeedReplayServer replays recorded (or synthetic) feeds,
+MockOpenAIServer answers the LLM calls, mongomock or a local mongod stores
+the headlines and SMTPSink receives the digests. Reports headlines/minute,
+p50/p99 time from a headline's release to the email containing it, and LLM
+calls, tokens and LLM seconds per headline. --analysis-mode chain,fused runs
+once per analysis mode and compares them side by side:
+
+    python benchmarks/bench_end_to_end.py --mongomock --headlines 150 --llm-latency 0.1
+    python benchmarks/bench_end_to_end.py --uri mongodb://localhost:27017 --recordings benchmarks/recordings \\
+        --llm-error-rate 0.05 --json bench_results.jsonl
+    python benchmarks/bench_end_to_end.py --mongomock --analysis-mode chain,fused
+
+--json appends one result line tagged with the current commit, so runs can
+be compared between commits.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Measure the pipeline, not LLM cache hits or a real subscribers file
+os.environ["LLM_CACHE_PATH"] = ""
+os.environ["LLM_CACHE_BYPASS"] = "1"
+os.environ["SUBSCRIBERS_PATH"] = ""
+
+from openai import OpenAI
+
+import analysis
+import email_sender
+import main
+from benchmarks.bench_mongo_writes import make_adapter
+from benchmarks.feed_replay_server import FeedReplayServer, load_recordings, synthetic_recordings
+from benchmarks.mock_openai_server import MockOpenAIServer
+from benchmarks.smtp_sink import SMTPSink, message_text
+from dedup_store import DedupStore
+from email_sender import PooledSMTPSender
+from feed_fetcher import FeedFetcher
+from feed_scheduler import FeedScheduler
+from feed_watermarks import WatermarkStore
+from headline_priority import DEFAULT_TIERS
+from near_duplicates import NearDuplicateDetector
+from notification_outbox import NotificationOutbox
+
+HEADLINE_RE = re.compile(r"📰 HEADLINE: (.*)")
+
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(q * (len(ordered) - 1)))]
+
+
+def current_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ""
+
+
+def run(args, analysis_mode):
+    workdir = tempfile.mkdtemp(prefix="bench-e2e-")
+    recordings = load_recordings(args.recordings) if args.recordings else synthetic_recordings(args.headlines)
+    feeds = FeedReplayServer(recordings, headlines_per_minute=args.release_rate, window=args.window,
+                             page_size=args.page_size)
+    llm = MockOpenAIServer(latency=args.llm_latency, error_rate=args.llm_error_rate,
+                           extra_completion_tokens=args.extra_completion_tokens).start()
+    sink = SMTPSink().start()
+
+    analysis.openai_client = OpenAI(api_key="mock", base_url=llm.base_url)
+    analysis.LLM_MAX_RETRIES = args.llm_retries
+    main.ANALYSIS_RETRY_BACKOFF_SECONDS = args.analysis_retry_backoff
+    analysis.ANALYSIS_MODE = analysis_mode
+    analysis.ANALYSIS_MODES = {}
+    # Nothing may carry over from a previous run in this process
+    analysis.near_duplicates = NearDuplicateDetector(threshold=analysis.NEAR_DUPLICATE_THRESHOLD,
+                                                     window_seconds=analysis.NEAR_DUPLICATE_WINDOW_SECONDS)
+    main.headline_writer = None
+    analysis.llm_client = None
+    failures_before = {outcome: sum(main.analyses.value(tier=tier, outcome=outcome) for tier, _ in DEFAULT_TIERS)
+                       for outcome in ("retried", "failed")}
+    tier_stats_before = {
+        tier: (main.time_to_analysis_seconds.count(tier=tier), main.time_to_analysis_seconds.sum(tier=tier),
+               main.analyses.value(tier=tier, outcome="brief"), main.analyses.value(tier=tier, outcome="dropped"))
+        for tier, _ in DEFAULT_TIERS
+    }
+    main.mongo_adapter = make_adapter(args)
+    collection = main.mongo_adapter.db["news-headlines"]
+    collection.drop()
+    email_sender.RECIPIENTS = ["desk@example.com"]
+    sender = PooledSMTPSender(sink.host, sink.port, username=None, sender="bench@example.com", use_tls=False)
+    main.notification_outbox = NotificationOutbox(
+        sender.send, os.path.join(workdir, "outbox.sqlite3"),
+        coalesce_window_seconds=args.coalesce_window, poll_interval_seconds=0.1,
+    )
+    dedup_store = DedupStore(os.path.join(workdir, "dedup.sqlite3"))
+    watermarks = WatermarkStore(":memory:")
+    fetcher = FeedFetcher(timeout=5, watermarks=watermarks)
+    scheduler = FeedScheduler(feeds.urls(), min_interval=args.min_poll_interval,
+                              max_interval=args.max_poll_interval, initial_interval=args.min_poll_interval,
+                              target_new_per_poll=args.target_new_per_poll)
+
+    pipeline = main.build_pipeline(
+        fetcher, dedup_store, urls=feeds.urls(), poll_interval=args.poll_interval,
+        stage_config={"notify": {"batch_timeout": args.notify_batch_timeout}}, report_interval=0,
+        scheduler=scheduler,
+    )
+    # Stop polling once every feed has been polled after the last headline was released
+    poll = pipeline.source.produce
+
+    def replay_poll():
+        if feeds.exhausted and replay_poll.exhausted_at is None:
+            replay_poll.exhausted_at = time.time()
+        if replay_poll.exhausted_at is not None and all(
+                feed.last_poll_at is not None and feed.last_poll_at > replay_poll.exhausted_at
+                for feed in scheduler.feeds.values()):
+            return None
+        return poll()
+
+    replay_poll.exhausted_at = None
+
+    pipeline.source.produce = replay_poll
+
+    try:
+        main.notification_outbox.start()
+        feeds.start()
+        start = time.time()
+        snapshot = asyncio.run(pipeline.run())
+        if main.headline_writer is not None:
+            main.headline_writer.close()
+        main.notification_outbox.close()
+        finished = time.time()
+        stored = collection.count_documents({})
+        # Paginated feed entries fetched past the watermark that a restart would replay
+        unsettled = len(watermarks.pending())
+        llm_seconds = sum(doc.get("llm_usage", {}).get("seconds", 0.0)
+                          for doc in collection.find({}, {"llm_usage": 1}))
+    finally:
+        sender.close()
+        fetcher.close()
+        watermarks.close()
+        dedup_store.close()
+        feeds.stop()
+        llm.stop()
+        sink.stop()
+        collection.drop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    first_email_at = {}
+    for received_at, _, message in sink.messages:
+        for title in HEADLINE_RE.findall(message_text(message)):
+            first_email_at.setdefault(title.strip(), received_at)
+    time_to_email = [at - feeds.released_at[title] for title, at in first_email_at.items()
+                     if title in feeds.released_at]
+    analyzed = snapshot["enrich"]["processed"]
+    emailed = len(first_email_at)
+    last_email = max(first_email_at.values(), default=finished)
+    tokens = llm.usage_totals["prompt_tokens"] + llm.usage_totals["completion_tokens"]
+
+    return {
+        "commit": current_commit(),
+        "analysis_mode": analysis_mode,
+        "config": {k: v for k, v in vars(args).items() if k not in ("json", "uri")},
+        "headlines_released": len(feeds.released_at),
+        "headlines_missed": len(set(feeds.released_at) - feeds.served),
+        "headlines_analyzed": analyzed,
+        "headlines_emailed": emailed,
+        "headlines_stored": stored,
+        "entries_unsettled": unsettled,
+        "wall_seconds": finished - start,
+        "headlines_per_minute": emailed / max(last_email - start, 1e-9) * 60,
+        "time_to_email_p50": percentile(time_to_email, 0.5),
+        "time_to_email_p99": percentile(time_to_email, 0.99),
+        "feed_requests": sum(feed["polls"] for feed in scheduler.snapshot()),
+        "llm_calls": len(llm.requests),
+        "llm_errors": llm.errors,
+        "analyses_retried": sum(main.analyses.value(tier=tier, outcome="retried") for tier, _ in DEFAULT_TIERS)
+        - failures_before["retried"],
+        "analyses_failed": sum(main.analyses.value(tier=tier, outcome="failed") for tier, _ in DEFAULT_TIERS)
+        - failures_before["failed"],
+        "llm_calls_per_headline": len(llm.requests) / max(analyzed, 1),
+        "tokens_per_headline": tokens / max(analyzed, 1),
+        "llm_seconds_per_headline": llm_seconds / max(stored, 1),
+        "time_to_analysis_by_tier": {
+            tier: {
+                "entries": main.time_to_analysis_seconds.count(tier=tier) - count,
+                "mean_seconds": (main.time_to_analysis_seconds.sum(tier=tier) - total)
+                / max(main.time_to_analysis_seconds.count(tier=tier) - count, 1),
+                "brief": main.analyses.value(tier=tier, outcome="brief") - brief,
+                "dropped": main.analyses.value(tier=tier, outcome="dropped") - dropped,
+            }
+            for tier, (count, total, brief, dropped) in tier_stats_before.items()
+        },
+        "emails": len(sink.messages),
+        "smtp_connections": sink.connections,
+        "stages": snapshot,
+    }
+
+
+def print_result(result):
+    print(f"commit {result['commit'] or '?'}  analysis {result['analysis_mode']}  wall {result['wall_seconds']:.1f}s")
+    print(f"  headlines: released {result['headlines_released']}  missed {result['headlines_missed']}  "
+          f"analyzed {result['headlines_analyzed']}  stored {result['headlines_stored']}  "
+          f"emailed {result['headlines_emailed']}  unsettled {result['entries_unsettled']}")
+    print(f"  feeds:          {result['feed_requests']} requests")
+    print(f"  throughput:     {result['headlines_per_minute']:8.1f} headlines/min")
+    print(f"  time to email:  p50 {result['time_to_email_p50']:6.2f}s  p99 {result['time_to_email_p99']:6.2f}s")
+    print(f"  LLM:            {result['llm_calls_per_headline']:6.2f} calls/headline  "
+          f"{result['tokens_per_headline']:8.0f} tokens/headline  "
+          f"{result['llm_seconds_per_headline']:6.2f} LLM seconds/headline  {result['llm_errors']} injected errors")
+    print(f"  analysis retry: {result['analyses_retried']:.0f} requeued  {result['analyses_failed']:.0f} given up")
+    for tier, stats in result["time_to_analysis_by_tier"].items():
+        print(f"  analysis [{tier:<6}]: {stats['entries']:4d} entries  mean wait+analysis {stats['mean_seconds']:6.2f}s  "
+              f"brief {stats['brief']:.0f}  dropped {stats['dropped']:.0f}")
+    print(f"  email:          {result['emails']} emails over {result['smtp_connections']} SMTP connections")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--recordings", metavar="DIR", help="Replay recorded feeds instead of synthetic ones")
+    arg_parser.add_argument("--headlines", type=int, default=150, help="Synthetic headlines to generate")
+    arg_parser.add_argument("--release-rate", type=float, default=600.0, help="Headlines released per minute")
+    arg_parser.add_argument("--window", type=int, default=50, help="Newest entries each feed serves")
+    arg_parser.add_argument("--page-size", type=int, help="Serve the JSON feeds paginated, FMP-style")
+    arg_parser.add_argument("--poll-interval", type=float, default=0.5, help="Seconds between checks for due feeds")
+    arg_parser.add_argument("--min-poll-interval", type=float, default=1.0)
+    arg_parser.add_argument("--max-poll-interval", type=float, default=30.0)
+    arg_parser.add_argument("--target-new-per-poll", type=float, default=0.1)
+    arg_parser.add_argument("--notify-batch-timeout", type=float, default=2.0)
+    arg_parser.add_argument("--coalesce-window", type=float, default=1.0)
+    arg_parser.add_argument("--llm-latency", type=float, default=0.1)
+    arg_parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    arg_parser.add_argument("--llm-retries", type=int, default=2)
+    arg_parser.add_argument("--analysis-retry-backoff", type=float, default=1.0,
+                            help="Seconds before a failed analysis is first retried")
+    arg_parser.add_argument("--extra-completion-tokens", type=int, default=0)
+    arg_parser.add_argument("--analysis-mode", default="chain",
+                            help="chain, fused, or a comma-separated list to compare")
+    arg_parser.add_argument("--uri", default="mongodb://localhost:27017")
+    arg_parser.add_argument("--database", default="tmcc-news-bench")
+    arg_parser.add_argument("--mongomock", action="store_true")
+    arg_parser.add_argument("--json", metavar="PATH", help="Append the result as a JSON line")
+    args = arg_parser.parse_args()
+
+    results = []
+    for mode in args.analysis_mode.split(","):
+        result = run(args, mode.strip())
+        print_result(result)
+        results.append(result)
+        if args.json:
+            with open(args.json, "a", encoding="utf-8") as f:
+                f.write(json.dumps(result, default=str) + "\n")
+    if len(results) > 1:
+        print(f"{'mode':<8} {'calls/headline':>15} {'tokens/headline':>16} {'LLM s/headline':>15} {'email p50':>10}")
+        for result in results:
+            print(f"{result['analysis_mode']:<8} {result['llm_calls_per_headline']:15.2f} "
+                  f"{result['tokens_per_headline']:16.0f} {result['llm_seconds_per_headline']:15.2f} "
+                  f"{result['time_to_email_p50']:9.2f}s")
@@ -0,0 +1,99 @@
+"""Simulated comparison of fixed-interval polling vs FeedScheduler
+
+Feeds publish as Poisson processes at the given rates (entries/hour) and
+serve their newest --window entries. A fake clock drives FeedScheduler, so
+a simulated day runs in well under a second. Reports requests made and
+detection latency (publish -> first poll that sees the entry) per feed:
+
+    python benchmarks/bench_feed_scheduler.py --hours 24 --rates 120,30,6,1,0.2
+"""
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from feed_scheduler import FeedScheduler
+
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(q * (len(ordered) - 1)))]
+
+
+def publications(rates, seconds, seed):
+    rng = random.Random(seed)
+    feeds = {}
+    for i, per_hour in enumerate(rates):
+        times, t = [], 0.0
+        while per_hour > 0:
+            t += rng.expovariate(per_hour / 3600)
+            if t >= seconds:
+                break
+            times.append(t)
+        feeds[f"https://feeds.example/{i}"] = times
+    return feeds
+
+
+def simulate(feeds, seconds, window, scheduler=None, fixed_interval=None):
+    """Poll the simulated feeds, with scheduler or every fixed_interval seconds"""
+    now = 0.0
+    requests = {url: 0 for url in feeds}
+    latencies = {url: [] for url in feeds}
+    detected = {url: 0 for url in feeds}
+    next_fixed = 0.0
+    while now < seconds:
+        if scheduler is not None:
+            due = [url for urls in scheduler.due(now).values() for url in urls]
+        else:
+            due = list(feeds) if now >= next_fixed else []
+            next_fixed = now + fixed_interval if due else next_fixed
+        for url in due:
+            published = [t for t in feeds[url] if t <= now]
+            visible = published[-window:]
+            requests[url] += 1
+            # Entries published since the last poll that are still in the window are detected now
+            for index in range(max(detected[url], len(published) - len(visible)), len(published)):
+                latencies[url].append(now - published[index])
+            detected[url] = len(published)
+            if scheduler is not None:
+                scheduler.record(url, [{"id": f"{url}#{t}"} for t in visible], now=now)
+        if scheduler is not None:
+            now += max(scheduler.seconds_until_due(now), 0.001)
+        else:
+            now = next_fixed
+    return requests, latencies
+
+
+def report(name, rates, requests, latencies):
+    print(name)
+    for per_hour, url in zip(rates, requests):
+        print(f"  {per_hour:7.1f}/h  requests {requests[url]:6d}  latency mean "
+              f"{sum(latencies[url]) / max(len(latencies[url]), 1):7.1f}s  p90 {percentile(latencies[url], 0.9):7.1f}s")
+    print(f"  total requests {sum(requests.values())}")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--hours", type=float, default=24)
+    arg_parser.add_argument("--rates", default="120,30,6,1,0.2", help="Publication rates, entries/hour")
+    arg_parser.add_argument("--window", type=int, default=50)
+    arg_parser.add_argument("--fixed-interval", type=float, default=10.0)
+    arg_parser.add_argument("--min-interval", type=float, default=5.0)
+    arg_parser.add_argument("--max-interval", type=float, default=600.0)
+    arg_parser.add_argument("--target-new-per-poll", type=float, default=0.1)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    args = arg_parser.parse_args()
+
+    rates = [float(r) for r in args.rates.split(",")]
+    seconds = args.hours * 3600
+    feeds = publications(rates, seconds, args.seed)
+
+    report(f"fixed every {args.fixed_interval:g}s", rates,
+           *simulate(feeds, seconds, args.window, fixed_interval=args.fixed_interval))
+    scheduler = FeedScheduler({"sim": list(feeds)}, min_interval=args.min_interval, max_interval=args.max_interval,
+                              target_new_per_poll=args.target_new_per_poll, clock=lambda: 0.0, seed=args.seed)
+    report("adaptive", rates, *simulate(feeds, seconds, args.window, scheduler=scheduler))
@@ -0,0 +1,81 @@
+"""Cold-start import cost of each entry point, guarded by a budget
+
+Imports every entry module in a fresh interpreter under `python -X importtime`
+and reports the best cumulative time over a few runs and the heaviest
+imports it pulls in. Exits non-zero when a module is over its budget:
+
+    python benchmarks/bench_import_time.py
+    python benchmarks/bench_import_time.py --budget main=300 --runs 5
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cumulative import time budgets in milliseconds
+BUDGETS_MS = {
+    "cli": 50,
+    "main": 400,
+    "analysis": 150,
+    "notification_outbox": 50,
+    "mongo_adapter": 250,
+}
+
+
+def import_times(module):
+    """Map of module name -> cumulative microseconds for everything one cold import of module pulls in"""
+    env = dict(os.environ, LLM_CACHE_PATH="", PYTHONDONTWRITEBYTECODE="1")
+    env.pop("OPENAI_API_KEY", None)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((len(name) - len(name.lstrip()), name.strip(), int(cumulative)))
+
+    # Children are listed (indented) right before their parent; interpreter
+    # startup imports such as site come earlier at the top level and are skipped
+    end = max(i for i, (level, name, _) in enumerate(rows) if level == 1 and name == module)
+    start = end
+    while start > 0 and rows[start - 1][0] > 1:
+        start -= 1
+    return {name: cumulative for _, name, cumulative in rows[start:end + 1]}
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--runs", type=int, default=3)
+    arg_parser.add_argument("--top", type=int, default=5)
+    arg_parser.add_argument("--budget", action="append", default=[], metavar="MODULE=MS",
+                            help="Override or add a module budget")
+    args = arg_parser.parse_args()
+
+    budgets = dict(BUDGETS_MS)
+    for item in args.budget:
+        module, ms = item.split("=")
+        budgets[module] = float(ms)
+
+    over_budget = []
+    for module, budget in budgets.items():
+        runs = [import_times(module) for _ in range(args.runs)]
+        best = min(runs, key=lambda times: times[module])
+        total_ms = best[module] / 1e3
+        status = "ok" if total_ms <= budget else "OVER BUDGET"
+        print(f"{module:<22} {total_ms:>8.1f} ms  (budget {budget:.0f} ms)  {status}")
+        heaviest = sorted((name for name in best if name != module), key=best.get, reverse=True)[: args.top]
+        for name in heaviest:
+            print(f"    {name:<30} {best[name] / 1e3:>8.1f} ms")
+        if total_ms > budget:
+            over_budget.append(module)
+
+    if over_budget:
+        print(f"Over budget: {', '.join(over_budget)}")
+        sys.exit(1)
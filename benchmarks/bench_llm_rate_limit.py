@@ -0,0 +1,67 @@
+"""Throughput and error rate against a rate-limited API: bare OpenAI client vs RateLimitedLLMClient
+
+MockOpenAIServer enforces requests/tokens per minute over a short sliding
+window and answers 429 with Retry-After above it. Both clients send the
+same requests from the same number of threads; the bare client relies on
+the SDK's own retries.
+
+    python benchmarks/bench_llm_rate_limit.py --requests 300 --threads 16 --rpm 600
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openai import OpenAI
+
+from benchmarks.mock_openai_server import MockOpenAIServer
+from llm_client import RateLimitedLLMClient
+
+MESSAGES = [
+    {"role": "system", "content": "You are a financial analyst providing specific market analysis."},
+    {"role": "user", "content": "Which tickers are exposed to a rise in copper prices?"},
+]
+
+
+def run(name, call, args, server):
+    server.requests.clear()
+    server.rate_limited = 0
+    failures = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        futures = [executor.submit(call) for _ in range(args.requests)]
+        for future in futures:
+            try:
+                future.result()
+            except Exception:
+                failures += 1
+    elapsed = time.perf_counter() - start
+    ok = args.requests - failures
+    print(f"{name:<12} ok={ok:<5} failed={failures:<4} 429s={server.rate_limited:<5} "
+          f"wall={elapsed:6.1f}s  {ok / elapsed * 60:7.0f} ok/min (limit {args.rpm})")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--requests", type=int, default=300)
+    arg_parser.add_argument("--threads", type=int, default=16)
+    arg_parser.add_argument("--rpm", type=int, default=600)
+    arg_parser.add_argument("--window", type=float, default=5.0, help="Server's sliding limit window, seconds")
+    arg_parser.add_argument("--latency", type=float, default=0.05)
+    args = arg_parser.parse_args()
+
+    server = MockOpenAIServer(latency=args.latency, requests_per_minute=args.rpm, rate_window=args.window).start()
+    try:
+        bare = OpenAI(api_key="mock", base_url=server.base_url)
+        run("bare client", lambda: bare.chat.completions.create(model="o1", messages=MESSAGES), args, server)
+        time.sleep(args.window)
+        paced = RateLimitedLLMClient(OpenAI(api_key="mock", base_url=server.base_url), requests_per_minute=args.rpm,
+                                     tokens_per_minute=0, max_concurrency=args.threads,
+                                     seed=0)
+        run("rate limited", lambda: paced.create(model="o1", messages=MESSAGES), args, server)
+        print(f"rate limited client stats: {paced.stats}")
+    finally:
+        server.stop()
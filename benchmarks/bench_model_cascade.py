@@ -0,0 +1,99 @@
+"""Per-headline LLM latency and cost: o1 on every stage vs the tiered model cascade
+
+Runs the same headlines through analyze_entry twice against
+MockOpenAIServer, which answers each model after its own latency and calls
+--tradeable-rate of headlines tradeable at the triage stage:
+
+  * o1 everywhere, no triage (the original chain)
+  * LLM_STAGE_MODELS with relevance triage, whose non-tradeable headlines
+    skip the question and answer stages
+
+and prints the distribution of summed LLM request time and estimated cost
+per headline (costs use LLM_MODEL_PRICES on the mock's token counts):
+
+    python benchmarks/bench_model_cascade.py --entries 40 --tradeable-rate 0.4
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Measure raw LLM latency, not cache hits
+os.environ["LLM_CACHE_PATH"] = ""
+os.environ["LLM_CACHE_BYPASS"] = "1"
+
+from openai import OpenAI
+
+import analysis
+from benchmarks.mock_openai_server import MockOpenAIServer
+
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(q * (len(ordered) - 1)))]
+
+
+def make_entries(count):
+    # Varied text so the mock's hash-based triage verdicts vary too
+    return [
+        {"title": f"Benchmark headline {i}: {topic}", "summary": f"Benchmark summary {i} about {topic}.",
+         "source": "benchmark"}
+        for i, topic in zip(range(count), ["chip export rules", "a celebrity wedding", "oil output cuts",
+                                           "city council budget", "a drug trial readout"] * count)
+    ]
+
+
+def run(name, entries, server, stage_models, triage):
+    analysis.LLM_STAGE_MODELS = stage_models
+    analysis.RELEVANCE_TRIAGE = triage
+    server.requests.clear()
+    start = time.perf_counter()
+    analyzed = analysis.invoke_chain_of_thought(entries, concurrent=True)
+    elapsed = time.perf_counter() - start
+
+    seconds = [a["llm_usage"]["seconds"] for a in analyzed]
+    costs = [a["llm_usage"]["cost_usd"] for a in analyzed]
+    early = sum(1 for a in analyzed if a["decided_by"] == "relevance_triage")
+    print(f"{name}")
+    print(f"  headlines {len(analyzed)}  early exits {early}  llm calls {len(server.requests)}  wall {elapsed:.1f}s")
+    print(f"  llm seconds/headline  mean {sum(seconds) / len(seconds):6.2f}  p50 {percentile(seconds, 0.5):6.2f}  "
+          f"p90 {percentile(seconds, 0.9):6.2f}  max {max(seconds):6.2f}")
+    print(f"  cost/headline (USD)   mean {sum(costs) / len(costs):.5f}  p50 {percentile(costs, 0.5):.5f}  "
+          f"p90 {percentile(costs, 0.9):.5f}  max {max(costs):.5f}")
+    return sum(seconds) / len(seconds), sum(costs) / len(costs)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--entries", type=int, default=40)
+    arg_parser.add_argument("--questions", type=int, default=4)
+    arg_parser.add_argument("--tradeable-rate", type=float, default=0.4)
+    arg_parser.add_argument("--o1-latency", type=float, default=1.0)
+    arg_parser.add_argument("--gpt-4o-latency", type=float, default=0.3)
+    arg_parser.add_argument("--gpt-4o-mini-latency", type=float, default=0.15)
+    arg_parser.add_argument("--extra-completion-tokens", type=int, default=200,
+                            help="Padding per completion, standing in for longer answers")
+    args = arg_parser.parse_args()
+
+    server = MockOpenAIServer(
+        latency=args.o1_latency, questions_per_headline=args.questions, tradeable_rate=args.tradeable_rate,
+        extra_completion_tokens=args.extra_completion_tokens,
+        model_latency={"o1": args.o1_latency, "gpt-4o": args.gpt_4o_latency,
+                       "gpt-4o-mini": args.gpt_4o_mini_latency},
+    ).start()
+    analysis.openai_client = OpenAI(api_key="mock", base_url=server.base_url)
+    cascade_models = dict(analysis.LLM_STAGE_MODELS)
+    try:
+        entries = make_entries(args.entries)
+        base_seconds, base_cost = run("o1 everywhere, no triage", entries, server,
+                                      {stage: "o1" for stage in cascade_models}, False)
+        # Same headlines with fresh dicts: analyze_entry writes into its entry
+        cascade_seconds, cascade_cost = run("cascade with triage", make_entries(args.entries), server,
+                                            cascade_models, True)
+        print(f"mean llm seconds/headline {base_seconds / cascade_seconds:.1f}x lower, "
+              f"mean cost/headline {base_cost / cascade_cost:.1f}x lower")
+    finally:
+        server.stop()
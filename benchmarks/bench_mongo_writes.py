@@ -0,0 +1,232 @@
+"""Behavior checks and docs/sec of per-document inserts vs bulk upserts vs the buffered writer
+
+Runs against a local mongod (--uri) or in-process mongomock (--mongomock).
+Before timing anything it checks that bulk upserts are idempotent and keep
+set_on_insert fields, that BufferedWriter retries failed batches with a cap,
+dead-letters rejected documents, reports only written ones and bounds its
+buffer, and that legacy news-headlines ids are migrated to content hashes:
+
+    python benchmarks/bench_mongo_writes.py --uri mongodb://localhost:27017 --docs 5000
+    python benchmarks/bench_mongo_writes.py --mongomock --docs 5000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo.errors import AutoReconnect
+
+from dedup_store import content_fingerprint
+from mongo_adapter import BufferedWriter, MongoAdapter, backfill_news_headline_ids
+
+COLLECTION = "bench-news-headlines"
+DEAD_LETTERS = f"{COLLECTION}-dead-letter"
+
+
+def make_adapter(args):
+    if args.mongomock:
+        import mongomock
+
+        adapter = MongoAdapter.__new__(MongoAdapter)
+        adapter.client = mongomock.MongoClient()
+        adapter.db = adapter.client[args.database]
+        return adapter
+    return MongoAdapter(connection_string=args.uri, database_name=args.database)
+
+
+def make_docs(count):
+    docs = []
+    for i in range(count):
+        title, summary = f"Benchmark headline {i}", f"Benchmark summary {i} " * 10
+        docs.append({
+            "id": content_fingerprint(title, summary).hex(),
+            "title": title,
+            "summary": summary,
+            "source": "benchmark",
+            "companies_tickers": {"tickers_mentioned": ["AAPL"], "companies_mentioned": ["Apple"]},
+            "question_and_answers": [{"question": "Q?", "answer": [{"symbol": "AAPL", "reasoning": "R"}]}],
+            "stored_at": time.time(),
+        })
+    return docs
+
+
+class FlakyAdapter:
+    """Wraps an adapter so its first `failures` bulk upserts fail like a dropped connection"""
+
+    def __init__(self, adapter, failures):
+        self.adapter = adapter
+        self.failures = failures
+
+    def bulk_upsert_items(self, *args, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise AutoReconnect("connection reset")
+        return self.adapter.bulk_upsert_items(*args, **kwargs)
+
+    def load_items_into_collection(self, *args, **kwargs):
+        return self.adapter.load_items_into_collection(*args, **kwargs)
+
+
+def check_upserts(adapter, collection):
+    docs = make_docs(50)
+    first = adapter.bulk_upsert_items(COLLECTION, docs, set_on_insert=("stored_at",))
+    assert first["upserted"] == 50, first
+    first_stored_at = {doc["id"]: doc["stored_at"] for doc in docs}
+
+    # Same headlines again, re-analyzed later: no duplicates, analysis updated, stored_at kept
+    again = [{**doc, "stored_at": doc["stored_at"] + 3600, "source": "reanalyzed"} for doc in docs]
+    second = adapter.bulk_upsert_items(COLLECTION, again, set_on_insert=("stored_at",))
+    assert second["upserted"] == 0 and second["matched"] == 50, second
+    assert collection.count_documents({}) == 50
+    for doc in collection.find({}):
+        assert doc["source"] == "reanalyzed"
+        assert doc["stored_at"] == first_stored_at[doc["id"]], "set_on_insert field was overwritten"
+
+
+def check_writer_retries(adapter, collection):
+    flaky = FlakyAdapter(adapter, failures=2)
+    writer = BufferedWriter(flaky, COLLECTION, set_on_insert=("stored_at",), max_batch_size=1000,
+                            retry_backoff_seconds=0.01)
+    docs = make_docs(20)
+    written = []
+    for doc in docs:
+        writer.add(doc, on_written=written.append)
+    assert writer.flush() == 0 and writer.flush() == 0, "flaky adapter should have failed twice"
+    assert collection.count_documents({}) == 0 and not written
+    time.sleep(0.05)
+    assert writer.flush() == 20, writer.stats
+    assert len(written) == 20, "on_written must fire once the retried batch is written"
+    writer.close()
+    assert collection.count_documents({}) == 20
+    assert writer.stats["errors"] == 2 and writer.stats["dead_lettered"] == 0, writer.stats
+
+
+def check_writer_gives_up(adapter, collection):
+    discarded = []
+    writer = BufferedWriter(FlakyAdapter(adapter, failures=10), COLLECTION, max_batch_size=1000,
+                            max_attempts=3, retry_backoff_seconds=0.0,
+                            on_discard=lambda count, reason: discarded.append((count, reason)))
+    written = []
+    for doc in make_docs(5):
+        writer.add(doc, on_written=written.append)
+    for _ in range(3):
+        writer.flush()
+    writer.close()
+    assert writer.stats["dead_lettered"] == 5 and discarded == [(5, "dead_letter")], writer.stats
+    assert not written, "dead-lettered items were reported as written"
+    assert adapter.db[DEAD_LETTERS].count_documents({}) == 5
+    assert collection.count_documents({}) == 0
+
+
+def check_writer_dead_letters_rejected(adapter, collection):
+    # A unique title index makes one document of the batch fail on the server
+    collection.create_index("title", unique=True)
+    docs = make_docs(10)
+    clash = {**docs[0], "id": "clashing-id"}
+    writer = BufferedWriter(adapter, COLLECTION, max_batch_size=1000)
+    written = []
+    for doc in docs + [clash]:
+        writer.add(doc, on_written=written.append)
+    assert writer.flush() == 10, writer.stats
+    assert sorted(doc["id"] for doc in written) == sorted(doc["id"] for doc in docs), written
+    writer.close()
+    assert collection.count_documents({}) == 10
+    letters = list(adapter.db[DEAD_LETTERS].find({}))
+    assert [letter["key"] for letter in letters] == ["clashing-id"], letters
+    assert writer.stats["dead_lettered"] == 1 and writer.stats["written"] == 10, writer.stats
+
+
+def check_writer_bounded(adapter):
+    writer = BufferedWriter(FlakyAdapter(adapter, failures=100), COLLECTION, max_batch_size=1000,
+                            max_pending=3, max_block_seconds=0.0)
+    accepted = [writer.add(doc) for doc in make_docs(5)]
+    assert accepted == [True, True, True, False, False], accepted
+    assert writer.stats["dropped"] == 2, writer.stats
+    writer._stop.set()
+
+
+def check_legacy_id_backfill(adapter):
+    headlines = adapter.db["news-headlines"]
+    docs = make_docs(3)
+    legacy = [{**doc, "id": f"{doc['title']}_{doc['summary']}"} for doc in docs]
+    # Stored twice by the old insert_many path, and once more under the new id after the upgrade
+    headlines.insert_many([dict(doc) for doc in legacy])
+    headlines.insert_many([{**doc, "stored_at": doc["stored_at"] + 60} for doc in legacy])
+    headlines.insert_one({**docs[0], "stored_at": docs[0]["stored_at"] + 120})
+
+    counts = backfill_news_headline_ids(adapter)
+    assert counts == {"rekeyed": 2, "merged": 4}, counts
+    assert headlines.count_documents({}) == 3
+    for doc in docs:
+        stored = list(headlines.find({"id": doc["id"]}))
+        assert len(stored) == 1 and stored[0]["stored_at"] == doc["stored_at"], stored
+    assert backfill_news_headline_ids(adapter) == {"rekeyed": 0, "merged": 0}
+
+
+def run_checks(adapter, collection):
+    checks = [
+        lambda: check_upserts(adapter, collection),
+        lambda: check_writer_retries(adapter, collection),
+        lambda: check_writer_gives_up(adapter, collection),
+        lambda: check_writer_dead_letters_rejected(adapter, collection),
+        lambda: check_writer_bounded(adapter),
+        lambda: check_legacy_id_backfill(adapter),
+    ]
+    for check in checks:
+        for name in (COLLECTION, DEAD_LETTERS, "news-headlines"):
+            adapter.db[name].drop()
+        check()
+    print(f"{len(checks)} behavior checks passed")
+
+
+def report(name, count, elapsed, collection):
+    print(f"{name:<26} {count / elapsed:>10,.0f} docs/sec  (collection now holds "
+          f"{collection.count_documents({})} docs)")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--uri", default="mongodb://localhost:27017")
+    arg_parser.add_argument("--database", default="tmcc-news-bench")
+    arg_parser.add_argument("--mongomock", action="store_true")
+    arg_parser.add_argument("--docs", type=int, default=5000)
+    arg_parser.add_argument("--batch", type=int, default=100)
+    args = arg_parser.parse_args()
+
+    adapter = make_adapter(args)
+    collection = adapter.db[COLLECTION]
+    try:
+        run_checks(adapter, collection)
+
+        collection.drop()
+        docs = make_docs(args.docs)
+        start = time.perf_counter()
+        for doc in docs:
+            adapter.load_items_into_collection(COLLECTION, items=[dict(doc)])
+        report("insert_many per document", args.docs, time.perf_counter() - start, collection)
+
+        collection.drop()
+        start = time.perf_counter()
+        for i in range(0, args.docs, args.batch):
+            adapter.bulk_upsert_items(COLLECTION, docs[i:i + args.batch], set_on_insert=("stored_at",))
+        report(f"bulk upsert x{args.batch}", args.docs, time.perf_counter() - start, collection)
+
+        # Re-storing the same headlines must not create duplicates
+        start = time.perf_counter()
+        for i in range(0, args.docs, args.batch):
+            adapter.bulk_upsert_items(COLLECTION, docs[i:i + args.batch], set_on_insert=("stored_at",))
+        report(f"bulk re-upsert x{args.batch}", args.docs, time.perf_counter() - start, collection)
+
+        collection.drop()
+        writer = BufferedWriter(adapter, COLLECTION, set_on_insert=("stored_at",), max_batch_size=args.batch)
+        start = time.perf_counter()
+        for doc in docs:
+            writer.add(doc)
+        writer.close()
+        report("BufferedWriter", args.docs, time.perf_counter() - start, collection)
+    finally:
+        collection.drop()
+        adapter.db[DEAD_LETTERS].drop()
+        adapter.close()
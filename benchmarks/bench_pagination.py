@@ -0,0 +1,81 @@
+"""Dashboard page latency as the headline collection grows
+
+For each collection size, times the first page, a deep page reached by
+keyset cursor, the same deep page via skip, and the total count, i.e. what
+app.fetch_headlines does per page load:
+
+    python benchmarks/bench_pagination.py --uri mongodb://localhost:27017 --sizes 1000 10000 100000 1000000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import DESCENDING
+
+from benchmarks.bench_mongo_writes import make_adapter
+
+COLLECTION = "bench-news-headlines"
+# Same shape as app.HEADLINE_PROJECTION, without importing the Streamlit app
+HEADLINE_PROJECTION = {"title": 1, "summary": 1, "source": 1, "companies_tickers": 1,
+                       "question_and_answers": 1, "questions": 1, "id": 1, "stored_at": 1}
+
+
+def timed(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1e3, result
+
+
+def fill(collection, size, batch=10_000):
+    collection.drop()
+    collection.create_index([("stored_at", DESCENDING), ("_id", DESCENDING)])
+    base = time.time()
+    for offset in range(0, size, batch):
+        collection.insert_many([
+            {"title": f"Headline {i}", "summary": "Summary " * 20, "source": "benchmark",
+             "companies_tickers": {"tickers_mentioned": [], "companies_mentioned": []},
+             "question_and_answers": [], "questions": [], "id": str(i), "stored_at": base + i}
+            for i in range(offset, min(offset + batch, size))
+        ])
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--uri", default="mongodb://localhost:27017")
+    arg_parser.add_argument("--database", default="tmcc-news-bench")
+    arg_parser.add_argument("--mongomock", action="store_true")
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    arg_parser.add_argument("--per-page", type=int, default=25)
+    args = arg_parser.parse_args()
+
+    adapter = make_adapter(args)
+    collection = adapter.db[COLLECTION]
+    print(f"{'docs':>9} {'count ms':>9} {'page 1 ms':>10} {'deep keyset ms':>15} {'deep skip ms':>13}")
+    try:
+        for size in args.sizes:
+            fill(collection, size)
+            deep_index = size - 2 * args.per_page
+            # Cursor of the document just before the deep page, as a prior page load would have recorded
+            anchor_doc = collection.find({}, {"stored_at": 1}).sort(
+                [("stored_at", DESCENDING), ("_id", DESCENDING)]
+            ).skip(deep_index - 1).limit(1)[0]
+            anchor = (anchor_doc["stored_at"], anchor_doc["_id"])
+
+            count_ms, _ = timed(lambda: adapter.count_documents(COLLECTION))
+            first_ms, _ = timed(lambda: adapter.paginate(COLLECTION, page_size=args.per_page,
+                                                         projection=HEADLINE_PROJECTION))
+            keyset_ms, (keyset_docs, _) = timed(lambda: adapter.paginate(
+                COLLECTION, page_size=args.per_page, after=anchor, projection=HEADLINE_PROJECTION))
+            skip_ms, (skip_docs, _) = timed(lambda: adapter.paginate(
+                COLLECTION, page_size=args.per_page, skip=deep_index, projection=HEADLINE_PROJECTION))
+            assert [d["_id"] for d in keyset_docs] == [d["_id"] for d in skip_docs]
+            print(f"{size:>9,} {count_ms:>9.2f} {first_ms:>10.2f} {keyset_ms:>15.2f} {skip_ms:>13.2f}")
+    finally:
+        collection.drop()
+        adapter.close()
@@ -0,0 +1,112 @@
+"""Prompt tokens per headline for each analysis stage, guarded by a budget
+
+Builds every stage's messages for a few fixture headlines (short wire
+stories and an FMP article whose 'text' runs to thousands of words) with the
+local tokenizer, no LLM involved. Reports prompt tokens per stage and per
+headline for the chain (with --questions answer workers) and fused modes,
+the prefix the answer workers of a headline share, and what the long
+article would cost without the summary cap. Exits non-zero when a headline
+is over its budget:
+
+    python benchmarks/bench_prompt_tokens.py
+    python benchmarks/bench_prompt_tokens.py --budget chain=2000 --questions 5
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["LLM_CACHE_PATH"] = ""
+
+import analysis
+from prompt_builder import PromptBuilder, count_message_tokens
+
+# Prompt tokens per headline, all stages of the mode together
+BUDGETS = {
+    "chain": 4000,
+    "fused": 800,
+}
+
+LONG_ARTICLE = " ".join([
+    "Shares of the chipmaker rose sharply in early trading after it reported quarterly revenue well ahead of "
+    "analyst expectations, driven by surging data center demand.",
+    "Management raised full-year guidance and said supply constraints on advanced packaging would ease by the "
+    "second half.",
+    "Analysts at several brokerages lifted their price targets, citing stronger pricing and a widening lead over "
+    "competitors in accelerators used to train large models.",
+] * 120)
+
+FIXTURES = [
+    {"title": analysis.test_entries[0]["title"], "summary": analysis.test_entries[0]["summary"]},
+    {"title": analysis.test_entries[1]["title"], "summary": analysis.test_entries[1]["summary"]},
+    {"title": "Nvidia beats estimates, raises guidance on data center demand", "summary": LONG_ARTICLE},
+]
+COMPANIES_TICKERS = {"tickers_mentioned": ["NVDA", "BLK"], "companies_mentioned": ["Nvidia", "BlackRock"]}
+QUESTIONS = [
+    "Which suppliers of advanced packaging capacity benefit most from the guidance raise?",
+    "Which competitors lose share if pricing in accelerators keeps strengthening?",
+    "How are hyperscalers' capital expenditure plans exposed to this demand?",
+    "Which power and cooling equipment makers see second-order demand?",
+    "What trading risks follow if supply constraints ease faster than expected?",
+]
+
+
+def stage_tokens(entry, questions):
+    """Prompt tokens of each stage's messages for one headline"""
+    context = analysis.analysis_context(entry["title"], entry["summary"], COMPANIES_TICKERS)
+    answers = [analysis.stage_messages("answer_worker", context, f"Question: {q}") for q in questions]
+    return {
+        "ticker_extraction": count_message_tokens(analysis.stage_messages(
+            "ticker_extraction", analysis.prompt_builder.headline_context(entry["title"], entry["summary"]))),
+        "relevance_triage": count_message_tokens(analysis.stage_messages("relevance_triage", context)),
+        "question_prompter": count_message_tokens(analysis.stage_messages("question_prompter", context)),
+        "answer_worker": sum(count_message_tokens(messages) for messages in answers),
+        "fused_analysis": count_message_tokens(analysis.stage_messages("fused_analysis", context)),
+    }, answers
+
+
+def shared_prefix_tokens(message_lists):
+    """Tokens of the user-message prefix every one of message_lists starts with"""
+    prompts = [messages[1]["content"] for messages in message_lists]
+    prefix = os.path.commonprefix(prompts)
+    return count_message_tokens([message_lists[0][0], {"role": "user", "content": prefix}])
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--questions", type=int, default=4, help="Answer workers per headline in chain mode")
+    arg_parser.add_argument("--budget", action="append", default=[], metavar="MODE=TOKENS",
+                            help="Override a per-headline budget")
+    args = arg_parser.parse_args()
+
+    budgets = dict(BUDGETS)
+    for item in args.budget:
+        mode, tokens = item.split("=")
+        budgets[mode] = int(tokens)
+
+    over_budget = []
+    for entry in FIXTURES:
+        tokens, answers = stage_tokens(entry, QUESTIONS[:args.questions])
+        totals = {
+            "chain": sum(v for stage, v in tokens.items() if stage != "fused_analysis"),
+            "fused": tokens["fused_analysis"],
+        }
+        print(entry["title"][:70])
+        print("  " + "  ".join(f"{stage} {count}" for stage, count in tokens.items()))
+        if len(answers) > 1:
+            print(f"  answer workers share a {shared_prefix_tokens(answers)}-token prefix")
+        for mode, total in totals.items():
+            status = "ok" if total <= budgets[mode] else "OVER BUDGET"
+            print(f"  {mode:<6} {total:6d} prompt tokens/headline  (budget {budgets[mode]})  {status}")
+            if total > budgets[mode]:
+                over_budget.append(f"{mode}: {entry['title'][:40]}")
+
+    uncapped = PromptBuilder(summary_token_budget=10 ** 9)
+    capped_context = analysis.prompt_builder.headline_context(FIXTURES[-1]["title"], LONG_ARTICLE)
+    uncapped_context = uncapped.headline_context(FIXTURES[-1]["title"], LONG_ARTICLE)
+    print(f"long article context: {count_message_tokens([{'content': capped_context}])} tokens capped, "
+          f"{count_message_tokens([{'content': uncapped_context}])} uncapped (sent once per stage call)")
+
+    if over_budget:
+        print(f"Over budget: {'; '.join(over_budget)}")
+        sys.exit(1)
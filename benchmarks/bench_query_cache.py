@@ -0,0 +1,103 @@
+"""Dashboard page reads with and without the shared query result cache
+
+Several analysts run the same ticker queries (first and second page) while
+headlines keep arriving. Every read is made through the cache the way
+app.fetch_headlines does (watermark check, count and page on a miss) and
+compared with a fresh uncached read; any difference means a stale page was
+served and the benchmark exits non-zero. Reports the hit ratio and the
+time per page read both ways:
+
+    python benchmarks/bench_query_cache.py --mongomock
+    python benchmarks/bench_query_cache.py --uri mongodb://localhost:27017 --docs 200000 --insert-every 20
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mongo_adapter import NEWS_HEADLINES_INDEXES
+from query_cache import QueryResultCache, query_key
+
+from benchmarks.bench_mongo_writes import make_adapter
+from benchmarks.bench_pagination import COLLECTION, HEADLINE_PROJECTION
+
+TICKERS = ["AAPL", "MSFT", "NVDA", "GOOGL", "AMZN", "META", "TSLA", "JPM", "BLK", "XOM"]
+
+
+def make_doc(i, stored_at):
+    return {"title": f"Headline {i}", "summary": "Summary " * 20, "source": "benchmark",
+            "companies_tickers": {"tickers_mentioned": [TICKERS[i % len(TICKERS)], TICKERS[i * 7 % len(TICKERS)]],
+                                  "companies_mentioned": []},
+            "question_and_answers": [], "questions": [], "id": str(i), "stored_at": stored_at}
+
+
+def read_page(adapter, query, page, per_page):
+    total = adapter.count_documents(COLLECTION, query)
+    documents, _ = adapter.paginate(COLLECTION, query, page_size=per_page, skip=(page - 1) * per_page,
+                                    projection=HEADLINE_PROJECTION)
+    return documents, total
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--uri", default="mongodb://localhost:27017")
+    arg_parser.add_argument("--database", default="tmcc-news-bench")
+    arg_parser.add_argument("--mongomock", action="store_true")
+    arg_parser.add_argument("--docs", type=int, default=20_000)
+    arg_parser.add_argument("--reads", type=int, default=400, help="Page reads across all analysts")
+    arg_parser.add_argument("--insert-every", type=int, default=25, help="Reads between newly stored headlines")
+    arg_parser.add_argument("--per-page", type=int, default=25)
+    args = arg_parser.parse_args()
+
+    adapter = make_adapter(args)
+    collection = adapter.db[COLLECTION]
+    collection.drop()
+    collection.create_indexes(NEWS_HEADLINES_INDEXES)
+    base = time.time() - args.docs
+    for offset in range(0, args.docs, 10_000):
+        collection.insert_many([make_doc(i, base + i) for i in range(offset, min(offset + 10_000, args.docs))])
+
+    rng = random.Random(7)
+    queries = [{"companies_tickers.tickers_mentioned": {"$in": [ticker]}} for ticker in TICKERS[:4]] + [None]
+    cache = QueryResultCache()
+    cached_seconds = uncached_seconds = watermark_seconds = 0.0
+    stale_pages = 0
+    next_id = args.docs
+    try:
+        for n in range(args.reads):
+            if n and n % args.insert_every == 0:
+                collection.insert_one(make_doc(next_id, time.time()))
+                next_id += 1
+            query, page = rng.choice(queries), rng.choice([1, 1, 1, 2])
+
+            start = time.perf_counter()
+            watermark = adapter.collection_watermark(COLLECTION)
+            watermark_seconds += time.perf_counter() - start
+            documents, total = cache.get_or_compute(
+                query_key(query, page, args.per_page, HEADLINE_PROJECTION), watermark,
+                lambda: read_page(adapter, query, page, args.per_page),
+            )
+            cached_seconds += time.perf_counter() - start
+
+            start = time.perf_counter()
+            fresh_documents, fresh_total = read_page(adapter, query, page, args.per_page)
+            uncached_seconds += time.perf_counter() - start
+            if total != fresh_total or [d["_id"] for d in documents] != [d["_id"] for d in fresh_documents]:
+                stale_pages += 1
+    finally:
+        collection.drop()
+        adapter.close()
+
+    print(f"{args.reads} page reads over {args.docs:,} docs, a new headline every {args.insert_every} reads")
+    print(f"  hit ratio {cache.hit_ratio:.0%}  ({cache.stats['hits']} hits, {cache.stats['misses']} misses, "
+          f"{cache.stats['stale']} invalidated by the watermark)")
+    print(f"  uncached {uncached_seconds / args.reads * 1e3:8.2f} ms/read")
+    print(f"  cached   {cached_seconds / args.reads * 1e3:8.2f} ms/read  (of which watermark check "
+          f"{watermark_seconds / args.reads * 1e3:.2f} ms; {cache.stats['saved_seconds'] * 1e3:,.0f} ms of query "
+          f"time saved, {cache.size_bytes / 1024:,.0f} KiB cached)")
+    if stale_pages:
+        print(f"{stale_pages} reads served a stale page")
+        sys.exit(1)
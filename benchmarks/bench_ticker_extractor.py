@@ -0,0 +1,123 @@
+"""Throughput, LLM-avoidance rate and precision/recall of LocalTickerExtractor
+
+Builds an extractor over a synthetic universe (or a real one with
+--universe) and runs it over generated headlines on one core, then checks
+precision and recall on a labelled set of real-world headline shapes over a
+small universe of companies whose names are also everyday words:
+
+    python benchmarks/bench_ticker_extractor.py --companies 8000 --headlines 20000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ticker_extractor import LocalTickerExtractor, TickerUniverse
+
+FILLER = ("shares rose after the company reported quarterly results that beat estimates while "
+          "analysts raised their price target and investors weighed guidance for the coming year").split()
+
+
+LABELLED_UNIVERSE = TickerUniverse([
+    {"symbol": "TGT", "name": "Target Corporation"},
+    {"symbol": "V", "name": "Visa Inc."},
+    {"symbol": "GAP", "name": "The Gap, Inc."},
+    {"symbol": "BLK", "name": "BlackRock, Inc."},
+    {"symbol": "IVZ", "name": "Invesco Ltd."},
+    {"symbol": "AAPL", "name": "Apple Inc."},
+    {"symbol": "NVDA", "name": "NVIDIA Corporation"},
+    {"symbol": "SHEL", "name": "Shell plc"},
+    {"symbol": "XYZ", "name": "Block, Inc."},
+])
+
+# (title, summary, feed tags, tickers actually mentioned)
+LABELLED_HEADLINES = [
+    ("Fed Misses Inflation Target as Visa Applications Surge",
+     "Officials said the inflation target remains out of reach.", None, []),
+    ("Vanguard Fee Cut Puts BlackRock, Invesco In Tough Spot",
+     "Vanguard Group Inc.'s biggest salvo yet presents industry rivals with a painful choice.", None,
+     ["BLK", "IVZ"]),
+    ("Vanguard Fee Cut Puts BlackRock In Tough Spot",
+     "Vanguard Group Inc.'s biggest salvo yet presents rivals with a painful choice.", None, ["BLK"]),
+    ("Trade Gap Widens to Record", "The goods deficit grew as imports jumped.", None, []),
+    ("Target Corporation Raises Outlook", "Target said comparable sales rose 3%.", None, ["TGT"]),
+    ("Visa Beats Estimates", "Visa Inc. (NYSE: V) reported payment volume growth.", None, ["V"]),
+    ("Nvidia Rallies as NVIDIA Corporation Lifts Guidance", "Shares of the chipmaker jumped.", None, ["NVDA"]),
+    ("Shell Shock for Bond Traders", "Yields jumped after the data.", None, []),
+    ("Block Trade Lifts Small Caps", "A large block of shares changed hands.", None, []),
+    ("Apple Inc. Unveils New iPhone", "The device ships next month.", None, ["AAPL"]),
+    ("$AAPL Slides After Report", "Apple Inc. suppliers cut orders.", None, ["AAPL"]),
+    ("Gap Shares Jump", "The Gap, Inc. raised its forecast.", None, ["GAP"]),
+    ("BlackRock Inflows Hit Record", "BlackRock said ETF inflows rose.", ["BLK"], ["BLK"]),
+    ("Stocks Rise as Earnings Roll In", "Markets gained on Tuesday.", None, []),
+]
+
+
+def labelled_accuracy(extractor):
+    """Precision/recall of confident extractions and the share of labelled headlines answered locally"""
+    true_pos = false_pos = false_neg = local = 0
+    wrong = []
+    for title, summary, tags, expected in LABELLED_HEADLINES:
+        result = extractor.extract(title, summary, tags)
+        if not result.confident:
+            continue
+        local += 1
+        found, expected = set(result.tickers), set(expected)
+        true_pos += len(found & expected)
+        false_pos += len(found - expected)
+        false_neg += len(expected - found)
+        if found != expected:
+            wrong.append((title, sorted(found), sorted(expected)))
+    precision = true_pos / (true_pos + false_pos) if true_pos + false_pos else 1.0
+    recall = true_pos / (true_pos + false_neg) if true_pos + false_neg else 1.0
+    return precision, recall, local / len(LABELLED_HEADLINES), wrong
+
+
+def synthetic_universe(count, rng):
+    companies = []
+    for i in range(count):
+        symbol = "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(4)) + str(i)
+        companies.append({"symbol": symbol, "name": f"Company{i} Holdings Inc.", "sector": "Industrials"})
+    return TickerUniverse(companies)
+
+
+def make_headline(rng, universe, symbols, mention_rate):
+    words = [rng.choice(FILLER) for _ in range(40)]
+    if rng.random() < mention_rate:
+        words.insert(rng.randrange(len(words)), universe.names[rng.choice(symbols)].replace(" Holdings Inc.", ""))
+    title = " ".join(words[:12])
+    return title[0].upper() + title[1:], " ".join(words[12:])
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--universe", help="CSV/JSON ticker universe to load instead of a synthetic one")
+    arg_parser.add_argument("--companies", type=int, default=8000)
+    arg_parser.add_argument("--headlines", type=int, default=20000)
+    arg_parser.add_argument("--mention-rate", type=float, default=0.7)
+    args = arg_parser.parse_args()
+
+    rng = random.Random(3)
+    universe = TickerUniverse.load(args.universe) if args.universe else synthetic_universe(args.companies, rng)
+    symbols = list(universe.names)
+
+    start = time.perf_counter()
+    extractor = LocalTickerExtractor(universe)
+    print(f"built matcher over {len(universe)} companies in {time.perf_counter() - start:.2f}s")
+
+    headlines = [make_headline(rng, universe, symbols, args.mention_rate) for _ in range(args.headlines)]
+    start = time.perf_counter()
+    for title, summary in headlines:
+        extractor.extract(title, summary)
+    elapsed = time.perf_counter() - start
+    print(f"{len(headlines) / elapsed:,.0f} headlines/sec ({elapsed / len(headlines) * 1e6:.0f}us each)")
+    print(f"LLM avoided on {extractor.llm_avoided_ratio():.1%} of headlines {extractor.stats}")
+
+    precision, recall, local_share, wrong = labelled_accuracy(LocalTickerExtractor(LABELLED_UNIVERSE))
+    print(f"labelled set: precision {precision:.0%} recall {recall:.0%} of confident extractions, "
+          f"{local_share:.0%} answered locally")
+    # A confident result skips the LLM, so it has to be exactly right
+    assert not wrong, f"confident but wrong: {wrong}"
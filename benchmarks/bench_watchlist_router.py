@@ -0,0 +1,111 @@
+"""Entries/sec routed through WatchlistRouter vs scanning every subscriber's watchlist
+
+Subscribers follow random tickers, companies and sectors from a synthetic
+universe; entries mention a few tickers each, like analyzed headlines:
+
+    python benchmarks/bench_watchlist_router.py --subscribers 5000 --watchlist-size 200 --entries 2000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ticker_extractor import TickerUniverse
+from watchlist_router import Subscriber, WatchlistRouter, entry_symbols
+
+SECTORS = ["Technology", "Financials", "Energy", "Healthcare", "Industrials", "Utilities",
+           "Materials", "Real Estate", "Consumer Staples", "Consumer Discretionary", "Communication"]
+
+
+def make_universe(size, rng):
+    return TickerUniverse(
+        {"symbol": f"T{i:05d}", "name": f"Company {i} Inc", "sector": rng.choice(SECTORS)}
+        for i in range(size)
+    )
+
+
+def make_subscribers(count, watchlist_size, universe, rng):
+    symbols = list(universe.names)
+    subscribers = []
+    for i in range(count):
+        followed = rng.sample(symbols, watchlist_size)
+        subscribers.append(Subscriber(
+            f"pm{i}@example.com",
+            tickers=followed[: watchlist_size * 3 // 4],
+            companies=[universe.names[s] for s in followed[watchlist_size * 3 // 4:]],
+            # A few generalists follow whole sectors
+            sectors=[rng.choice(SECTORS)] if rng.random() < 0.02 else [],
+        ))
+    return subscribers
+
+
+def make_entries(count, universe, rng):
+    symbols = list(universe.names)
+    entries = []
+    for i in range(count):
+        direct = rng.sample(symbols, rng.randint(0, 3))
+        answered = rng.sample(symbols, rng.randint(0, 4))
+        entries.append({
+            "title": f"Headline {i}",
+            "source": "benchmark",
+            "companies_tickers": {"tickers_mentioned": direct,
+                                  "companies_mentioned": [universe.names[s] for s in direct]},
+            "question_and_answers": [{"question": "Q?", "answer": [{"symbol": s, "reasoning": "R"}
+                                                                   for s in answered]}],
+        })
+    return entries
+
+
+def scan_route(subscribers, entries, sectors):
+    """Baseline: check every entry against every subscriber's watchlist"""
+    routed = {}
+    for entry in entries:
+        symbols = entry_symbols(entry)
+        entry_sectors = {sectors[s] for s in symbols if s in sectors}
+        companies = {c.lower() for c in entry["companies_tickers"]["companies_mentioned"]}
+        for subscriber in subscribers:
+            if (subscriber.tickers & symbols or subscriber.sectors & entry_sectors
+                    or subscriber.companies & companies):
+                routed.setdefault(subscriber.email, []).append(entry)
+    return routed
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--universe", type=int, default=8000)
+    arg_parser.add_argument("--subscribers", type=int, default=5000)
+    arg_parser.add_argument("--watchlist-size", type=int, default=200)
+    arg_parser.add_argument("--entries", type=int, default=2000)
+    arg_parser.add_argument("--scan-entries", type=int, default=200, help="Entries routed by the slow baseline")
+    args = arg_parser.parse_args()
+
+    rng = random.Random(0)
+    universe = make_universe(args.universe, rng)
+    subscribers = make_subscribers(args.subscribers, args.watchlist_size, universe, rng)
+    entries = make_entries(args.entries, universe, rng)
+
+    start = time.perf_counter()
+    router = WatchlistRouter(subscribers, universe)
+    print(f"Indexed {len(router)} subscribers x {args.watchlist_size} watchlist items "
+          f"in {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    routed = router.route(entries)
+    elapsed = time.perf_counter() - start
+    deliveries = sum(len(v) for v in routed.values())
+    print(f"inverted index: {len(entries) / elapsed:>10,.0f} entries/sec  "
+          f"({deliveries / len(entries):.1f} deliveries per entry, {len(routed)} subscribers reached)")
+
+    sample = entries[: args.scan_entries]
+    sectors = {s: sector.lower() for s, sector in universe.sectors.items()}
+    start = time.perf_counter()
+    scanned = scan_route(subscribers, sample, sectors)
+    elapsed = time.perf_counter() - start
+    print(f"full scan:      {len(sample) / elapsed:>10,.0f} entries/sec")
+
+    indexed = router.route(sample)
+    assert {k: [e["title"] for e in v] for k, v in indexed.items()} == \
+           {k: [e["title"] for e in v] for k, v in scanned.items()}
@@ -0,0 +1,332 @@
+"""Local HTTP server replaying recorded feed payloads as if headlines were arriving live
+
+Recordings are JSON files of entry dicts, one file per feed. "rss" feeds
+(Bloomberg) are rendered as RSS 2.0 with stock-symbol categories; "json"
+feeds (FMP) are served as JSON arrays in the shape the FMP endpoints use.
+Entries are released one by one across all feeds at a fixed rate, and each
+feed serves only its newest released entries, so pollers see a realistic
+stream. Responses carry an ETag and honour If-None-Match.
+
+Record the live feeds once (needs network access and the FMP key in feeds.URLS):
+
+    python benchmarks/feed_replay_server.py --record benchmarks/recordings
+
+or serve synthetic recordings:
+
+    python benchmarks/feed_replay_server.py --synthetic 500 --rate 60
+"""
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Set
+from urllib.parse import parse_qs
+from zoneinfo import ZoneInfo
+from xml.sax.saxutils import escape
+
+# Fields kept when recording live entries, per feed format
+RECORDED_FIELDS = {
+    "rss": ("title", "summary", "link", "id", "published", "tags"),
+    "json": ("title", "text", "url", "publishedDate", "date", "symbol", "site"),
+}
+
+
+class FeedRecording:
+    """Entries of one recorded feed, oldest first"""
+
+    def __init__(self, name: str, source: str, kind: str, entries: List[Dict[str, Any]]):
+        """Create a recording
+
+        Args:
+            name: Feed name, used as the URL path
+            source: Key of feeds.URLS the feed belongs to (bloomberg, fmp, fmp_press_releases)
+            kind: "rss" or "json"
+            entries: Entry dicts, oldest first
+        """
+        self.name = name
+        self.source = source
+        self.kind = kind
+        self.entries = entries
+
+    @classmethod
+    def load(cls, path: str) -> "FeedRecording":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["name"], data["source"], data["kind"], data["entries"])
+
+    def save(self, directory: str) -> str:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.name}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"name": self.name, "source": self.source, "kind": self.kind, "entries": self.entries}, f)
+        return path
+
+
+def load_recordings(directory: str) -> List[FeedRecording]:
+    return [FeedRecording.load(os.path.join(directory, name))
+            for name in sorted(os.listdir(directory)) if name.endswith(".json")]
+
+
+def entry_title(entry: Dict[str, Any]) -> str:
+    return entry.get("title", "")
+
+
+_COMPANIES = [
+    ("Apple", "AAPL"), ("Microsoft", "MSFT"), ("Nvidia", "NVDA"), ("Amazon", "AMZN"), ("Alphabet", "GOOGL"),
+    ("Meta Platforms", "META"), ("Tesla", "TSLA"), ("JPMorgan", "JPM"), ("Goldman Sachs", "GS"),
+    ("BlackRock", "BLK"), ("Invesco", "IVZ"), ("Exxon Mobil", "XOM"), ("Chevron", "CVX"), ("Pfizer", "PFE"),
+    ("Eli Lilly", "LLY"), ("UnitedHealth", "UNH"), ("Boeing", "BA"), ("Caterpillar", "CAT"), ("Walmart", "WMT"),
+    ("Costco", "COST"), ("Netflix", "NFLX"), ("Intel", "INTC"), ("AMD", "AMD"), ("Oracle", "ORCL"),
+    ("Salesforce", "CRM"), ("Visa", "V"), ("Mastercard", "MA"), ("Ford", "F"), ("General Motors", "GM"),
+    ("Delta Air Lines", "DAL"),
+]
+_EVENTS = [
+    "beats earnings estimates", "cuts full-year guidance", "announces share buyback", "faces antitrust probe",
+    "names new chief executive", "agrees to acquire rival", "shares slump on weak demand",
+    "raises dividend", "wins government contract", "recalls vehicles", "expands in India",
+    "lays off staff", "prices bond offering", "settles patent dispute", "reports record revenue",
+]
+_WORDS = (
+    "analysts investors quarter margin outlook regulators supply chain inflation rates tariffs demand "
+    "pricing consumers factory shipments backlog capital spending cloud chips advertising subscribers "
+    "refinery output crude trial approval drug pipeline lawsuit board activist stake valuation credit "
+    "spread yields dollar euro yen emerging markets hedge funds retail traders options volatility index "
+    "futures commodities copper lithium battery software security breach outage strike union wages "
+    "housing mortgage loans deposits fintech payments travel airlines bookings freight rail shipping"
+).split()
+
+
+def synthetic_recordings(count: int, seed: int = 0) -> List[FeedRecording]:
+    """Recordings of count distinct synthetic headlines split across a Bloomberg and two FMP feeds"""
+    rng = random.Random(seed)
+    # Naive US Eastern dates like FMP's, a second apart in release order starting now, so entries are fresh
+    published = datetime.now(ZoneInfo("America/New_York")).replace(tzinfo=None, microsecond=0)
+    feeds = {
+        "bloomberg-markets": FeedRecording("bloomberg-markets", "bloomberg", "rss", []),
+        "fmp-stock-news": FeedRecording("fmp-stock-news", "fmp", "json", []),
+        "fmp-press-releases": FeedRecording("fmp-press-releases", "fmp_press_releases", "json", []),
+    }
+    names = list(feeds)
+    for i in range(count):
+        company, ticker = rng.choice(_COMPANIES)
+        title = f"{company} {rng.choice(_EVENTS)} as {' '.join(rng.sample(_WORDS, 3))} ({i})"
+        summary = f"{company} " + " ".join(rng.sample(_WORDS, 30)) + "."
+        feed = feeds[names[i % len(names)]]
+        if feed.kind == "rss":
+            feed.entries.append({
+                "title": title, "summary": summary, "link": f"https://example.com/news/{i}", "id": str(i),
+                "tags": [{"term": f"NYS:{ticker}", "scheme": "stock-symbol"}] if rng.random() < 0.5 else [],
+            })
+        else:
+            feed.entries.append({
+                "title": title, "text": summary, "url": f"https://example.com/news/{i}",
+                "symbol": ticker if rng.random() < 0.7 else "",
+                "publishedDate" if feed.source == "fmp" else "date":
+                    (published + timedelta(seconds=i)).strftime("%Y-%m-%d %H:%M:%S"),
+            })
+    return list(feeds.values())
+
+
+def render_rss(name: str, entries: List[Dict[str, Any]]) -> bytes:
+    items = []
+    for entry in entries:
+        categories = "".join(
+            f'<category domain="{escape(tag.get("scheme") or "")}">{escape(tag.get("term", ""))}</category>'
+            for tag in entry.get("tags") or []
+        )
+        items.append(
+            f"<item><title>{escape(entry.get('title', ''))}</title>"
+            f"<link>{escape(entry.get('link', ''))}</link>"
+            f"<guid>{escape(str(entry.get('id', entry.get('link', ''))))}</guid>"
+            f"<description>{escape(entry.get('summary', ''))}</description>"
+            f"<pubDate>{escape(entry.get('published') or formatdate(usegmt=True))}</pubDate>"
+            f"{categories}</item>"
+        )
+    return (f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel><title>{escape(name)}</title>'
+            f"{''.join(items)}</channel></rss>").encode("utf-8")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "FeedReplayServer"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        path, _, query = self.path.partition("?")
+        recording = self.server.recordings.get(path.strip("/"))
+        if recording is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        page = int(parse_qs(query).get("page", ["0"])[0])
+        entries = self.server.visible_entries(recording, page)
+        etag = '"' + hashlib.blake2b(
+            "\n".join(entry_title(e) for e in entries).encode("utf-8"), digest_size=8
+        ).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        self.server.mark_served(entries)
+        if recording.kind == "rss":
+            body, content_type = render_rss(recording.name, entries), "application/rss+xml"
+        else:
+            body, content_type = json.dumps(entries).encode("utf-8"), "application/json"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FeedReplayServer(ThreadingHTTPServer):
+    """Serves recordings, releasing their entries at a fixed rate"""
+
+    daemon_threads = True
+
+    def __init__(self, recordings: List[FeedRecording], headlines_per_minute: float = 120.0,
+                 window: int = 50, page_size: Optional[int] = None, host: str = "127.0.0.1", port: int = 0):
+        """Create the server (call start() to begin serving and releasing)
+
+        Args:
+            recordings: Feeds to serve
+            headlines_per_minute: Release rate across all feeds
+            window: Newest released entries each feed serves, like a real feed's item limit
+            page_size: Serve JSON feeds in pages of this many entries (URLs get ?page=0, like FMP's)
+                instead of a window, so earlier pages stay reachable
+            host: Interface to bind
+            port: Port to bind, 0 picks a free one
+        """
+        super().__init__((host, port), _Handler)
+        self.recordings = {r.name: r for r in recordings}
+        self.headlines_per_minute = headlines_per_minute
+        self.window = window
+        self.page_size = page_size
+        # Interleave the feeds so releases alternate between them
+        self._schedule = []
+        longest = max((len(r.entries) for r in recordings), default=0)
+        for i in range(longest):
+            self._schedule.extend((r.name, i) for r in recordings if i < len(r.entries))
+        self.released_at: Dict[str, float] = {}
+        self.served: Set[str] = set()
+        self._released = {r.name: 0 for r in recordings}
+        self._started_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def total(self) -> int:
+        return len(self._schedule)
+
+    def urls(self) -> Dict[str, List[str]]:
+        """Feed URLs grouped by source, in the shape of feeds.URLS"""
+        host, port = self.server_address[:2]
+        urls: Dict[str, List[str]] = {}
+        for recording in self.recordings.values():
+            url = f"http://{host}:{port}/{recording.name}"
+            if self.page_size and recording.kind == "json":
+                url += "?page=0"
+            urls.setdefault(recording.source, []).append(url)
+        return urls
+
+    def _release_due(self) -> None:
+        if self._started_at is None:
+            return
+        due = min(self.total, int((time.time() - self._started_at) * self.headlines_per_minute / 60) + 1)
+        released = len(self.released_at)
+        for name, index in self._schedule[released:due]:
+            entry = self.recordings[name].entries[index]
+            self.released_at[entry_title(entry)] = self._started_at + released * 60 / self.headlines_per_minute
+            self._released[name] = index + 1
+            released += 1
+
+    def visible_entries(self, recording: FeedRecording, page: int = 0) -> List[Dict[str, Any]]:
+        """Newest released entries of a feed (or a page of them), newest first"""
+        with self._lock:
+            self._release_due()
+            released = self._released[recording.name]
+            if self.page_size and recording.kind == "json":
+                end = max(0, released - page * self.page_size)
+                return list(reversed(recording.entries[max(0, end - self.page_size):end]))
+            return list(reversed(recording.entries[max(0, released - self.window):released]))
+
+    def mark_served(self, entries: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self.served.update(entry_title(e) for e in entries)
+
+    @property
+    def exhausted(self) -> bool:
+        """Whether every entry has been released"""
+        with self._lock:
+            self._release_due()
+            return len(self.released_at) >= self.total
+
+    def start(self) -> "FeedReplayServer":
+        self._started_at = time.time()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def record_live_feeds(directory: str) -> List[str]:
+    """Fetch the feeds in feeds.URLS once and save them as recordings"""
+    import feeds
+    from feed_fetcher import FeedFetcher
+
+    fetcher = FeedFetcher()
+    paths = []
+    try:
+        for i, result in enumerate(fetcher.fetch_all(feeds.URLS)):
+            if result.error:
+                print(f"Skipping {result.url}: {result.error}")
+                continue
+            kind = "rss" if result.source == "bloomberg" else "json"
+            entries = [{k: e[k] for k in RECORDED_FIELDS[kind] if k in e} for e in result.entries]
+            # Feeds list newest first; recordings are replayed oldest first
+            recording = FeedRecording(f"{result.source}-{i}", result.source, kind, list(reversed(entries)))
+            paths.append(recording.save(directory))
+    finally:
+        fetcher.close()
+    return paths
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--record", metavar="DIR", help="Record the live feeds into DIR and exit")
+    arg_parser.add_argument("--recordings", metavar="DIR", help="Serve the recordings in DIR")
+    arg_parser.add_argument("--synthetic", type=int, default=300, help="Synthetic headlines when no DIR is given")
+    arg_parser.add_argument("--rate", type=float, default=120.0, help="Headlines released per minute")
+    arg_parser.add_argument("--page-size", type=int, help="Serve the JSON feeds in pages of this many entries")
+    arg_parser.add_argument("--port", type=int, default=8090)
+    args = arg_parser.parse_args()
+
+    if args.record:
+        print("\n".join(record_live_feeds(args.record)))
+        sys.exit(0)
+
+    recordings = load_recordings(args.recordings) if args.recordings else synthetic_recordings(args.synthetic)
+    server = FeedReplayServer(recordings, headlines_per_minute=args.rate,
+                              page_size=args.page_size, port=args.port).start()
+    print(json.dumps(server.urls(), indent=2))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
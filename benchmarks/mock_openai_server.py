@@ -0,0 +1,254 @@
+"""Local stand-in for the OpenAI chat completions API
+
+Serves POST /v1/chat/completions with canned JSON answers shaped like the
+ones each analysis stage in main.py expects, after an injected latency
+(optionally per model). The triage and fused stages call a configurable
+fraction of headlines tradeable, picked by a hash of the title so reruns agree.
+A configurable fraction of requests fails with HTTP 500, and reported token
+usage is estimated from the request and response text (plus optional
+padding to emulate longer completions). With requests_per_minute or
+tokens_per_minute set, requests over the limit in a sliding window get a 429
+with Retry-After, like the real API. Point an OpenAI client at it with
+base_url=server.base_url.
+"""
+import json
+import random
+import threading
+import time
+import uuid
+import zlib
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+
+def _extraction_response(request: Dict[str, Any], server: "MockOpenAIServer") -> Dict[str, Any]:
+    return {"tickers_mentioned": ["BLK", "IVZ"], "companies_mentioned": ["BlackRock", "Invesco"]}
+
+
+def _questions_response(request: Dict[str, Any], server: "MockOpenAIServer") -> Dict[str, Any]:
+    return {"questions": [
+        {"question": f"Mock research question {i + 1}?"} for i in range(server.questions_per_headline)
+    ]}
+
+
+def _is_tradeable(request: Dict[str, Any], server: "MockOpenAIServer") -> bool:
+    # Keyed on the prompt's title line, so the triage and fused stages agree on a headline
+    user_prompt = next((m.get("content", "") for m in request.get("messages", []) if m.get("role") == "user"), "")
+    title = next((line.strip() for line in user_prompt.splitlines() if line.strip().startswith("Title:")), user_prompt)
+    return zlib.crc32(title.encode()) / 2 ** 32 < server.tradeable_rate
+
+
+def _triage_response(request: Dict[str, Any], server: "MockOpenAIServer") -> Dict[str, Any]:
+    return {"tradeable": _is_tradeable(request, server), "reason": "Mock triage verdict."}
+
+
+def _fused_response(request: Dict[str, Any], server: "MockOpenAIServer") -> Dict[str, Any]:
+    tradeable = _is_tradeable(request, server)
+    questions = [
+        {"question": f"Mock research question {i + 1}?", "tickers": [{"symbol": "BLK", "reasoning": "Mock reasoning."}]}
+        for i in range(server.questions_per_headline)
+    ] if tradeable else []
+    return {**_extraction_response(request, server), "tradeable": tradeable, "reason": "Mock triage verdict.",
+            "questions": questions}
+
+
+def _answer_response(request: Dict[str, Any], server: "MockOpenAIServer") -> Dict[str, Any]:
+    return {"tickers": [{"symbol": "BLK", "reasoning": "Mock reasoning."}]}
+
+
+# Ordered (system prompt marker, responder) pairs; the first marker found in
+# the system prompt picks the response, the last entry is the fallback
+RESPONDERS = [
+    ("identifying company names and stock tickers", _extraction_response),
+    ("formulating precise questions", _questions_response),
+    ("tradeable equity angle", _triage_response),
+    ("complete structured analysis", _fused_response),
+    ("", _answer_response),
+]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "MockOpenAIServer"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+
+        self.server.record_request(request)
+        retry_after = self.server.admit(request)
+        if retry_after is not None:
+            self._send_json(429, {"error": {"message": "Rate limit reached", "type": "requests",
+                                            "code": "rate_limit_exceeded"}},
+                            {"Retry-After": f"{retry_after:.3f}", "retry-after-ms": str(int(retry_after * 1000))})
+            return
+        time.sleep(self.server.model_latency.get(request.get("model"), self.server.latency))
+        if self.server.should_fail():
+            self._send_json(500, {"error": {"message": "mock server error", "type": "server_error"}})
+            return
+
+        system_prompt = next(
+            (m.get("content", "") for m in request.get("messages", []) if m.get("role") == "system"), ""
+        )
+        responder = next(fn for marker, fn in RESPONDERS if marker in system_prompt)
+        response = responder(request, self.server)
+        if self.server.extra_completion_tokens:
+            response["notes"] = " ".join(["token"] * self.server.extra_completion_tokens)
+        content = json.dumps(response)
+        usage = self.server.record_usage(request, content)
+        self._send_json(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": usage,
+        })
+
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for English text
+    return max(1, len(text) // 4)
+
+
+class MockOpenAIServer(ThreadingHTTPServer):
+    """Threaded mock OpenAI server with configurable latency, error rate and response size"""
+
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.5,
+                 questions_per_headline: int = 4, error_rate: float = 0.0,
+                 extra_completion_tokens: int = 0, seed: int = 0, requests_per_minute: int = 0,
+                 tokens_per_minute: int = 0, rate_window: float = 60.0,
+                 model_latency: Optional[Dict[str, float]] = None, tradeable_rate: float = 1.0):
+        """Create the server (call start() to begin serving)
+
+        Args:
+            host: Interface to bind
+            port: Port to bind, 0 picks a free one
+            latency: Seconds to sleep before answering each request
+            questions_per_headline: Number of questions the question stage returns
+            error_rate: Fraction of requests answered with HTTP 500
+            extra_completion_tokens: Padding tokens added to every completion
+            seed: Seed for the error injection
+            requests_per_minute: Request limit, 0 for unlimited
+            tokens_per_minute: Prompt token limit, 0 for unlimited
+            rate_window: Sliding window the limits are enforced over, in seconds; a window of w
+                admits limit * w / 60 (a short window also makes limit hits show up quickly in tests)
+            model_latency: Latency per model name, overriding latency for those models
+            tradeable_rate: Fraction of headlines the triage stage calls tradeable
+        """
+        super().__init__((host, port), _Handler)
+        self.latency = latency
+        self.model_latency = model_latency or {}
+        self.tradeable_rate = tradeable_rate
+        self.questions_per_headline = questions_per_headline
+        self.error_rate = error_rate
+        self.extra_completion_tokens = extra_completion_tokens
+        self.requests: List[Dict[str, Any]] = []
+        self.errors = 0
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.rate_window = rate_window
+        self.rate_limited = 0
+        # (admitted_at, prompt tokens) of requests inside the window
+        self._admitted: deque = deque()
+        self.usage_totals = {"prompt_tokens": 0, "completion_tokens": 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.server_address[0]}:{self.server_address[1]}/v1"
+
+    def record_request(self, request: Dict[str, Any]) -> None:
+        with self._lock:
+            self.requests.append(request)
+
+    def admit(self, request: Dict[str, Any]) -> Optional[float]:
+        """Count a request against the rate limits; seconds until retry if it is over them, else None"""
+        if not self.requests_per_minute and not self.tokens_per_minute:
+            return None
+        tokens = sum(_estimate_tokens(m.get("content") or "") for m in request.get("messages", []))
+        now = time.monotonic()
+        with self._lock:
+            while self._admitted and self._admitted[0][0] <= now - self.rate_window:
+                self._admitted.popleft()
+            scale = self.rate_window / 60
+            over_requests = self.requests_per_minute and len(self._admitted) >= self.requests_per_minute * scale
+            over_tokens = self.tokens_per_minute and (
+                sum(t for _, t in self._admitted) + tokens > self.tokens_per_minute * scale
+            )
+            if over_requests or over_tokens:
+                self.rate_limited += 1
+                oldest = self._admitted[0][0] if self._admitted else now
+                return max(0.001, oldest + self.rate_window - now)
+            self._admitted.append((now, tokens))
+            return None
+
+    def should_fail(self) -> bool:
+        with self._lock:
+            failed = self.error_rate > 0 and self._random.random() < self.error_rate
+            self.errors += failed
+            return failed
+
+    def record_usage(self, request: Dict[str, Any], content: str) -> Dict[str, int]:
+        prompt_tokens = sum(_estimate_tokens(m.get("content") or "") for m in request.get("messages", []))
+        completion_tokens = _estimate_tokens(content)
+        with self._lock:
+            self.usage_totals["prompt_tokens"] += prompt_tokens
+            self.usage_totals["completion_tokens"] += completion_tokens
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens}
+
+    def start(self) -> "MockOpenAIServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--port", type=int, default=8089)
+    arg_parser.add_argument("--latency", type=float, default=0.5)
+    arg_parser.add_argument("--error-rate", type=float, default=0.0)
+    arg_parser.add_argument("--extra-completion-tokens", type=int, default=0)
+    arg_parser.add_argument("--rpm", type=int, default=0, help="Requests per minute before answering 429")
+    arg_parser.add_argument("--tpm", type=int, default=0, help="Prompt tokens per minute before answering 429")
+    arg_parser.add_argument("--tradeable-rate", type=float, default=1.0,
+                            help="Fraction of headlines the triage stage calls tradeable")
+    args = arg_parser.parse_args()
+
+    server = MockOpenAIServer(port=args.port, latency=args.latency, error_rate=args.error_rate,
+                              extra_completion_tokens=args.extra_completion_tokens,
+                              requests_per_minute=args.rpm, tokens_per_minute=args.tpm,
+                              tradeable_rate=args.tradeable_rate)
+    print(f"Mock OpenAI server listening on {server.base_url}")
+    server.serve_forever()
@@ -0,0 +1,97 @@
+"""Local SMTP server that accepts every message and keeps it in memory
+
+Speaks just enough SMTP (EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP, QUIT)
+for smtplib, without TLS or authentication. Use it with
+PooledSMTPSender(host, port, username=None, use_tls=False).
+"""
+import email
+import socketserver
+import threading
+import time
+from email.message import Message
+from typing import Any, List, Tuple
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: "SMTPSink"
+
+    def _reply(self, line: str) -> None:
+        self.wfile.write(f"{line}\r\n".encode("ascii"))
+
+    def handle(self) -> None:
+        self.server.record_connection()
+        self._reply("220 smtp-sink ready")
+        recipients: List[str] = []
+        for raw in self.rfile:
+            command = raw.decode("utf-8", "replace").strip()
+            verb = command[:4].upper()
+            if verb in ("EHLO", "HELO"):
+                self._reply("250 smtp-sink")
+            elif verb == "MAIL":
+                recipients = []
+                self._reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(command.split(":", 1)[-1].strip(" <>"))
+                self._reply("250 OK")
+            elif verb == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                for data_line in self.rfile:
+                    if data_line in (b".\r\n", b".\n"):
+                        break
+                    # Undo dot-stuffing
+                    lines.append(data_line[1:] if data_line.startswith(b"..") else data_line)
+                self.server.record_message(recipients, email.message_from_bytes(b"".join(lines)))
+                self._reply("250 OK queued")
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                # RSET, NOOP and anything else
+                self._reply("250 OK")
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """Collects (received_at, recipients, message) for every email it is sent"""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), _Handler)
+        self.messages: List[Tuple[float, List[str], Message]] = []
+        self.connections = 0
+        self._lock = threading.Lock()
+
+    @property
+    def host(self) -> str:
+        return self.server_address[0]
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def record_connection(self) -> None:
+        with self._lock:
+            self.connections += 1
+
+    def record_message(self, recipients: List[str], message: Message) -> None:
+        with self._lock:
+            self.messages.append((time.time(), recipients, message))
+
+    def start(self) -> "SMTPSink":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def message_text(message: Any) -> str:
+    """Decoded plain-text body of a message"""
+    parts = message.walk() if message.is_multipart() else [message]
+    return "".join(
+        part.get_payload(decode=True).decode(part.get_content_charset() or "utf-8", "replace")
+        for part in parts if part.get_content_type() == "text/plain"
+    )
@@ -0,0 +1,89 @@
+"""Entry points for the news pipeline
+
+Each command imports only the modules it needs, so a tool that only
+inspects the outbox or builds indexes doesn't load the LLM client, and
+enrich doesn't load the feed fetching or the pipeline:
+
+    python cli.py poll                     # fetch, analyze, store and email headlines continuously
+    python cli.py enrich entries.json      # analyze normalized entries from a file and print JSON
+    python cli.py dashboard                # start the Streamlit dashboard
+    python cli.py ensure-indexes           # migrate legacy ids, create the news-headlines indexes
+    python cli.py outbox [--flush]         # show (or send) pending email digests
+"""
+import argparse
+import json
+import os
+import sys
+
+
+def poll(args):
+    import main
+
+    main.parse_rss_feeds()
+
+
+def enrich(args):
+    import analysis
+
+    with open(args.path, encoding="utf-8") as f:
+        entries = json.load(f)
+    analyzed = analysis.invoke_chain_of_thought_with_story_clusters(entries)
+    json.dump(analyzed, sys.stdout, indent=2, default=str)
+    print()
+
+
+def dashboard(args):
+    app_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+    os.execvp("streamlit", ["streamlit", "run", app_path, *args.streamlit_args])
+
+
+def ensure_indexes(args):
+    from mongo_adapter import MongoAdapter, NEWS_HEADLINES_INDEXES, backfill_news_headline_ids
+
+    adapter = MongoAdapter(connection_string=args.uri, database_name=args.database)
+    try:
+        print(f"Legacy ids moved to content hashes: {backfill_news_headline_ids(adapter)}")
+        print("\n".join(adapter.ensure_indexes("news-headlines", NEWS_HEADLINES_INDEXES)))
+    finally:
+        adapter.close()
+
+
+def outbox(args):
+    from email_sender import get_default_sender
+    from notification_outbox import NotificationOutbox
+
+    sender = get_default_sender()
+    box = NotificationOutbox(sender.send, args.path)
+    print(f"Pending digests: {box.queue_depth()} (oldest {box.oldest_pending_age():.0f}s)")
+    if args.flush:
+        print(f"Sent {box.drain_once(now=float('inf'))} digests")
+        sender.close()
+    box.close(flush=False)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("poll", help="Run the polling pipeline").set_defaults(run=poll)
+
+    enrich_parser = commands.add_parser("enrich", help="Analyze entries from a JSON file")
+    enrich_parser.add_argument("path", help="JSON list of entries with title, summary and source")
+    enrich_parser.set_defaults(run=enrich)
+
+    dashboard_parser = commands.add_parser("dashboard", help="Start the Streamlit dashboard")
+    dashboard_parser.add_argument("streamlit_args", nargs=argparse.REMAINDER)
+    dashboard_parser.set_defaults(run=dashboard)
+
+    indexes_parser = commands.add_parser("ensure-indexes", help="Create the news-headlines indexes")
+    indexes_parser.add_argument("--uri", default=os.getenv("MONGO_CONNECTION_STRING", "mongodb://localhost:27017"))
+    indexes_parser.add_argument("--database", default="tmcc-news")
+    indexes_parser.set_defaults(run=ensure_indexes)
+
+    outbox_parser = commands.add_parser("outbox", help="Show or send pending email digests")
+    outbox_parser.add_argument("--path", default=os.getenv("NOTIFICATION_OUTBOX_PATH", "outbox.sqlite3"))
+    outbox_parser.add_argument("--flush", action="store_true", help="Send everything pending now")
+    outbox_parser.set_defaults(run=outbox)
+
+    args = arg_parser.parse_args()
+    args.run(args)
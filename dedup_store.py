@@ -0,0 +1,220 @@
+import hashlib
+import math
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+FINGERPRINT_BYTES = 16
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def content_fingerprint(title: str, summary: str) -> bytes:
+    """Fixed-size fingerprint of an entry's title and summary
+
+    Whitespace is collapsed before hashing so cosmetic reflows of the same
+    text map to the same fingerprint.
+
+    Args:
+        title: Entry title
+        summary: Entry summary
+
+    Returns:
+        16-byte BLAKE2b digest
+    """
+    normalized = "\x1f".join(_WHITESPACE_RE.sub(" ", part or "").strip() for part in (title, summary))
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=FINGERPRINT_BYTES).digest()
+
+
+class BloomFilter:
+    """In-memory Bloom filter over fingerprints
+
+    Fingerprints are already uniform hashes, so the bit positions are sliced
+    straight out of them (double hashing) rather than rehashing.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        """Size the filter for an expected number of items
+
+        Args:
+            capacity: Expected number of stored items
+            error_rate: Target false positive rate at capacity
+        """
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, fingerprint: bytes):
+        h1 = int.from_bytes(fingerprint[:8], "little")
+        h2 = int.from_bytes(fingerprint[8:16], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, fingerprint: bytes) -> None:
+        for pos in self._positions(fingerprint):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, fingerprint: bytes) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(fingerprint))
+
+
+class DedupStore:
+    """Persistent, bounded store of already-processed entry fingerprints
+
+    Fingerprints live in a local SQLite file so they survive restarts, and
+    rows older than ttl_seconds (or beyond max_entries, oldest first) are
+    evicted. A Bloom filter rebuilt on open answers the common "definitely
+    new" case without touching SQLite.
+
+    A fingerprint added in flight stays so until confirm() is called for it,
+    once the entry has been stored. Opening the store forgets fingerprints
+    still in flight, so entries a crash caught between dedup and storage
+    read as new again.
+    """
+
+    def __init__(self, path: str = "dedup.sqlite3", ttl_seconds: float = 7 * 24 * 3600,
+                 max_entries: int = 500_000, bloom_error_rate: float = 0.01,
+                 eviction_interval_seconds: float = 3600):
+        """Open (or create) the store
+
+        Args:
+            path: SQLite database path, ":memory:" for a non-persistent store
+            ttl_seconds: Age after which a fingerprint is forgotten
+            max_entries: Hard cap on stored fingerprints
+            bloom_error_rate: False positive rate of the Bloom filter fast path
+            eviction_interval_seconds: Minimum time between maybe_evict() sweeps
+        """
+        start = time.perf_counter()
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.bloom_error_rate = bloom_error_rate
+        self.eviction_interval_seconds = eviction_interval_seconds
+        self._lock = threading.Lock()
+        self._last_eviction = 0.0
+        self.bloom: Optional[BloomFilter] = None
+        self.stats: Dict[str, int] = {"bloom_negatives": 0, "db_lookups": 0, "hits": 0, "inserts": 0, "evicted": 0}
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS fingerprints (fp BLOB PRIMARY KEY, first_seen REAL NOT NULL) WITHOUT ROWID"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS fingerprints_first_seen ON fingerprints (first_seen)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS in_flight (fp BLOB PRIMARY KEY) WITHOUT ROWID")
+        self.released_in_flight = self.conn.execute(
+            "DELETE FROM fingerprints WHERE fp IN (SELECT fp FROM in_flight)"
+        ).rowcount
+        self.conn.execute("DELETE FROM in_flight")
+        self.conn.commit()
+
+        self.evict_expired()
+        self._rebuild_bloom()
+        self.load_seconds = time.perf_counter() - start
+
+    def _rebuild_bloom(self) -> None:
+        self.bloom = BloomFilter(self.max_entries, self.bloom_error_rate)
+        for (fp,) in self.conn.execute("SELECT fp FROM fingerprints"):
+            self.bloom.add(fp)
+
+    def contains(self, title: str, summary: str) -> bool:
+        """Check whether an entry has been seen, without recording it"""
+        fp = content_fingerprint(title, summary)
+        with self._lock:
+            return self._contains_fp(fp)
+
+    def _contains_fp(self, fp: bytes) -> bool:
+        if fp not in self.bloom:
+            self.stats["bloom_negatives"] += 1
+            return False
+        self.stats["db_lookups"] += 1
+        row = self.conn.execute("SELECT 1 FROM fingerprints WHERE fp = ?", (fp,)).fetchone()
+        return row is not None
+
+    def check_and_add(self, title: str, summary: str, now: Optional[float] = None, in_flight: bool = False) -> bool:
+        """Record an entry, reporting whether it was new
+
+        Args:
+            title: Entry title
+            summary: Entry summary
+            now: Timestamp to record, defaults to time.time()
+            in_flight: Forget the fingerprint on the next open unless confirm() is called first
+
+        Returns:
+            True if the entry had not been seen before (and is now recorded)
+        """
+        fp = content_fingerprint(title, summary)
+        with self._lock:
+            if self._contains_fp(fp):
+                self.stats["hits"] += 1
+                return False
+            self.conn.execute(
+                "INSERT OR IGNORE INTO fingerprints (fp, first_seen) VALUES (?, ?)",
+                (fp, time.time() if now is None else now),
+            )
+            if in_flight:
+                self.conn.execute("INSERT OR IGNORE INTO in_flight (fp) VALUES (?)", (fp,))
+            self.conn.commit()
+            self.bloom.add(fp)
+            self.stats["inserts"] += 1
+            return True
+
+    def discard(self, title: str, summary: str) -> None:
+        """Forget an entry so it reads as new again (its Bloom bit stays set, costing one lookup)"""
+        fp = content_fingerprint(title, summary)
+        with self._lock:
+            self.conn.execute("DELETE FROM fingerprints WHERE fp = ?", (fp,))
+            self.conn.execute("DELETE FROM in_flight WHERE fp = ?", (fp,))
+            self.conn.commit()
+
+    def confirm(self, title: str, summary: str) -> None:
+        """Keep an in-flight entry's fingerprint across restarts, once the entry is stored"""
+        fp = content_fingerprint(title, summary)
+        with self._lock:
+            self.conn.execute("DELETE FROM in_flight WHERE fp = ?", (fp,))
+            self.conn.commit()
+
+    def evict_expired(self, now: Optional[float] = None) -> int:
+        """Delete fingerprints past their TTL and trim to max_entries
+
+        Args:
+            now: Reference timestamp, defaults to time.time()
+
+        Returns:
+            Number of fingerprints evicted
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            evicted = self.conn.execute(
+                "DELETE FROM fingerprints WHERE first_seen < ?", (now - self.ttl_seconds,)
+            ).rowcount
+            overflow = self.conn.execute("SELECT COUNT(*) FROM fingerprints").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                evicted += self.conn.execute(
+                    "DELETE FROM fingerprints WHERE fp IN "
+                    "(SELECT fp FROM fingerprints ORDER BY first_seen LIMIT ?)", (overflow,)
+                ).rowcount
+            self.conn.commit()
+            self._last_eviction = now
+            self.stats["evicted"] += evicted
+            # Bloom filters cannot delete; rebuild so evicted items read as new again
+            if evicted and self.bloom is not None:
+                self._rebuild_bloom()
+        return evicted
+
+    def maybe_evict(self, now: Optional[float] = None) -> int:
+        """Run evict_expired() if eviction_interval_seconds has passed since the last sweep"""
+        now = time.time() if now is None else now
+        if now - self._last_eviction < self.eviction_interval_seconds:
+            return 0
+        return self.evict_expired(now)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM fingerprints").fetchone()[0]
+
+    def close(self) -> None:
+        """Close the underlying SQLite connection"""
+        self.conn.close()
@@ -1,7 +1,9 @@
 import smtplib
+import threading
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import List
+from typing import List, Optional
 
 GMAIL_SMTP_SERVER = "smtp.gmail.com"
 GMAIL_SMTP_PORT = 587
@@ -9,37 +11,173 @@ SENDER_EMAIL = "" #Sender here
 APP_PASSWORD = "" #App password
 RECIPIENTS = [] #Recipients here
 
-def send_email(subject: str, body: str) -> bool:
+
+class PooledSMTPSender:
+    """Sends mail over a reused, authenticated SMTP session
+
+    The connection (including STARTTLS and login) is opened on first use and
+    kept for subsequent sends. A session that has been idle for longer than
+    max_idle_seconds is health-checked with NOOP first, and a send whose
+    envelope (MAIL FROM/RCPT TO) fails because the server dropped the
+    connection is retried once on a fresh one. Once DATA has started the
+    server may already have accepted the message, so a failure from then on
+    is raised without resending rather than risk a duplicate email.
+    """
+
+    def __init__(self, host: str = GMAIL_SMTP_SERVER, port: int = GMAIL_SMTP_PORT,
+                 username: Optional[str] = SENDER_EMAIL, password: Optional[str] = APP_PASSWORD,
+                 sender: str = SENDER_EMAIL, use_tls: bool = True, timeout: float = 30.0,
+                 max_idle_seconds: float = 60.0):
+        """Configure the sender (no connection is made until the first send)
+
+        Args:
+            host: SMTP server host
+            port: SMTP server port
+            username: Login user, None to skip authentication (e.g. a local SMTP sink)
+            password: Login password
+            sender: From address
+            use_tls: Upgrade the connection with STARTTLS
+            timeout: Socket timeout in seconds
+            max_idle_seconds: Idle time after which the session is checked with NOOP before use
+        """
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.sender = sender
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.max_idle_seconds = max_idle_seconds
+        self._server: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+        self.stats = {"sent": 0, "connects": 0, "reconnects": 0}
+
+    def _connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.use_tls:
+            server.starttls()
+        if self.username:
+            server.login(self.username, self.password)
+        self.stats["connects"] += 1
+        return server
+
+    def _session(self) -> smtplib.SMTP:
+        if self._server is not None and time.monotonic() - self._last_used > self.max_idle_seconds:
+            try:
+                if self._server.noop()[0] != 250:
+                    raise smtplib.SMTPServerDisconnected("NOOP failed")
+            except (smtplib.SMTPException, OSError):
+                self._drop()
+        if self._server is None:
+            self._server = self._connect()
+        return self._server
+
+    def _drop(self) -> None:
+        if self._server is not None:
+            try:
+                self._server.close()
+            except (smtplib.SMTPException, OSError):
+                pass
+        self._server = None
+
+    def _begin_transaction(self, server: smtplib.SMTP, recipients: List[str]) -> None:
+        """MAIL FROM and RCPT TO of one message; nothing of the message itself is sent yet"""
+        server.ehlo_or_helo_if_needed()
+        code, response = server.mail(self.sender)
+        if code == 421:
+            raise smtplib.SMTPServerDisconnected(f"{code} {response!r}")
+        if code != 250:
+            server.rset()
+            raise smtplib.SMTPSenderRefused(code, response, self.sender)
+        refused = {}
+        for recipient in recipients:
+            code, response = server.rcpt(recipient)
+            if code == 421:
+                raise smtplib.SMTPServerDisconnected(f"{code} {response!r}")
+            if code not in (250, 251):
+                refused[recipient] = (code, response)
+        if len(refused) == len(recipients):
+            server.rset()
+            raise smtplib.SMTPRecipientsRefused(refused)
+
+    def send(self, subject: str, body: str, recipients: Optional[List[str]] = None) -> None:
+        """Send a plain-text email, raising on failure
+
+        Args:
+            subject: Subject line of the email
+            body: Content/body of the email
+            recipients: Addresses to send to, RECIPIENTS by default
+        """
+        recipients = recipients if recipients is not None else RECIPIENTS
+        msg = MIMEMultipart()
+        msg['From'] = self.sender
+        msg['To'] = ", ".join(recipients)
+        msg['Subject'] = subject
+        msg.attach(MIMEText(body, 'plain'))
+
+        payload = msg.as_bytes()
+
+        with self._lock:
+            try:
+                try:
+                    server = self._session()
+                    self._begin_transaction(server, recipients)
+                except (smtplib.SMTPServerDisconnected, ConnectionError):
+                    # The pooled session went stale before the message was sent; retry once on a fresh connection
+                    self._drop()
+                    self.stats["reconnects"] += 1
+                    server = self._session()
+                    self._begin_transaction(server, recipients)
+                code, response = server.data(payload)
+                if code != 250:
+                    raise smtplib.SMTPDataError(code, response)
+            except Exception:
+                self._drop()
+                raise
+            self._last_used = time.monotonic()
+            self.stats["sent"] += 1
+
+    def close(self) -> None:
+        """Quit the pooled session"""
+        with self._lock:
+            if self._server is not None:
+                try:
+                    self._server.quit()
+                except (smtplib.SMTPException, OSError):
+                    pass
+            self._server = None
+
+
+_default_sender: Optional[PooledSMTPSender] = None
+_default_sender_lock = threading.Lock()
+
+
+def get_default_sender() -> PooledSMTPSender:
+    """Shared PooledSMTPSender for the Gmail settings above"""
+    global _default_sender
+    with _default_sender_lock:
+        if _default_sender is None:
+            _default_sender = PooledSMTPSender()
+        return _default_sender
+
+
+def send_email(subject: str, body: str, recipients: Optional[List[str]] = None) -> bool:
     """
     Send an email using Gmail SMTP server.
-    
+
     Args:
         subject (str): Subject line of the email
         body (str): Content/body of the email
-    
+        recipients (list, optional): Addresses to send to, RECIPIENTS by default
+
     Returns:
         bool: True if email was sent successfully, False otherwise
     """
     try:
-        # Create message container
-        msg = MIMEMultipart()
-        msg['From'] = SENDER_EMAIL
-        msg['To'] = ", ".join(RECIPIENTS)
-        msg['Subject'] = subject
-
-        # Add body to email
-        msg.attach(MIMEText(body, 'plain'))
-
-        # Create SMTP session
-        with smtplib.SMTP(GMAIL_SMTP_SERVER, GMAIL_SMTP_PORT) as server:
-            server.starttls()  # Enable TLS
-            server.login(SENDER_EMAIL, APP_PASSWORD)
-            
-            # Send email
-            server.send_message(msg)
-            
+        get_default_sender().send(subject, body, recipients)
         return True
-        
+
     except Exception as e:
         print(f"Failed to send email: {str(e)}")
-        return False 
+        return False
@@ -0,0 +1,287 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import feedparser
+import requests
+from requests.adapters import HTTPAdapter
+
+from feed_scheduler import entry_identity
+from feed_watermarks import Watermark, WatermarkStore, endpoint_key, entry_published_at, is_paginated, page_url
+
+
+class FeedResult:
+    """Outcome of fetching a single feed URL"""
+
+    def __init__(self, source: str, url: str, status: Optional[int], entries: List[Dict[str, Any]],
+                 not_modified: bool = False, error: Optional[str] = None, elapsed: float = 0.0,
+                 parse_seconds: float = 0.0, size: int = 0, retry_after: Optional[float] = None, pages: int = 1):
+        self.source = source
+        self.url = url
+        self.status = status
+        self.entries = entries
+        self.not_modified = not_modified
+        self.error = error
+        self.elapsed = elapsed
+        self.parse_seconds = parse_seconds
+        self.size = size
+        self.retry_after = retry_after
+        self.pages = pages
+
+    def __repr__(self) -> str:
+        return (f"FeedResult(source={self.source!r}, url={self.url!r}, status={self.status}, "
+                f"entries={len(self.entries)}, not_modified={self.not_modified}, error={self.error!r})")
+
+
+class FeedFetcher:
+    """Fetch RSS/JSON feeds concurrently using conditional GETs
+
+    A single requests.Session backs every fetch so connections are pooled per
+    host, and the pool is bounded by max_workers. ETag and Last-Modified
+    validators from each response are remembered per URL and replayed as
+    If-None-Match / If-Modified-Since on the next poll; a 304 short-circuits
+    parsing and yields no entries.
+
+    With a WatermarkStore, paginated feeds (URLs with a page parameter) only
+    yield entries above the endpoint's high-water mark. Page 0 is fetched
+    first; while every dated entry on the pages so far is new, the next
+    page_concurrency pages are fetched at once, up to max_pages. A page
+    without dated entries ends the walk, since it can't reach the mark. The
+    mark only advances when no page failed, and a failed walk forgets page
+    0's validators, so an interrupted catch-up is retried in full on the
+    next poll. The entries it yields are recorded as pending along with the
+    new mark and stay so until settle() is called for each; unsettled()
+    returns those a crash left behind.
+    """
+
+    def __init__(self, max_workers: int = 8, timeout: float = 10.0,
+                 timeouts: Optional[Dict[str, float]] = None, user_agent: str = "tmcc-news/1.0",
+                 watermarks: Optional[WatermarkStore] = None, max_pages: int = 10, page_concurrency: int = 3):
+        """Initialize the fetcher
+
+        Args:
+            max_workers: Maximum number of feeds fetched at once (also the connection pool size)
+            timeout: Default per-feed timeout in seconds
+            timeouts: Optional per-URL timeout overrides in seconds
+            user_agent: User-Agent header sent with every request
+            watermarks: Store of per-endpoint high-water marks; enables multi-page catch-up
+            max_pages: Most pages walked per poll of a paginated feed
+            page_concurrency: Pages of one feed fetched at once during catch-up
+        """
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.timeouts = timeouts or {}
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = user_agent
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="feed-fetch")
+        self.watermarks = watermarks
+        self.max_pages = max_pages
+        self.page_concurrency = page_concurrency
+        # Separate pool: page fetches are submitted from fetch_one, which already runs on self.executor
+        self.page_executor = ThreadPoolExecutor(max_workers=page_concurrency, thread_name_prefix="feed-page")
+        self._validators: Dict[str, Dict[str, str]] = {}
+        self._lock = threading.Lock()
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """Build the conditional request headers for a URL from stored validators"""
+        with self._lock:
+            validators = dict(self._validators.get(url, {}))
+        headers = {}
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+        return headers
+
+    def _remember_validators(self, url: str, response: requests.Response) -> None:
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return
+        with self._lock:
+            self._validators[url] = {"etag": etag or "", "last_modified": last_modified or ""}
+
+    def fetch_one(self, source: str, url: str) -> FeedResult:
+        """Fetch and parse a single feed
+
+        Args:
+            source: Source key from URLS the feed belongs to
+            url: Feed URL
+
+        Returns:
+            FeedResult with the parsed entries, or not_modified=True on a 304
+        """
+        if self.watermarks is not None and is_paginated(url):
+            return self.fetch_since_watermark(source, url)
+        return self._fetch_page(source, url)
+
+    def _fetch_page(self, source: str, url: str, conditional: bool = True) -> FeedResult:
+        timeout = self.timeouts.get(url, self.timeout)
+        headers = self.conditional_headers(url) if conditional else {}
+        try:
+            response = self.session.get(url, headers=headers, timeout=timeout)
+        except requests.RequestException as e:
+            return FeedResult(source, url, None, [], error=str(e))
+
+        elapsed = response.elapsed.total_seconds()
+        if response.status_code == 304:
+            return FeedResult(source, url, 304, [], not_modified=True, elapsed=elapsed)
+        if response.status_code != 200:
+            return FeedResult(source, url, response.status_code, [], error=f"HTTP {response.status_code}",
+                              elapsed=elapsed, retry_after=retry_after_seconds(response.headers.get("Retry-After")))
+
+        self._remember_validators(url, response)
+        size = len(response.content)
+        start = time.perf_counter()
+        try:
+            entries = parse_feed_body(response.content, response.headers.get("Content-Type", ""))
+        except ValueError as e:
+            return FeedResult(source, url, 200, [], error=str(e), elapsed=elapsed,
+                              parse_seconds=time.perf_counter() - start, size=size)
+        return FeedResult(source, url, 200, entries, elapsed=elapsed,
+                          parse_seconds=time.perf_counter() - start, size=size)
+
+    def fetch_since_watermark(self, source: str, url: str) -> FeedResult:
+        """Fetch the entries of a paginated feed above its high-water mark, walking pages as needed
+
+        Args:
+            source: Source key from URLS the feed belongs to
+            url: Feed URL with a page parameter
+
+        Returns:
+            FeedResult with only the new entries; pages is how many pages were fetched
+        """
+        key = endpoint_key(url)
+        watermark = self.watermarks.get(key)
+        first = self._fetch_page(source, url)
+        if first.error or first.not_modified:
+            return first
+
+        results = [first]
+        # Without a mark (first run) only page 0 is taken, rather than backfilling the whole archive
+        crossed = watermark is None or not _all_new(watermark, first.entries)
+        page = 1
+        while not crossed and page < self.max_pages:
+            pages = range(page, min(page + self.page_concurrency, self.max_pages))
+            futures = [self.page_executor.submit(self._fetch_page, source, page_url(url, p), False) for p in pages]
+            for future in futures:
+                result = future.result()
+                results.append(result)
+                if result.error or not _all_new(watermark, result.entries):
+                    crossed = True
+                    break
+            page += len(pages)
+        if not crossed:
+            print(f"{key}: walked {self.max_pages} pages without reaching the last seen entry, some may be missed")
+
+        entries, identities = [], set()
+        for result in results:
+            for entry in result.entries:
+                # Entries shift down a page when new ones arrive mid-walk
+                identity = entry_identity(entry)
+                if identity not in identities and (watermark is None or watermark.is_new(entry)):
+                    identities.add(identity)
+                    entries.append(entry)
+
+        error = next((r.error for r in results if r.error), None)
+        if error is None:
+            # An endpoint first seen empty has a mark below everything, so whatever it publishes next is walked
+            advanced = Watermark.advance(watermark, entries) or Watermark(0.0)
+            self.watermarks.advance(key, advanced, source, url, entries)
+        else:
+            # Page 0's validators would make the next poll a 304, so the retry would wait for page 0 to change
+            with self._lock:
+                self._validators.pop(url, None)
+            print(f"{key}: page fetch failed during catch-up ({error}), keeping the high-water mark")
+        return FeedResult(
+            source, url, 200, entries,
+            elapsed=sum(r.elapsed for r in results),
+            parse_seconds=sum(r.parse_seconds for r in results),
+            size=sum(r.size for r in results),
+            pages=len(results),
+        )
+
+    def settle(self, url: str, entry: Dict[str, Any]) -> None:
+        """Mark an entry yielded for url as handled (stored or filtered out) so it is not replayed"""
+        if self.watermarks is not None and is_paginated(url):
+            self.watermarks.settle(endpoint_key(url), entry_identity(entry))
+
+    def unsettled(self) -> List[Tuple[str, str, Dict[str, Any]]]:
+        """(source, url, entry) of paginated feed entries a previous run fetched but never settled"""
+        return self.watermarks.pending() if self.watermarks is not None else []
+
+    def fetch_all(self, urls: Dict[str, List[str]]) -> List[FeedResult]:
+        """Fetch every feed concurrently
+
+        Args:
+            urls: Mapping of source key to list of feed URLs, shaped like URLS
+
+        Returns:
+            List of FeedResult in the same order as the input URLs
+        """
+        futures = [
+            self.executor.submit(self.fetch_one, source, url)
+            for source, source_urls in urls.items()
+            for url in source_urls
+        ]
+        return [future.result() for future in futures]
+
+    def close(self) -> None:
+        """Shut down the worker pool and release pooled connections"""
+        self.executor.shutdown(wait=True)
+        self.page_executor.shutdown(wait=True)
+        self.session.close()
+
+
+def _all_new(watermark: Watermark, entries: List[Dict[str, Any]]) -> bool:
+    """Whether entries has dated entries and all of them are above watermark, so the next page may be too"""
+    # Undated entries are always new, so a page of them alone would keep the walk going to max_pages
+    dated = [entry for entry in entries if entry_published_at(entry) is not None]
+    return bool(dated) and all(watermark.is_new(entry) for entry in dated)
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header given in seconds or as an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_feed_body(body: bytes, content_type: str = "") -> List[Dict[str, Any]]:
+    """Parse a feed response body into a list of entry dicts
+
+    Bloomberg serves RSS/XML which goes through feedparser; the FMP endpoints
+    serve JSON arrays whose items are already entry-shaped.
+
+    Args:
+        body: Raw response body
+        content_type: Value of the Content-Type response header
+
+    Returns:
+        List of entry dictionaries
+    """
+    stripped = body.lstrip()
+    if "json" in content_type.lower() or stripped[:1] in (b"[", b"{"):
+        try:
+            payload = json.loads(body)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON feed body: {e}")
+        if isinstance(payload, dict):
+            payload = payload.get("content", [])
+        return [item for item in payload if isinstance(item, dict)]
+
+    feed = feedparser.parse(body)
+    return list(feed.entries)
@@ -0,0 +1,233 @@
+import math
+import random
+import threading
+import time
+from datetime import datetime, time as clock_time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from zoneinfo import ZoneInfo
+
+
+def entry_identity(entry: Dict[str, Any]) -> str:
+    """Stable identity of a feed entry, used to tell new entries from ones already seen"""
+    for key in ("id", "guid", "link", "url"):
+        value = entry.get(key)
+        if value:
+            return str(value)
+    return f"{entry.get('title', '')}\x00{entry.get('publishedDate') or entry.get('date') or entry.get('published', '')}"
+
+
+class MarketHoursProfile:
+    """Scales a feed's poll interval outside market hours
+
+    Inside the session (weekdays between open and close in the exchange's
+    timezone) the interval is used as is; outside it is multiplied by
+    off_hours_factor.
+    """
+
+    def __init__(self, open: clock_time = clock_time(9, 30), close: clock_time = clock_time(16, 0),
+                 timezone: str = "America/New_York", weekdays: Iterable[int] = range(5),
+                 off_hours_factor: float = 4.0):
+        """Create a profile
+
+        Args:
+            open: Session start, local exchange time
+            close: Session end, local exchange time
+            timezone: IANA timezone of the exchange
+            weekdays: Trading days, Monday=0
+            off_hours_factor: Interval multiplier outside the session
+        """
+        self.open = open
+        self.close = close
+        self.timezone = ZoneInfo(timezone)
+        self.weekdays = frozenset(weekdays)
+        self.off_hours_factor = off_hours_factor
+
+    def is_open(self, now: float) -> bool:
+        local = datetime.fromtimestamp(now, self.timezone)
+        return local.weekday() in self.weekdays and self.open <= local.time() < self.close
+
+    def factor(self, now: float) -> float:
+        return 1.0 if self.is_open(now) else self.off_hours_factor
+
+
+class FeedState:
+    """Polling state of one feed URL"""
+
+    def __init__(self, source: str, url: str, interval: float, next_poll_at: float):
+        self.source = source
+        self.url = url
+        self.interval = interval
+        self.next_poll_at = next_poll_at
+        self.last_poll_at: Optional[float] = None
+        # New entries and seconds observed, both decayed with age; their ratio is the publication rate
+        self.decayed_new = 0.0
+        self.decayed_seconds = 0.0
+        self.consecutive_errors = 0
+        self.seen: Optional[set] = None
+        self.polls = 0
+        self.errors = 0
+        self.new_entries = 0
+
+    @property
+    def rate(self) -> Optional[float]:
+        """Estimated new entries per second, None until two polls have been seen"""
+        return self.decayed_new / self.decayed_seconds if self.decayed_seconds > 0 else None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "source": self.source,
+            "url": self.url,
+            "interval": self.interval,
+            "next_poll_at": self.next_poll_at,
+            "rate_per_hour": self.rate * 3600 if self.rate is not None else None,
+            "consecutive_errors": self.consecutive_errors,
+            "polls": self.polls,
+            "errors": self.errors,
+            "new_entries": self.new_entries,
+        }
+
+
+class FeedScheduler:
+    """Per-feed adaptive poll intervals
+
+    Each feed's publication rate is estimated from the entries it did not
+    serve on its previous poll: new entries over elapsed time, both decayed
+    with a rate_window time constant. The next interval is
+    target_new_per_poll / rate, clamped to [min_interval, max_interval], so
+    busy feeds are polled often enough to catch each entry soon after it is
+    published while quiet feeds drift out towards max_interval. Failed polls (errors, 429s, 5xx) back
+    off exponentially up to max_backoff, honouring Retry-After when the
+    server sends one. Every interval gets +/- jitter so feeds on the same
+    host don't poll in lockstep, and an optional MarketHoursProfile per
+    source stretches intervals outside trading hours.
+
+    Time comes from clock (time.time by default), and due()/record() also
+    take an explicit now, so the scheduler can be driven by a fake clock.
+    """
+
+    def __init__(self, urls: Dict[str, List[str]], min_interval: float = 10.0, max_interval: float = 600.0,
+                 initial_interval: float = 30.0, target_new_per_poll: float = 0.1, rate_window: float = 3600.0,
+                 jitter: float = 0.1, max_backoff: float = 1800.0,
+                 profiles: Optional[Dict[str, MarketHoursProfile]] = None,
+                 clock: Callable[[], float] = time.time, seed: Optional[int] = None):
+        """Create a scheduler; every feed is due immediately
+
+        Args:
+            urls: Mapping of source key to list of feed URLs, shaped like URLS
+            min_interval: Shortest interval between polls of one feed, in seconds
+            max_interval: Longest interval between successful polls of one feed, in seconds
+            initial_interval: Interval used until a feed's rate has been estimated
+            target_new_per_poll: New entries a poll should find on average
+            rate_window: Time constant, in seconds, over which past observations fade from the rate
+            jitter: Relative random spread applied to every interval
+            max_backoff: Longest interval after repeated failures, in seconds
+            profiles: Optional MarketHoursProfile per source key
+            clock: Returns the current time in seconds since the epoch
+            seed: Seed of the jitter random generator
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.initial_interval = initial_interval
+        self.target_new_per_poll = target_new_per_poll
+        self.rate_window = rate_window
+        self.jitter = jitter
+        self.max_backoff = max_backoff
+        self.profiles = profiles or {}
+        self.clock = clock
+        self._random = random.Random(seed)
+        now = clock()
+        self.feeds: Dict[str, FeedState] = {
+            url: FeedState(source, url, initial_interval, now)
+            for source, source_urls in urls.items()
+            for url in source_urls
+        }
+        self._lock = threading.Lock()
+
+    def due(self, now: Optional[float] = None) -> Dict[str, List[str]]:
+        """Feeds whose next poll is due, shaped like URLS"""
+        now = self.clock() if now is None else now
+        due: Dict[str, List[str]] = {}
+        with self._lock:
+            for feed in self.feeds.values():
+                if feed.next_poll_at <= now:
+                    due.setdefault(feed.source, []).append(feed.url)
+        return due
+
+    def seconds_until_due(self, now: Optional[float] = None) -> float:
+        """Seconds until the next feed is due (0 if one already is)"""
+        now = self.clock() if now is None else now
+        with self._lock:
+            next_poll_at = min((feed.next_poll_at for feed in self.feeds.values()), default=now)
+        return max(0.0, next_poll_at - now)
+
+    def record(self, url: str, entries: Optional[List[Dict[str, Any]]] = None, not_modified: bool = False,
+               error: bool = False, retry_after: Optional[float] = None, now: Optional[float] = None) -> int:
+        """Record the outcome of a poll and schedule the feed's next one
+
+        Args:
+            url: Feed URL
+            entries: Entries the feed served
+            not_modified: The server answered 304
+            error: The poll failed (network error, 429, 5xx, unparsable body)
+            retry_after: Seconds the server asked us to wait, if any
+            now: Time of the poll, clock() by default
+
+        Returns:
+            int: Entries not served by the feed's previous poll
+        """
+        now = self.clock() if now is None else now
+        with self._lock:
+            feed = self.feeds[url]
+            feed.polls += 1
+            if error:
+                feed.errors += 1
+                feed.consecutive_errors += 1
+                backoff = min(self.max_backoff, feed.interval * 2 ** feed.consecutive_errors)
+                feed.next_poll_at = now + self._jittered(max(backoff, retry_after or 0.0))
+                return 0
+
+            feed.consecutive_errors = 0
+            new = 0
+            if not not_modified:
+                identities = {entry_identity(entry) for entry in entries or []}
+                # The first poll only establishes what the feed already holds
+                if feed.seen is not None:
+                    new = len(identities - feed.seen)
+                feed.seen = identities
+            if feed.last_poll_at is not None and now > feed.last_poll_at:
+                elapsed = now - feed.last_poll_at
+                decay = math.exp(-elapsed / self.rate_window)
+                feed.decayed_new = feed.decayed_new * decay + new
+                feed.decayed_seconds = feed.decayed_seconds * decay + elapsed
+            feed.last_poll_at = now
+            feed.new_entries += new
+            feed.interval = self._interval(feed, now)
+            feed.next_poll_at = now + self._jittered(feed.interval)
+            return new
+
+    def record_result(self, result: Any, now: Optional[float] = None) -> int:
+        """record() from a feed_fetcher.FeedResult"""
+        return self.record(
+            result.url, result.entries, not_modified=result.not_modified, error=result.error is not None,
+            retry_after=getattr(result, "retry_after", None), now=now,
+        )
+
+    def _interval(self, feed: FeedState, now: float) -> float:
+        if feed.rate is None:
+            interval = self.initial_interval
+        elif feed.rate <= 0:
+            interval = self.max_interval
+        else:
+            interval = self.target_new_per_poll / feed.rate
+        profile = self.profiles.get(feed.source)
+        if profile is not None:
+            interval *= profile.factor(now)
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def _jittered(self, interval: float) -> float:
+        return interval * (1 + self._random.uniform(-self.jitter, self.jitter))
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Polling state of every feed"""
+        with self._lock:
+            return [feed.snapshot() for feed in self.feeds.values()]
@@ -0,0 +1,187 @@
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone, tzinfo
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from feed_scheduler import entry_identity
+
+# Query parameters that do not identify an endpoint: the page being walked and credentials
+_IGNORED_PARAMS = frozenset({"page", "apikey"})
+_DATE_FIELDS = ("publishedDate", "date", "published")
+
+
+def is_paginated(url: str) -> bool:
+    """Whether a feed URL takes a page query parameter"""
+    return any(name == "page" for name, _ in parse_qsl(urlsplit(url).query))
+
+
+def page_url(url: str, page: int) -> str:
+    """url with its page query parameter set to page"""
+    parts = urlsplit(url)
+    query = [(name, str(page) if name == "page" else value) for name, value in parse_qsl(parts.query)]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def endpoint_key(url: str) -> str:
+    """Key identifying a paginated endpoint across pages and API keys"""
+    parts = urlsplit(url)
+    query = sorted((name, value) for name, value in parse_qsl(parts.query) if name.lower() not in _IGNORED_PARAMS)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ""))
+
+
+def entry_published_at(entry: Dict[str, Any], naive_timezone: tzinfo = timezone.utc) -> Optional[float]:
+    """Publication time of a feed entry as a timestamp, None if it has no parsable date
+
+    FMP dates carry no offset; they are read in naive_timezone. UTC (the
+    default) is wrong by a few hours but keeps them ordered within an
+    endpoint, which is all a watermark needs.
+    """
+    for field in _DATE_FIELDS:
+        value = entry.get(field)
+        if not value:
+            continue
+        try:
+            parsed = datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+        except ValueError:
+            try:
+                parsed = parsedate_to_datetime(str(value))
+            except (TypeError, ValueError):
+                continue
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=naive_timezone)
+        return parsed.timestamp()
+    return None
+
+
+class Watermark:
+    """Newest publication time seen on an endpoint, plus the identities of the entries at that time
+
+    Keeping the identities at the boundary means entries sharing the newest
+    timestamp are neither re-emitted nor skipped.
+    """
+
+    def __init__(self, published_at: float, identities: Iterable[str] = ()):
+        self.published_at = published_at
+        self.identities = set(identities)
+
+    def is_new(self, entry: Dict[str, Any]) -> bool:
+        """Whether an entry is above the watermark (undated entries always are)"""
+        published_at = entry_published_at(entry)
+        if published_at is None:
+            return True
+        if published_at != self.published_at:
+            return published_at > self.published_at
+        return entry_identity(entry) not in self.identities
+
+    @classmethod
+    def advance(cls, watermark: Optional["Watermark"], entries: List[Dict[str, Any]]) -> Optional["Watermark"]:
+        """The watermark after entries have been seen"""
+        dated = [(entry_published_at(entry), entry) for entry in entries]
+        dated = [(published_at, entry) for published_at, entry in dated if published_at is not None]
+        if not dated:
+            return watermark
+        newest = max(published_at for published_at, _ in dated)
+        identities = {entry_identity(entry) for published_at, entry in dated if published_at == newest}
+        if watermark is not None:
+            if watermark.published_at > newest:
+                return watermark
+            if watermark.published_at == newest:
+                identities |= watermark.identities
+        return cls(newest, identities)
+
+
+class WatermarkStore:
+    """Per-endpoint high-water marks persisted in SQLite so catch-up survives restarts
+
+    Entries above the old mark are recorded as pending in the same
+    transaction that advances it, and stay pending until settle() is called
+    for them. Whatever a crash leaves unsettled is returned by pending() on
+    the next start instead of being skipped by the new mark.
+    """
+
+    def __init__(self, path: str = "feed_watermarks.sqlite3"):
+        """Open (or create) the store
+
+        Args:
+            path: SQLite database path, ":memory:" for a non-persistent store
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS watermarks ("
+            "endpoint TEXT PRIMARY KEY, published_at REAL NOT NULL, identities TEXT NOT NULL, updated_at REAL NOT NULL"
+            ")"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS pending_entries ("
+            "endpoint TEXT NOT NULL, identity TEXT NOT NULL, source TEXT NOT NULL, url TEXT NOT NULL, "
+            "entry TEXT NOT NULL, fetched_at REAL NOT NULL, PRIMARY KEY (endpoint, identity)"
+            ")"
+        )
+        self.conn.commit()
+
+    def get(self, endpoint: str) -> Optional[Watermark]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT published_at, identities FROM watermarks WHERE endpoint = ?", (endpoint,)
+            ).fetchone()
+        return Watermark(row[0], json.loads(row[1])) if row else None
+
+    def set(self, endpoint: str, watermark: Watermark) -> None:
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO watermarks (endpoint, published_at, identities, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                (endpoint, watermark.published_at, json.dumps(sorted(watermark.identities)), time.time()),
+            )
+            self.conn.commit()
+
+    def advance(self, endpoint: str, watermark: Watermark, source: str, url: str,
+                entries: List[Dict[str, Any]]) -> None:
+        """Set the endpoint's mark and record entries as pending, atomically
+
+        Args:
+            endpoint: Endpoint key
+            watermark: The new mark
+            source: Source key the entries were fetched for
+            url: Feed URL the entries were fetched from
+            entries: Entries above the old mark
+        """
+        now = time.time()
+        rows = [(endpoint, entry_identity(entry), source, url, json.dumps(entry, default=str), now) for entry in entries]
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO watermarks (endpoint, published_at, identities, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                (endpoint, watermark.published_at, json.dumps(sorted(watermark.identities)), now),
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO pending_entries (endpoint, identity, source, url, entry, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self.conn.commit()
+
+    def settle(self, endpoint: str, identity: str) -> None:
+        """Forget a pending entry once it has been handled"""
+        with self._lock:
+            self.conn.execute("DELETE FROM pending_entries WHERE endpoint = ? AND identity = ?", (endpoint, identity))
+            self.conn.commit()
+
+    def pending(self) -> List[Tuple[str, str, Dict[str, Any]]]:
+        """(source, url, entry) of every unsettled entry, oldest first"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT source, url, entry FROM pending_entries ORDER BY fetched_at, rowid"
+            ).fetchall()
+        return [(source, url, json.loads(entry)) for source, url, entry in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,18 @@
+"""Feeds polled for headlines, grouped by source key"""
+
+URLS = {
+    "bloomberg": [
+        "https://feeds.bloomberg.com/markets/news.rss",
+        "https://feeds.bloomberg.com/economics/news.rss",
+        "https://feeds.bloomberg.com/technology/news.rss",
+        "https://feeds.bloomberg.com/green/news.rss"
+    ],
+    "fmp": [
+        "https://financialmodelingprep.com/api/v4/stock-news-sentiments-rss-feed?page=0&apikey=tSJPBoMv79Baig8DXj50Oky1p4oQbyhU",
+        "https://financialmodelingprep.com/api/v4/general_news?page=0&apikey=tSJPBoMv79Baig8DXj50Oky1p4oQbyhU",
+        "https://financialmodelingprep.com/api/v3/stock_news?page=0&apikey=tSJPBoMv79Baig8DXj50Oky1p4oQbyhU",
+    ],
+    "fmp_press_releases": [
+        "https://financialmodelingprep.com/api/v3/press-releases?page=0&apikey=tSJPBoMv79Baig8DXj50Oky1p4oQbyhU"
+    ]
+}
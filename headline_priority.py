@@ -0,0 +1,118 @@
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from feed_watermarks import entry_published_at
+
+# Relative value of each feed source before any other signal
+DEFAULT_SOURCE_WEIGHTS = {"bloomberg": 3.0, "fmp": 1.5, "fmp_press_releases": 0.5}
+
+# Words that tend to mark market-moving news, matched case-insensitively on word boundaries
+DEFAULT_KEYWORD_WEIGHTS = {
+    "earnings": 1.0, "guidance": 1.5, "profit warning": 2.0, "beats": 1.0, "misses": 1.0,
+    "acquire": 1.5, "acquisition": 1.5, "merger": 1.5, "takeover": 1.5, "buyout": 1.5,
+    "bankruptcy": 2.5, "chapter 11": 2.5, "default": 1.5, "downgrade": 1.0, "upgrade": 1.0,
+    "fda": 1.5, "sec": 1.0, "probe": 1.0, "lawsuit": 0.5, "recall": 1.0, "halt": 1.5,
+    "ceo": 1.0, "resigns": 1.5, "layoffs": 1.0, "buyback": 1.0, "dividend": 0.5,
+    "fed": 1.0, "rate cut": 1.5, "rate hike": 1.5, "tariff": 1.0, "sanctions": 1.0,
+}
+
+# (tier, minimum score), highest first
+DEFAULT_TIERS = (("high", 5.0), ("normal", 2.0), ("low", float("-inf")))
+# Seconds after publication (or admission, when undated) an entry of each tier is still worth a full analysis
+DEFAULT_FRESHNESS = {"high": 900, "normal": 3600, "low": 4 * 3600}
+# What happens to an entry analyzed after its deadline: "brief" analysis or "drop"
+DEFAULT_STALE_ACTIONS = {"high": "brief", "normal": "brief", "low": "drop"}
+
+
+class Assessment:
+    """Priority of one entry: its score, tier and freshness deadline"""
+
+    __slots__ = ("score", "tier", "deadline", "admitted_at", "published_at")
+
+    def __init__(self, score: float, tier: str, deadline: float, admitted_at: float,
+                 published_at: Optional[float]):
+        self.score = score
+        self.tier = tier
+        self.deadline = deadline
+        self.admitted_at = admitted_at
+        self.published_at = published_at
+
+    def __repr__(self) -> str:
+        return f"Assessment(score={self.score:.2f}, tier={self.tier!r}, deadline={self.deadline:.0f})"
+
+
+class HeadlinePrioritizer:
+    """Cheap value score for an entry, used to order LLM analysis
+
+    The score is (source weight + ticker weight if the feed tagged tickers +
+    keyword weights) decayed by age with recency_half_life. Keywords count
+    fully in the title and half in the summary. Entries are bucketed into
+    tiers by score, and each tier has a freshness deadline after which an
+    entry is downgraded to a brief analysis or dropped.
+    """
+
+    def __init__(self, urls: Dict[str, List[str]], source_weights: Optional[Dict[str, float]] = None,
+                 keyword_weights: Optional[Dict[str, float]] = None, ticker_weight: float = 2.0,
+                 recency_half_life: float = 3600.0, tiers: Tuple[Tuple[str, float], ...] = DEFAULT_TIERS,
+                 freshness: Optional[Dict[str, float]] = None, stale_actions: Optional[Dict[str, str]] = None,
+                 naive_timezone: str = "America/New_York", clock: Callable[[], float] = time.time):
+        """Create a prioritizer
+
+        Args:
+            urls: Mapping of source key to feed URLs, shaped like URLS; entries carry their feed URL as 'source'
+            source_weights: Base score per source key, DEFAULT_SOURCE_WEIGHTS by default
+            keyword_weights: Score added per keyword found, DEFAULT_KEYWORD_WEIGHTS by default
+            ticker_weight: Score added when the feed tagged the entry with tickers
+            recency_half_life: Seconds of age that halve the score
+            tiers: (tier, minimum score) pairs, highest first
+            freshness: Seconds a tier's entries stay fresh, DEFAULT_FRESHNESS by default
+            stale_actions: "brief" or "drop" per tier, DEFAULT_STALE_ACTIONS by default
+            naive_timezone: Timezone of publication dates without an offset (FMP's are US Eastern)
+            clock: Returns the current time in seconds since the epoch
+        """
+        self.source_of = {url: source for source, source_urls in urls.items() for url in source_urls}
+        self.source_weights = DEFAULT_SOURCE_WEIGHTS if source_weights is None else source_weights
+        self.ticker_weight = ticker_weight
+        self.recency_half_life = recency_half_life
+        self.tiers = tiers
+        self.freshness = DEFAULT_FRESHNESS if freshness is None else freshness
+        self.stale_actions = DEFAULT_STALE_ACTIONS if stale_actions is None else stale_actions
+        self.naive_timezone = ZoneInfo(naive_timezone)
+        self.clock = clock
+        keyword_weights = DEFAULT_KEYWORD_WEIGHTS if keyword_weights is None else keyword_weights
+        self._keyword_weights = {keyword.lower(): weight for keyword, weight in keyword_weights.items()}
+        # One alternation over every keyword, longest first so "rate cut" wins over shorter overlaps
+        self._keyword_re = re.compile(
+            r"\b(" + "|".join(re.escape(k) for k in sorted(self._keyword_weights, key=len, reverse=True)) + r")\b",
+            re.IGNORECASE,
+        ) if self._keyword_weights else None
+
+    def keyword_score(self, text: str) -> float:
+        """Sum of the weights of the distinct keywords in text"""
+        if self._keyword_re is None or not text:
+            return 0.0
+        found = {match.lower() for match in self._keyword_re.findall(text)}
+        return sum(self._keyword_weights[keyword] for keyword in found)
+
+    def assess(self, entry: Dict[str, Any], now: Optional[float] = None) -> Assessment:
+        """Score, tier and deadline of a normalized entry"""
+        now = self.clock() if now is None else now
+        published_at = entry_published_at(entry, self.naive_timezone)
+        score = self.source_weights.get(self.source_of.get(entry.get("source"), ""), 1.0)
+        if entry.get("tickers"):
+            score += self.ticker_weight
+        score += self.keyword_score(entry.get("title", "")) + 0.5 * self.keyword_score(entry.get("summary", ""))
+        if published_at is not None and self.recency_half_life:
+            score *= 0.5 ** (max(0.0, now - published_at) / self.recency_half_life)
+        tier = next((name for name, minimum in self.tiers if score >= minimum), self.tiers[-1][0])
+        anchor = published_at if published_at is not None else now
+        return Assessment(score, tier, anchor + self.freshness.get(tier, 0.0), now, published_at)
+
+    def stale_action(self, assessment: Assessment, now: Optional[float] = None) -> Optional[str]:
+        """None while the entry is fresh, else "brief" or "drop" """
+        now = self.clock() if now is None else now
+        if now <= assessment.deadline:
+            return None
+        return self.stale_actions.get(assessment.tier, "drop")
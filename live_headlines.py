@@ -0,0 +1,144 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo.errors import PyMongoError
+
+from mongo_adapter import MongoAdapter
+
+
+class HeadlineTail:
+    """Process-wide tail of newly stored headlines, shared by every dashboard session
+
+    One background thread follows the collection: a change stream of inserts
+    when the server supports it (replica sets), otherwise a poll every
+    poll_interval for documents with stored_at at or after the watermark.
+    stored_at is stamped before the BufferedWriter flushes, so a document can
+    become visible after a newer one; polls re-read lookback_seconds before
+    the watermark and drop the ids already seen. New documents get
+    increasing sequence numbers in a bounded buffer, and each session asks
+    only for what came after the last sequence number it rendered, so the
+    database load is one tail per process however many sessions are open.
+    """
+
+    def __init__(self, adapter: MongoAdapter, collection_name: str = "news-headlines",
+                 projection: Optional[Dict[str, Any]] = None, poll_interval: float = 5.0,
+                 lookback_seconds: float = 60.0, max_buffered: int = 500, use_change_stream: bool = True):
+        """Create the tail (call start() to begin following)
+
+        Args:
+            adapter: MongoAdapter to read through
+            collection_name: Collection to follow
+            projection: Fields kept of each document
+            poll_interval: Seconds between polls when no change stream is available
+            lookback_seconds: How far before the watermark each poll re-reads
+            max_buffered: Newest documents kept for sessions to catch up on
+            use_change_stream: Try a change stream before falling back to polling
+        """
+        self.adapter = adapter
+        self.collection_name = collection_name
+        self.projection = projection
+        self.poll_interval = poll_interval
+        self.lookback_seconds = lookback_seconds
+        self.use_change_stream = use_change_stream
+        self.mode = "polling"
+        self.watermark: Optional[float] = None
+        self._buffer: deque = deque(maxlen=max_buffered)
+        self._sequence = 0
+        # _id -> stored_at of documents inside the lookback window, to drop re-reads
+        self._seen: Dict[Any, float] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"polls": 0, "change_events": 0, "documents": 0, "errors": 0}
+
+    @property
+    def latest_sequence(self) -> int:
+        """Sequence number of the newest document so far (0 before any)"""
+        with self._lock:
+            return self._sequence
+
+    def start(self) -> "HeadlineTail":
+        """Set the watermark at the newest stored document and start following"""
+        if self._thread is None:
+            newest, _ = self.adapter.paginate(self.collection_name, page_size=1, projection={"stored_at": 1})
+            self.watermark = newest[0].get("stored_at") if newest else time.time()
+            # What is already stored is on the sessions' first page, not new
+            for document in self.adapter.find_since(self.collection_name, self.watermark - self.lookback_seconds,
+                                                    projection={"stored_at": 1}):
+                self._seen[document["_id"]] = document.get("stored_at") or self.watermark
+            self._thread = threading.Thread(target=self._run, name=f"headline-tail-{self.collection_name}",
+                                            daemon=True)
+            self._thread.start()
+        return self
+
+    def since(self, sequence: int) -> Tuple[List[Dict[str, Any]], int]:
+        """Documents added after sequence, newest first, and the sequence number to ask from next
+
+        A session that fell further behind than the buffer gets what is still buffered.
+        """
+        with self._lock:
+            new = [document for seq, document in self._buffer if seq > sequence]
+            return new[::-1], self._sequence
+
+    def _add(self, documents: List[Dict[str, Any]]) -> int:
+        added = 0
+        with self._lock:
+            for document in documents:
+                if document["_id"] in self._seen:
+                    continue
+                stored_at = document.get("stored_at") or time.time()
+                self._seen[document["_id"]] = stored_at
+                if self.projection is not None:
+                    document = {k: v for k, v in document.items() if k == "_id" or k in self.projection}
+                self._sequence += 1
+                self._buffer.append((self._sequence, document))
+                self.watermark = max(self.watermark or stored_at, stored_at)
+                added += 1
+            horizon = (self.watermark or 0.0) - self.lookback_seconds
+            self._seen = {doc_id: at for doc_id, at in self._seen.items() if at >= horizon}
+            self.stats["documents"] += added
+        return added
+
+    def poll_once(self) -> int:
+        """Read the documents stored since the watermark (minus the lookback); returns how many were new"""
+        since = (self.watermark if self.watermark is not None else time.time()) - self.lookback_seconds
+        documents = self.adapter.find_since(self.collection_name, since, projection=self.projection)
+        self.stats["polls"] += 1
+        return self._add(documents)
+
+    def _follow_change_stream(self) -> None:
+        with self.adapter.watch_inserts(self.collection_name) as stream:
+            self.mode = "change_stream"
+            # Catch up on anything stored between start() and the stream opening
+            self.poll_once()
+            while not self._stop.is_set():
+                change = stream.try_next()
+                if change is not None and change.get("fullDocument"):
+                    self.stats["change_events"] += 1
+                    self._add([change["fullDocument"]])
+
+    def _run(self) -> None:
+        if self.use_change_stream:
+            try:
+                self._follow_change_stream()
+                return
+            except Exception as e:
+                # Standalone servers have no change streams, and a stream can break; polling still works
+                print(f"Headline tail falling back to polling every {self.poll_interval:g}s: {e}")
+                self.mode = "polling"
+        while True:
+            try:
+                self.poll_once()
+            except PyMongoError as e:
+                self.stats["errors"] += 1
+                print(f"Headline tail poll failed: {e}")
+            if self._stop.wait(self.poll_interval):
+                return
+
+    def stop(self) -> None:
+        """Stop following"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
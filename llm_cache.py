@@ -0,0 +1,178 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Optional
+
+
+def cache_key(model: str, system_prompt: str, user_prompt: str, response_format: Optional[Dict[str, Any]] = None,
+              namespace: str = "") -> str:
+    """Content address of an LLM request
+
+    Args:
+        model: Model name
+        system_prompt: System message content
+        user_prompt: User message content
+        response_format: response_format argument sent to the API
+        namespace: Extra component (e.g. a prompt template version) mixed into the key
+
+    Returns:
+        Hex SHA-256 of the canonical JSON encoding of the request
+    """
+    payload = json.dumps([namespace, model, system_prompt, user_prompt, response_format],
+                         sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """Two-tier cache of LLM response content keyed on cache_key()
+
+    Lookups hit an in-memory LRU first and fall back to a SQLite file that
+    survives restarts. Entries expire after ttl_seconds in both tiers. Since
+    the prompt text is part of the key, editing a prompt template naturally
+    misses; invalidate() drops stale rows early and bypass skips the cache
+    altogether.
+    """
+
+    def __init__(self, path: str = "llm_cache.sqlite3", max_memory_entries: int = 2048,
+                 ttl_seconds: float = 7 * 24 * 3600, bypass: bool = False):
+        """Open (or create) the cache
+
+        Args:
+            path: SQLite database path for the persistent tier, None for memory only
+            max_memory_entries: Capacity of the in-memory LRU tier
+            ttl_seconds: Age after which cached responses are ignored
+            bypass: When True every get() misses and put() is a no-op
+        """
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.ttl_seconds = ttl_seconds
+        self.bypass = bypass
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {"memory_hits": 0, "disk_hits": 0, "misses": 0})
+
+        self.conn = None
+        if path:
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, stage TEXT NOT NULL, content TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS responses_stage ON responses (stage)")
+            self.conn.commit()
+
+    def _remember(self, key: str, stage: str, content: str, created_at: float) -> None:
+        self._memory[key] = (stage, content, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, stage: str, key: str) -> Optional[str]:
+        """Look up cached response content
+
+        Args:
+            stage: Analysis stage name, used for hit/miss accounting
+            key: Key from cache_key()
+
+        Returns:
+            Cached content, or None on a miss
+        """
+        if self.bypass:
+            return None
+        now = time.time()
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached and now - cached[2] < self.ttl_seconds:
+                self._memory.move_to_end(key)
+                self.stats[stage]["memory_hits"] += 1
+                return cached[1]
+
+            if self.conn is not None:
+                row = self.conn.execute(
+                    "SELECT content, created_at FROM responses WHERE key = ? AND created_at >= ?",
+                    (key, now - self.ttl_seconds),
+                ).fetchone()
+                if row:
+                    self._remember(key, stage, row[0], row[1])
+                    self.stats[stage]["disk_hits"] += 1
+                    return row[0]
+
+            self.stats[stage]["misses"] += 1
+            return None
+
+    def put(self, stage: str, key: str, content: str) -> None:
+        """Store response content in both tiers
+
+        Args:
+            stage: Analysis stage name
+            key: Key from cache_key()
+            content: Raw response content
+        """
+        if self.bypass:
+            return
+        now = time.time()
+        with self._lock:
+            self._remember(key, stage, content, now)
+            if self.conn is not None:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, stage, content, created_at) VALUES (?, ?, ?, ?)",
+                    (key, stage, content, now),
+                )
+                self.conn.commit()
+
+    def invalidate(self, stage: Optional[str] = None) -> int:
+        """Drop cached responses, e.g. after a prompt template change
+
+        Args:
+            stage: Only drop this stage's responses; all stages when None
+
+        Returns:
+            Number of persisted responses removed
+        """
+        with self._lock:
+            if stage is None:
+                self._memory.clear()
+            else:
+                for key in [k for k, v in self._memory.items() if v[0] == stage]:
+                    del self._memory[key]
+
+            if self.conn is None:
+                return 0
+            if stage is None:
+                removed = self.conn.execute("DELETE FROM responses").rowcount
+            else:
+                removed = self.conn.execute("DELETE FROM responses WHERE stage = ?", (stage,)).rowcount
+            self.conn.commit()
+            return removed
+
+    def purge_expired(self) -> int:
+        """Delete persisted responses older than the TTL
+
+        Returns:
+            Number of persisted responses removed
+        """
+        if self.conn is None:
+            return 0
+        with self._lock:
+            removed = self.conn.execute(
+                "DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            ).rowcount
+            self.conn.commit()
+            return removed
+
+    def hit_ratio(self, stage: Optional[str] = None) -> float:
+        """Fraction of lookups served from either tier, for one stage or overall"""
+        counters = [self.stats[stage]] if stage else list(self.stats.values())
+        hits = sum(c["memory_hits"] + c["disk_hits"] for c in counters)
+        total = hits + sum(c["misses"] for c in counters)
+        return hits / total if total else 0.0
+
+    def close(self) -> None:
+        """Close the persistent tier"""
+        if self.conn is not None:
+            self.conn.close()
@@ -0,0 +1,224 @@
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# HTTP statuses worth retrying: rate limited, request timeout/conflict, and server-side failures
+RETRYABLE_STATUSES = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+
+class LLMRequestError(Exception):
+    """An LLM request failed for good: not retryable, or out of retries"""
+
+    def __init__(self, message: str, status: Optional[int] = None, attempts: int = 1):
+        super().__init__(message)
+        self.status = status
+        self.attempts = attempts
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at rate_per_minute
+
+    The level may go negative: settle() charges the difference between an
+    estimate taken up front and the actual cost, and callers then wait for
+    the debt to be refilled.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """Create a full bucket
+
+        Args:
+            rate_per_minute: Refill rate
+            capacity: Burst size, one minute's worth by default
+            clock: Monotonic time source in seconds
+        """
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.clock = clock
+        self._level = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Take amount now and return how many seconds the caller must wait before using it"""
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill()
+            self._level -= amount
+            return max(0.0, -self._level / self.rate) if self._level < 0 else 0.0
+
+    def settle(self, amount: float) -> None:
+        """Charge (or refund, when negative) a correction to an earlier reservation"""
+        with self._lock:
+            self._refill()
+            self._level = min(self.capacity, self._level - amount)
+
+    @property
+    def level(self) -> float:
+        with self._lock:
+            self._refill()
+            return self._level
+
+
+def estimate_tokens(messages: List[Dict[str, Any]]) -> int:
+    """Rough prompt size: about four characters per token"""
+    return sum(len(m.get("content") or "") for m in messages) // 4 + 4 * len(messages)
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Delay asked for by a failed response's retry-after-ms / retry-after headers"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def is_retryable(error: Exception) -> Tuple[bool, Optional[int]]:
+    """Whether an OpenAI client error is worth retrying, and its HTTP status if it had one"""
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUSES, status
+    # Timeouts and connection failures (openai.APIConnectionError and subclasses) carry no status
+    return any(cls.__name__ == "APIConnectionError" for cls in type(error).__mro__), None
+
+
+class RateLimitedLLMClient:
+    """Chat completions through one shared OpenAI client, paced to the account's limits
+
+    Every request first reserves one request from a requests/minute bucket
+    and its estimated tokens (prompt estimate + expected_completion_tokens)
+    from a tokens/minute bucket, waiting as long as either bucket is in
+    debt; the estimate is settled against the reported usage afterwards.
+    At most max_concurrency requests are in flight. 429s, 5xx and
+    connection errors are retried with full-jitter exponential backoff,
+    never sooner than the server's Retry-After; a 429 also pauses every
+    other caller until then, so one limit hit doesn't become an error storm.
+    The OpenAI client's own retries are turned off and each request gets
+    request_timeout.
+    """
+
+    def __init__(self, client: Any, requests_per_minute: float = 500, tokens_per_minute: float = 200_000,
+                 max_concurrency: int = 8, max_retries: int = 5, base_backoff: float = 1.0,
+                 max_backoff: float = 60.0, request_timeout: float = 120.0,
+                 expected_completion_tokens: int = 500, burst_seconds: float = 1.0,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep, seed: Optional[int] = None):
+        """Create the client
+
+        Args:
+            client: OpenAI client, or a function returning it (called on first request)
+            requests_per_minute: Request budget, 0 for unlimited
+            tokens_per_minute: Token budget (prompt + completion), 0 for unlimited
+            max_concurrency: Requests in flight at once
+            max_retries: Retries after the first attempt
+            base_backoff: Backoff before the first retry, doubled per retry
+            max_backoff: Longest backoff
+            request_timeout: Per-request timeout in seconds
+            expected_completion_tokens: Completion size assumed when reserving tokens
+            burst_seconds: Seconds' worth of budget that may be spent at once; the API enforces
+                per-minute limits over shorter intervals, so bursting a full minute trips them
+            clock: Monotonic time source in seconds
+            sleep: Sleep function (swap both for a fake clock in tests)
+            seed: Seed of the backoff jitter
+        """
+        self._client_source = client
+        self._client = None
+        self.requests = TokenBucket(
+            requests_per_minute, max(1.0, requests_per_minute * burst_seconds / 60), clock
+        ) if requests_per_minute else None
+        self.tokens = TokenBucket(
+            tokens_per_minute, tokens_per_minute * burst_seconds / 60, clock
+        ) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.request_timeout = request_timeout
+        self.expected_completion_tokens = expected_completion_tokens
+        self.clock = clock
+        self.sleep = sleep
+        self._random = random.Random(seed)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+        self.stats: Dict[str, float] = {"requests": 0, "retries": 0, "rate_limited": 0, "failures": 0,
+                                        "throttled_seconds": 0.0}
+
+    @property
+    def client(self) -> Any:
+        """The OpenAI client with its own retries off and request_timeout applied"""
+        with self._lock:
+            if self._client is None:
+                source = self._client_source() if callable(self._client_source) else self._client_source
+                self._client = source.with_options(max_retries=0, timeout=self.request_timeout)
+            return self._client
+
+    def _wait_for_budget(self, estimated_tokens: int) -> None:
+        wait = 0.0
+        if self.requests is not None:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.reserve(estimated_tokens))
+        with self._lock:
+            wait = max(wait, self._paused_until - self.clock())
+            self.stats["throttled_seconds"] += max(wait, 0.0)
+        if wait > 0:
+            self.sleep(wait)
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        delay = self._random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** attempt))
+        return max(delay, retry_after or 0.0)
+
+    def create(self, **kwargs: Any) -> Tuple[Any, int]:
+        """chat.completions.create(**kwargs), paced and retried
+
+        Returns:
+            (parsed response, retries taken)
+
+        Raises:
+            LLMRequestError: The request was not retryable or ran out of retries
+        """
+        estimated_tokens = estimate_tokens(kwargs.get("messages", [])) + self.expected_completion_tokens
+        attempt = 0
+        while True:
+            self._wait_for_budget(estimated_tokens)
+            try:
+                with self._slots:
+                    with self._lock:
+                        self.stats["requests"] += 1
+                    response = self.client.chat.completions.create(**kwargs)
+            except Exception as e:
+                retryable, status = is_retryable(e)
+                retry_after = retry_after_seconds(e)
+                if status == 429:
+                    with self._lock:
+                        self.stats["rate_limited"] += 1
+                        # Hold everyone back until the server's window has passed
+                        self._paused_until = max(self._paused_until, self.clock() + (retry_after or self.base_backoff))
+                if not retryable or attempt >= self.max_retries:
+                    with self._lock:
+                        self.stats["failures"] += 1
+                    raise LLMRequestError(f"LLM request failed after {attempt + 1} attempts: {e}",
+                                          status=status, attempts=attempt + 1) from e
+                delay = self._backoff(attempt, retry_after)
+                attempt += 1
+                with self._lock:
+                    self.stats["retries"] += 1
+                self.sleep(delay)
+                continue
+
+            usage = getattr(response, "usage", None)
+            if self.tokens is not None and usage is not None and usage.total_tokens is not None:
+                self.tokens.settle(usage.total_tokens - estimated_tokens)
+            return response, attempt
@@ -1,321 +1,291 @@
 import os
-import json
 import time
-import feedparser  # Add this import for RSS parsing
-from dateutil import parser
-from openai import OpenAI
-from langchain_community.document_loaders import PyMuPDFLoader
-from textwrap import dedent
-import json
-import ast
-import random
-import tqdm
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-import pandas as pd
-import requests
-import networkx as nx
-import matplotlib.pyplot as plt
 from datetime import datetime
 
-from mongo_adapter import MongoAdapter
+import analysis
+from analysis import (
+    CHAIN_MAX_ENTRIES_IN_FLIGHT, LLM_MAX_CONCURRENT_REQUESTS, STAGE_PROMPTS, analyze_story_entry,
+    get_near_duplicates, get_ticker_extractor, headline_llm_cost, headline_llm_seconds, headline_llm_tokens,
+    llm_cost, llm_local_tokens, metrics, tracer,
+)
+from feeds import URLS
 from response_objects import BloombergResponseObject, FMPResponseObject, FMPPressReleaseResponseObject
-from email_sender import send_email
+from email_sender import get_default_sender
+from notification_outbox import NotificationOutbox
+from feed_fetcher import FeedFetcher
+from feed_scheduler import FeedScheduler, MarketHoursProfile
+from feed_watermarks import WatermarkStore
+from headline_priority import DEFAULT_TIERS, HeadlinePrioritizer
+from pipeline import Pipeline, SourceStage, Stage, print_snapshot
+from dedup_store import DedupStore, content_fingerprint
+from watchlist_router import WatchlistRouter
+from metrics import MetricsServer
+from llm_client import LLMRequestError
 
 
 
 load_dotenv()
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-openai_client = OpenAI(
-    api_key=OPENAI_API_KEY,
-)
-
-mongo_adapter = MongoAdapter(
-        connection_string="mongodb://localhost:27017",
-        database_name="tmcc-news"
-    )
-
-URLS = {
-    "bloomberg": [
-        "https://feeds.bloomberg.com/markets/news.rss",
-        "https://feeds.bloomberg.com/economics/news.rss",
-        "https://feeds.bloomberg.com/technology/news.rss",
-        "https://feeds.bloomberg.com/green/news.rss"
-    ],
-    "fmp": [
-        "https://financialmodelingprep.com/api/v4/stock-news-sentiments-rss-feed?page=0&apikey=tSJPBoMv79Baig8DXj50Oky1p4oQbyhU",
-        "https://financialmodelingprep.com/api/v4/general_news?page=0&apikey=tSJPBoMv79Baig8DXj50Oky1p4oQbyhU",
-        "https://financialmodelingprep.com/api/v3/stock_news?page=0&apikey=tSJPBoMv79Baig8DXj50Oky1p4oQbyhU",
-    ],
-    "fmp_press_releases": [
-        "https://financialmodelingprep.com/api/v3/press-releases?page=0&apikey=tSJPBoMv79Baig8DXj50Oky1p4oQbyhU"
-    ]
-}
-
-SOURCE_TO_RESPONSE_OBJECT_MAP = {
-    "bloomberg": BloombergResponseObject,
-    "fmp": FMPResponseObject,
-    "fmp_press_releases": FMPPressReleaseResponseObject
-}
-
-def determine_direct_ticker_companies_mentioned(title, summary):
-    """
-    Analyze text to extract mentioned tickers and companies.
-    """
-    prompt = f"""Analyze the following news article title and summary to identify stock tickers and company names mentioned:
-
-    Title: {title}
-    Summary: {summary}
-
-    Return your response as a JSON with two keys:
-    1. "tickers_mentioned": list of stock tickers mentioned (use actual tickers, not made up ones)
-    2. "companies_mentioned": list of company names mentioned
-
-    Only include directly mentioned companies and tickers, do not infer or speculate."""
-
-    try:
-        response = openai_client.chat.completions.create(
-            model="o1",
-            messages=[
-                {"role": "system", "content": "You are a financial analyst expert at identifying company names and stock tickers in text. Return only valid tickers."},
-                {"role": "user", "content": prompt}
-            ],
-            response_format={ "type": "json_object" }
-        )
-        return json.loads(response.choices[0].message.content.strip())
-    except Exception as e:
-        return {"tickers_mentioned": [], "companies_mentioned": []}
-    
+MONGO_CONNECTION_STRING = os.getenv("MONGO_CONNECTION_STRING", "mongodb://localhost:27017")
+MONGO_DATABASE_NAME = "tmcc-news"
 
-def invoke_question_prompter(title, summary, companies_tickers):
-    """
-    Generate relevant questions based on the article and identified companies/tickers.
-    """
-    prompt = f"""You are a fincancial research expert. Given a news headline and a corresponding description, your job is to generate thought-provoking and relevant research questions consistent with the implications around the headline. These questins will then be handed to financial analysts who will then surface answers consisting of the corresponding relevant companies which will be evaluated as potential trade / investment candidates.
-    
+# Clients are built on first use, so importing this module (tests, CLI tools)
+# doesn't pay for the pymongo import, open connections or load the subscribers;
+# the LLM clients and caches live in analysis
+mongo_adapter = None
+headline_writer = None
+notification_outbox = None
+watchlist_router = None
+_watchlist_router_loaded = False
+_clients_lock = threading.Lock()
 
-    Title: {title}
-    Summary: {summary}
 
-    Generate questions about:
-    1. Which tickers related to certain details contained in the headline might be relevant.
-    2. Any 3rd or 4th order implications around supply chain effects or downstream effects.
-    3. Sector-wide implications
-    4. Trading opportunities or risks
+def get_mongo_adapter():
+    """Shared MongoAdapter for the news database, created on first use"""
+    global mongo_adapter
+    with _clients_lock:
+        if mongo_adapter is None:
+            from mongo_adapter import MongoAdapter
 
-    Return the questions as a JSON array."""
+            mongo_adapter = MongoAdapter(connection_string=MONGO_CONNECTION_STRING, database_name=MONGO_DATABASE_NAME)
+        return mongo_adapter
 
-    try:
-        response = openai_client.chat.completions.create(
-            model="o1",
-            messages=[
-                {"role": "system", "content": "You are a financial analyst expert at formulating precise questions about market implications."},
-                {"role": "user", "content": prompt}
-            ],
-            response_format={ "type": "json_object" }
-        )
-        return json.loads(response.choices[0].message.content.strip())["questions"]
-    except Exception as e:
-        print(f"Error in invoke questions: {e}")
-        return []
-    
 
-def invoke_answer_worker(question, title, summary, companies_tickers):
+def get_headline_writer():
     """
-    Answer a specific question about market implications.
-    """
-    
-    prompt = dedent(f"""
-    You are an elite quantitative analyst at one of the world's top hedge funds. Your expertise lies in rapidly analyzing market-moving events and tertiary impacts on specific stocks and sectors. You have deep knowledge of market dynamics, company fundamentals, and how various economic factors interplay to affect companies fundamentally.
-
-    For each question, your task is to identify the specific U.S. stocks (by their ticker) that suffciently answer the question supplied in the context of investment and trading opportunities and to provide precise reasoning for that the ticker is relevant. Your analysis will be used for immediate trading decisions, so accuracy and clarity are crucial. For every relevant in-depth reasoning around a ticker you make, you earn a $1,000,000 bonus.
-
-    {question}
-
-    Rules for Analysis:
-    2. Focus on both obvious first-order effects and less obvious second/third-order impacts
-    3. Consider competitive dynamics and industry structure
-
-    Give me the exact tickers and reasoning in JSON.
-
-    RESPOND WITH RAW JSON ONLY. NO MARKDOWN. NO EXPLANATION. NO FORMATTING.
-
-    Required format:
-    {{
-        "tickers": [
-            {{
-                "symbol": "TICKER",
-                "reasoning": "Brief explanation of why"
-            }}
-        ]
-    }}
-    """).strip()
-
-    try:
-        response = openai_client.chat.completions.create(
-            model="o1",
-            messages=[
-                {"role": "system", "content": "You are a financial analyst providing specific market analysis. Only use real stock tickers."},
-                {"role": "user", "content": prompt}
-            ],
-            response_format={ "type": "json_object" }
-        )
-        return json.loads(response.choices[0].message.content.strip())
-    except Exception as e:
-        return {"tickers": [], "reason": []}
+    Shared BufferedWriter for news-headlines, created on first use.
     
-
-def invoke_evaluation_judge(merged_analysis, title, summary):
-    """
-    Evaluate and refine the merged analysis from answer workers.
+    Analyzed entries are upserted in batches keyed on a content hash; stored_at
+    keeps the time a headline was first stored. Documents the server rejects
+    go to news-headlines-dead-letter.
     """
-    prompt = f"""Review and evaluate this merged analysis of a financial news article:
-
-    Title: {title}
-    Summary: {summary}
+    global headline_writer
+    adapter = get_mongo_adapter()
+    with _clients_lock:
+        if headline_writer is None:
+            from mongo_adapter import BufferedWriter
+
+            headline_writer = BufferedWriter(
+                adapter,
+                "news-headlines",
+                key="id",
+                set_on_insert=("stored_at",),
+                max_batch_size=100,
+                max_delay_seconds=2.0,
+                on_flush=record_mongo_flush,
+                on_discard=record_mongo_discard,
+            )
+        return headline_writer
 
-    Merged Analysis:
-    {json.dumps(merged_analysis, indent=2)}
 
-    Evaluate the analysis and return a refined JSON with:
-    1. "tickers": list of the most relevant tickers (remove any that aren't strongly justified)
-    2. "reason": list of the most important and well-justified reasons
+SOURCE_TO_RESPONSE_OBJECT_MAP = {
+    "bloomberg": BloombergResponseObject,
+    "fmp": FMPResponseObject,
+    "fmp_press_releases": FMPPressReleaseResponseObject
+}
 
-    Return your evaluation as a JSON object. Remove any speculative or weakly supported points."""
+# Feeds are pulled concurrently; a slow endpoint only costs its own timeout
+FEED_FETCH_MAX_WORKERS = 8
+FEED_FETCH_TIMEOUT_SECONDS = 15
+
+# Paginated (FMP) endpoints are read down to the newest entry already seen, so
+# a burst or an outage that pushes news past page 0 is caught up on the next
+# poll; the high-water marks persist across restarts
+FEED_WATERMARKS_PATH = os.getenv("FEED_WATERMARKS_PATH", "feed_watermarks.sqlite3")
+FEED_MAX_PAGES = 10
+FEED_PAGE_CONCURRENCY = 3
+
+# Each feed is polled on its own schedule, adapted to how often it publishes
+# (see FeedScheduler); the fetch stage checks for due feeds every tick. The
+# FMP feeds slow down outside US market hours.
+FEED_SCHEDULER_TICK_SECONDS = 1
+FEED_SCHEDULE = {
+    "min_interval": 5,
+    "max_interval": 600,
+    "initial_interval": 30,
+    "target_new_per_poll": 0.1,
+    "jitter": 0.1,
+    "max_backoff": 1800,
+}
+MARKET_HOURS = MarketHoursProfile(off_hours_factor=4.0)
+FEED_PROFILES = {"fmp": MARKET_HOURS, "fmp_press_releases": MARKET_HOURS}
+
+# New entries wait for analysis in a priority queue ordered by a cheap score
+# (source, recency, feed-tagged tickers, keywords). Entries whose tier's
+# freshness deadline has passed by the time they reach the front get a brief
+# analysis (tickers and companies only) or are dropped; see headline_priority.
+HEADLINE_PRIORITY = {
+    "ticker_weight": 2.0,
+    "recency_half_life": 3600,
+    "freshness": {"high": 900, "normal": 3600, "low": 4 * 3600},
+    "stale_actions": {"high": "brief", "normal": "brief", "low": "drop"},
+}
 
+# Fingerprints of processed entries persist across restarts and age out after the TTL
+DEDUP_DB_PATH = os.getenv("DEDUP_DB_PATH", "dedup.sqlite3")
+DEDUP_TTL_SECONDS = 7 * 24 * 3600
+
+# Worker count and input queue capacity of each pipeline stage; a full queue
+# pauses the stage feeding it. Notify collects entries into one digest per
+# window (or per batch_size entries, whichever comes first).
+PIPELINE_STAGES = {
+    "normalize": {"workers": 1, "queue_size": 1000},
+    "dedup": {"workers": 1, "queue_size": 1000},
+    "enrich": {"workers": CHAIN_MAX_ENTRIES_IN_FLIGHT, "queue_size": 200},
+    "store": {"workers": 1, "queue_size": 200},
+    "notify": {"workers": 1, "queue_size": 200, "batch_size": 50, "batch_timeout": 30.0},
+}
+PIPELINE_REPORT_INTERVAL_SECONDS = 60
+# Attempts at analyzing an entry whose LLM calls still fail after the client's own retries;
+# between attempts it goes back on the enrich queue after a backoff that doubles each time
+ANALYSIS_MAX_ATTEMPTS = 3
+ANALYSIS_RETRY_BACKOFF_SECONDS = 30
+STORE_ANALYZED_ENTRIES = True
+
+# Prometheus-style metrics are served on METRICS_PORT (/metrics, 0 disables the
+# endpoint). With PIPELINE_TRACING=1 every headline also gets a trace of its
+# stage and LLM spans under /traces/<headline id>.
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+
+feed_fetch_seconds = metrics.histogram("news_feed_fetch_seconds", "Feed HTTP request latency", ["source"])
+feed_parse_seconds = metrics.histogram("news_feed_parse_seconds", "Feed body parse time", ["source"])
+feed_fetches = metrics.counter("news_feed_fetches_total", "Feed fetches by outcome", ["source", "outcome"])
+feed_poll_interval = metrics.gauge("news_feed_poll_interval_seconds", "Current adaptive poll interval",
+                                   ["source", "url"])
+feed_pages = metrics.counter("news_feed_pages_total", "Pages fetched from paginated feeds", ["source"])
+feed_entries = metrics.counter("news_feed_entries_total", "Entries parsed from feeds", ["source"])
+pipeline_stage_seconds = metrics.histogram("news_pipeline_stage_seconds", "Stage handler time per call", ["stage"])
+pipeline_queue_depth = metrics.gauge("news_pipeline_queue_depth", "Items waiting in front of each stage", ["stage"])
+dedup_results = metrics.counter("news_dedup_entries_total", "Entries seen by dedup", ["result"])
+mongo_write_seconds = metrics.histogram("news_mongo_write_seconds", "Bulk upsert batch latency", ["collection"])
+mongo_written = metrics.counter("news_mongo_documents_total", "Documents in bulk upsert batches by outcome "
+                                "(ok, error, dead_letter, dropped)", ["collection", "outcome"])
+email_send_seconds = metrics.histogram("news_email_send_seconds", "SMTP send latency")
+emails_sent = metrics.counter("news_emails_total", "Emails by outcome", ["outcome"])
+outbox_depth = metrics.gauge("news_outbox_depth", "Digests waiting in the notification outbox")
+time_to_analysis_seconds = metrics.histogram("news_time_to_analysis_seconds", "Time from dedup to analysis done, "
+                                             "per priority tier", ["tier"])
+analyses = metrics.counter("news_analyses_total", "Entries leaving the analysis queue by tier and outcome "
+                           "(full, triaged, brief, dropped, retried, failed)", ["tier", "outcome"])
+headline_seconds = metrics.histogram("news_headline_seconds", "Time from fetch to digest queued, per headline "
+                                     "(recorded with PIPELINE_TRACING=1)")
+
+
+def headline_trace_id(entry):
+    """Trace id of a headline: its content fingerprint, the same value stored as the document id"""
+    return content_fingerprint(entry['title'], entry['summary']).hex()
+
+
+def record_feed_result(result):
+    """Record the metrics of one FeedResult"""
+    if result.error:
+        outcome = "error"
+    elif result.not_modified:
+        outcome = "not_modified"
+    else:
+        outcome = "ok"
+    feed_fetches.inc(source=result.source, outcome=outcome)
+    if result.status is not None:
+        feed_fetch_seconds.observe(result.elapsed, source=result.source)
+    if outcome == "ok":
+        feed_parse_seconds.observe(result.parse_seconds, source=result.source)
+        feed_entries.inc(len(result.entries), source=result.source)
+        feed_pages.inc(result.pages, source=result.source)
+
+
+def record_mongo_flush(count, seconds, error):
+    """BufferedWriter on_flush hook for news-headlines"""
+    mongo_write_seconds.observe(seconds, collection="news-headlines")
+    mongo_written.inc(count, collection="news-headlines", outcome="error" if error else "ok")
+
+
+def record_mongo_discard(count, reason):
+    """BufferedWriter on_discard hook for news-headlines: dead-lettered or dropped documents"""
+    mongo_written.inc(count, collection="news-headlines", outcome=reason)
+
+
+def send_instrumented_email(subject, body, recipients=None):
+    """Send through the pooled SMTP sender, recording latency and outcome"""
+    start = time.perf_counter()
     try:
-        response = openai_client.chat.completions.create(
-            model="o1",
-            messages=[
-                {"role": "system", "content": "You are a senior financial analyst evaluating market analysis. Be critical and only keep well-justified points."},
-                {"role": "user", "content": prompt}
-            ],
-            response_format={ "type": "json_object" }
-        )
-        return json.loads(response.choices[0].message.content.strip())
-    except Exception as e:
-        return merged_analysis
-
-
-def invoke_chain_of_thought(entries):
-    """
-    Process news entries using a chain of GPT analyses.
-    
-    Args:
-        entries (list): List of dictionaries containing news entries
-    Returns:
-        list: List of analyzed entries with their evaluations
-    """
-    analyzed_entries = []
-    # import pdb; pdb.set_trace()
-    
-    for entry in entries:
-        
-        try:
-            # Step 1: Identify companies and tickers
-            companies_tickers = determine_direct_ticker_companies_mentioned(
-                entry['title'], 
-                entry['summary']
+        get_default_sender().send(subject, body, recipients)
+    except Exception:
+        emails_sent.inc(outcome="error")
+        raise
+    finally:
+        email_send_seconds.observe(time.perf_counter() - start)
+    emails_sent.inc(outcome="sent")
+
+
+outbox_depth.set_function(lambda: {(): notification_outbox.queue_depth()} if notification_outbox is not None else {})
+
+# Digests are queued on disk and sent by a background thread over a pooled SMTP
+# session; digests queued within the window for the same recipients go out as one email
+NOTIFICATION_OUTBOX_PATH = os.getenv("NOTIFICATION_OUTBOX_PATH", "outbox.sqlite3")
+NOTIFICATION_COALESCE_SECONDS = 30
+
+
+def get_notification_outbox():
+    """Shared NotificationOutbox, opened on first use"""
+    global notification_outbox
+    with _clients_lock:
+        if notification_outbox is None:
+            notification_outbox = NotificationOutbox(
+                send_instrumented_email,
+                NOTIFICATION_OUTBOX_PATH,
+                coalesce_window_seconds=NOTIFICATION_COALESCE_SECONDS,
             )
+        return notification_outbox
 
-            print(f"companies_tickers: {companies_tickers}")
-            
-            # Step 2: Generate questions
-            questions = invoke_question_prompter(
-                entry['title'], 
-                entry['summary'], 
-                companies_tickers
-            )
 
-            print(f"questions: {questions}")
-            
-            # Step 3: Get answers for each question
-            all_answers = []
-            entry["question_and_answers"] = []
-            for question in questions:
-                answer = invoke_answer_worker(
-                    question,
-                    entry['title'],
-                    entry['summary'],
-                    companies_tickers
-                )
-                all_answers.append(answer)
-                print(f'answer: {answer["tickers"]}')
-                entry["question_and_answers"].append({"question": question["question"], "answer": answer["tickers"]})
-                print(f'Error not in append entry!')
-            
-            print("Here loop done!")
-            # Merge all answers
-            # merged_analysis = []
-
-            # processed_tickers = set()
-            # for analysis in merged_analysis:
-            #     if analysis["ticker"] not in processed_tickers:
-            #         processed_tickers.add(analysis["ticker"])
-            #         merged_analysis.append(analysis)
-
-
-            # print(f"merged_analysis: {merged_analysis}")
-            
-            # Step 4: Final evaluation
-            # final_evaluation = invoke_evaluation_judge(
-            #     merged_analysis,
-            #     entry['title'],
-            #     entry['summary']
-            # )
-
-            # print(f"final_evaluation: {final_evaluation}")
-            print("Here!")
-            
-            # Combine all analysis into a single result
-            analyzed_entry = {
-                "title": entry['title'],
-                "summary": entry['summary'],
-                "source": entry['source'],
-                "companies_tickers": companies_tickers,
-                "question_and_answers": entry["question_and_answers"],
-                "questions": questions,
-                # "merged_analysis": merged_analysis,
-                # "final_evaluation": final_evaluation
-            }
-            print(f'Error not in assignment of analyzed_entry!')
-            
-            analyzed_entries.append(analyzed_entry)
-            
-        except Exception as e:
-            print(f"Error analyzing entry {entry['title']}: {str(e)}")
-            continue
-    
-    return analyzed_entries
+# Subscribers with ticker/company/sector watchlists each get a personalised
+# digest; without a subscribers file every digest goes to email_sender.RECIPIENTS
+SUBSCRIBERS_PATH = os.getenv("SUBSCRIBERS_PATH", "subscribers.json")
+
 
-test_entries = [
-    {'title': 'Vanguard\'s Record Fee CutPuts Rivals BlackRock, Invesco in Tough Spot', 'title_detail': {'type': 'text/plain', 'language': None, 'base': 'https://feeds.bloomberg.com/markets/news.rss', 'value': 'Vanguard\'s Record Fee CutPuts Rivals BlackRock, Invesco in Tough Spot'}, 'summary': 'Vanguard Group Inc.\'s biggest salvo yet in its campaign to cut fees for the investing masses presents industry rivals with a painful choice. Follow suit and lose potentially hundreds of millions in revenue &mdash; or hold the line and risk losing badly needed market share.', 'summary_detail': {'type': 'text/html', 'language': None, 'base': 'https://feeds.bloomberg.com/markets/news.rss', 'value': 'Vanguard Group Inc.\'s biggest salvo yet in its campaign to cut fees for the investing masses presents industry rivals with a painful choice. Follow suit and lose potentially hundreds of millions in revenue &mdash; or hold the line and risk losing badly needed market share.'}, 'links': [{'rel': 'alternate', 'type': 'text/html', 'href': 'https://www.bloomberg.com/news/articles/2025-02-05/vanguard-s-record-fee-cuts-tighten-screws-on-blackrock-invesco'}], 'link': 'https://www.bloomberg.com/news/articles/2025-02-05/vanguard-s-record-fee-cuts-tighten-screws-on-blackrock-invesco', 'id': 'https://www.bloomberg.com/news/articles/2025-02-05/vanguard-s-record-fee-cuts-tighten-screws-on-blackrock-invesco', 'guidislink': False, 'authors': [{'name': 'Katie Greifeld, Vildana Hajric'}], 'author': 'Katie Greifeld, Vildana Hajric', 'author_detail': {'name': 'Katie Greifeld, Vildana Hajric'}, 'published': 'Wed, 05 Feb 2025 14:46:46 GMT', 'tags': [{'term': 'NYS:IVZ', 'scheme': 'stock-symbol', 'label': None}, {'term': 'NYS:BLK', 'scheme': 'stock-symbol', 'label': None}], 'media_content': [{'url': 'https://assets.bwbx.io/images/users/iqjWHBFdfxIU/igTb3jvPuPtw/v1/1200x-1.jpg', 'type': 'image/jpeg'}], 'media_thumbnail': [{'url': 'https://assets.bwbx.io/images/users/iqjWHBFdfxIU/igTb3jvPuPtw/v1/1200x-1.jpg'}], 'href': '', 'content': [{'type': 'text/plain', 'language': None, 'base': 'https://feeds.bloomberg.com/markets/news.rss', 'value': 'A history of consistent cost cutting has created a sense of goodwill and loyalty among Vanguard\'s client base.'}]},
-{'title': 'Poland Re-enters Regional FX Debt Rush With Dollar Bond Offer', 'title_detail': {'type': 'text/plain', 'language': None, 'base': 'https://feeds.bloomberg.com/markets/news.rss', 'value': 'Poland Re-enters Regional FX Debt Rush With Dollar Bond Offer'}, 'summary': 'Poland is returning to international markets for a second time in as many months, selling dollar-denominated bonds as part of efforts to cover record financing needs.', 'summary_detail': {'type': 'text/html', 'language': None, 'base': 'https://feeds.bloomberg.com/markets/news.rss', 'value': 'Poland is returning to international markets for a second time in as many months, selling dollar-denominated bonds as part of efforts to cover record financing needs.'}, 'links': [{'rel': 'alternate', 'type': 'text/html', 'href': 'https://www.bloomberg.com/news/articles/2025-02-05/poland-re-enters-regional-fx-debt-rush-with-dollar-bond-offer'}], 'link': 'https://www.bloomberg.com/news/articles/2025-02-05/poland-re-enters-regional-fx-debt-rush-with-dollar-bond-offer', 'id': 'https://www.bloomberg.com/news/articles/2025-02-05/poland-re-enters-regional-fx-debt-rush-with-dollar-bond-offer', 'guidislink': False, 'authors': [{'name': 'Agnieszka Barteczko, Kevin Kingsbury'}], 'author': 'Agnieszka Barteczko, Kevin Kingsbury', 'author_detail': {'name': 'Agnieszka Barteczko, Kevin Kingsbury'}, 'published': 'Wed, 05 Feb 2025 14:43:45 GMT', 'media_content': [{'url': 'https://assets.bwbx.io/images/users/iqjWHBFdfxIU/iq7Jau_xHBVg/v0/1200x-1.jpg', 'type': 'image/jpeg'}], 'media_thumbnail': [{'url': 'https://assets.bwbx.io/images/users/iqjWHBFdfxIU/iq7Jau_xHBVg/v0/1200x-1.jpg'}], 'href': '', 'content': [{'type': 'text/plain', 'language': None, 'base': 'https://feeds.bloomberg.com/markets/news.rss', 'value': 'The Ministry of Finance, Warsaw. Source: picture alliance/Getty Images'}]},
-]
+def get_watchlist_router():
+    """Shared WatchlistRouter loaded from SUBSCRIBERS_PATH on first use, None without a subscribers file"""
+    global watchlist_router, _watchlist_router_loaded
+    universe = get_ticker_extractor().universe
+    with _clients_lock:
+        if not _watchlist_router_loaded:
+            if watchlist_router is None and os.path.exists(SUBSCRIBERS_PATH):
+                watchlist_router = WatchlistRouter.load(SUBSCRIBERS_PATH, universe)
+            _watchlist_router_loaded = True
+        return watchlist_router
 
 
-def store_analyzed_entries_in_db(analyzed_entries):
+def store_analyzed_entries_in_db(analyzed_entries, flush=False, on_stored=None):
     """
     Store the analyzed entries in MongoDB.
     
+    Entries are upserted on a content hash of title and summary, so storing
+    the same headline twice updates it instead of creating a duplicate.
+    Writes are batched by the shared headline writer.
+    
     Args:
         analyzed_entries (list): List of dictionaries containing analyzed news entries
+        flush (bool): Write the batch now instead of waiting for size/age limits
+        on_stored (callable, optional): Called with each entry once it is written; not called for
+            entries the writer drops or dead-letters
     """
-    print(f"inside store_analyzed_entries_in_db")
+    writer = get_headline_writer()
     for entry in analyzed_entries:
-        # Create a unique identifier based on title and summary
-        unique_id = f"{entry['title']}_{entry['summary']}"
-        entry["id"] = unique_id
+        # Create a compact unique identifier based on title and summary
+        entry["id"] = content_fingerprint(entry['title'], entry['summary']).hex()
         
         # Add timestamp for when this was stored
         entry['stored_at'] = time.time()
         
-        # Store in MongoDB, using upsert to avoid duplicates
-        mongo_adapter.load_items_into_collection(
-            "news-headlines",
-            items=[entry]
-        )
-        print("Inserted doc!")
+        writer.add(entry, on_written=on_stored)
+
+    if flush:
+        writer.flush()
 
 
 def format_analyzed_entries_for_email(analyzed_entries):
@@ -359,60 +329,379 @@ def format_analyzed_entries_for_email(analyzed_entries):
     return "\n".join(formatted_text)
 
 
-def parse_rss_feeds():
+def compose_digest(analyzed_entries, formatted=None):
+    """
+    Build a digest body from analyzed entries, grouped by source.
+    
+    Args:
+        analyzed_entries (list): List of dictionaries containing analyzed news entries
+        formatted (dict, optional): Cache of id(entry) -> formatted text shared across digests,
+            so an entry routed to many subscribers is formatted once
+    Returns:
+        str: Digest body
     """
-    Continuously parse RSS feeds from the URLS dictionary every second
-    and convert them to JSON format using Pydantic models.
+    formatted = {} if formatted is None else formatted
+    by_source = {}
+    for entry in analyzed_entries:
+        if id(entry) not in formatted:
+            formatted[id(entry)] = format_analyzed_entries_for_email([entry])
+        by_source.setdefault(entry['source'], []).append(formatted[id(entry)])
+    return "\n".join(f"[SOURCE = {source}] " + "\n".join(texts) for source, texts in by_source.items())
+
+
+def send_digest(analyzed_entries):
     """
-    # Set to store processed entries (title + summary pairs)
-    processed_entries = set()
+    Queue email digests of analyzed entries, grouped by source.
     
-    while True:
-        all_analyzed_entries = []
-        for source, urls in URLS.items():
-            response_object = SOURCE_TO_RESPONSE_OBJECT_MAP[source]
-            for url in urls:
-                try:
-                    # Parse the RSS feed
-                    feed = feedparser.parse(url)
-                    
-                    # Convert feed entries to Pydantic objects
-                    entries = []
-                    for entry in feed.entries: #feed.entries[:10]:
-                        # Create a unique identifier for this entry
-                        entry_id = (entry.get('title', ''), entry.get('summary', ''))
-                        
-                        # Only process if we haven't seen this entry before
-                        if entry_id not in processed_entries:
-                            # Create a Pydantic model instance
-                            entry_data = response_object.from_feed_entry(entry, url)
-                            if not entry_data:
-                                continue
-
-                            entries.append(entry_data.model_dump())  # Convert to dict for further processing
-                            processed_entries.add(entry_id)
-                    
-                    if entries:  # Only print if we have new entries
-                        # Get detailed analysis
-                        analyzed_entries = invoke_chain_of_thought(entries)
-                        print(f"\nFound and analyzed {len(entries)} new entries from {source}: {url}")
-                        
-                        # Store the analyzed entries in MongoDB
-                        # store_analyzed_entries_in_db(analyzed_entries)
-                        # import pdb; pdb.set_trace()
-
-                        if len(analyzed_entries) == 0:
-                            continue
-                        
-                        formatted_entries = format_analyzed_entries_for_email(analyzed_entries)
-                        all_analyzed_entries.append(f"[SOURCE = {source}] {formatted_entries}")
-                    
-                except Exception as e:
-                    print(f"Error parsing {source} feed {url}: {str(e)}")
-        
-        if len(all_analyzed_entries) > 0:
-            send_email(subject=f"Processed headlines batch: {datetime.now()}", body="\n".join(all_analyzed_entries))
-            time.sleep(10)
+    With a watchlist router (see get_watchlist_router) each subscriber gets a digest of only the entries
+    matching their watchlists; without one a single digest goes to the
+    default recipients. Digests are written to the notification outbox and sent
+    in the background, so the pipeline never waits on SMTP. Near-duplicates
+    of stories that were already analyzed are left out.
+    
+    Args:
+        analyzed_entries (list): List of dictionaries containing analyzed news entries
+    """
+    entries = [entry for entry in analyzed_entries if not entry.get("near_duplicate_of")]
+    if not entries:
+        return
+
+    outbox = get_notification_outbox()
+    subject = f"Processed headlines batch: {datetime.now()}"
+    router = get_watchlist_router()
+    if router is None:
+        outbox.enqueue(subject=subject, body=compose_digest(entries))
+        return
+
+    formatted = {}
+    outbox.enqueue_many([
+        (subject, compose_digest(matched, formatted), [email])
+        for email, matched in router.route(entries).items()
+    ])
+
+
+def report_pipeline_stats(snapshot):
+    """
+    Print per-stage pipeline stats along with extraction, LLM cache and outbox counters.
+    """
+    print_snapshot(snapshot)
+    print(f"LLM cost so far: ${llm_cost.total():.4f}")
+    for decided_by in ("relevance_triage", "answer_worker", "fused_analysis"):
+        count = headline_llm_cost.count(decided_by=decided_by)
+        if count:
+            print(f"Headlines decided by {decided_by}: {count}, mean LLM "
+                  f"{headline_llm_seconds.sum(decided_by=decided_by) / count:.1f}s "
+                  f"{headline_llm_tokens.sum(decided_by=decided_by) / count:.0f} tokens "
+                  f"${headline_llm_cost.sum(decided_by=decided_by) / count:.4f}")
+    for tier, _ in HEADLINE_PRIORITY.get("tiers", DEFAULT_TIERS):
+        count = time_to_analysis_seconds.count(tier=tier)
+        if count:
+            print(f"Time to analysis [{tier}]: {count} entries, "
+                  f"mean {time_to_analysis_seconds.sum(tier=tier) / count:.1f}s")
+    for stage in STAGE_PROMPTS:
+        prompt_tokens = llm_local_tokens.value(stage=stage, kind="prompt")
+        if prompt_tokens:
+            print(f"LLM tokens [{stage}]: prompt {prompt_tokens:.0f} "
+                  f"completion {llm_local_tokens.value(stage=stage, kind='completion'):.0f}")
+    if analysis.llm_client is not None:
+        print(f"LLM client: {analysis.llm_client.stats}")
+    if analysis.ticker_extractor is not None:
+        print(f"Ticker extraction: {analysis.ticker_extractor.stats} "
+              f"LLM avoided {analysis.ticker_extractor.llm_avoided_ratio():.0%}")
+    if analysis.llm_cache is not None:
+        for stage, counters in analysis.llm_cache.stats.items():
+            print(f"LLM cache [{stage}]: {counters} hit ratio {analysis.llm_cache.hit_ratio(stage):.0%}")
+    if notification_outbox is not None:
+        print(f"Notification outbox: depth {notification_outbox.queue_depth()} "
+              f"oldest {notification_outbox.oldest_pending_age():.0f}s {notification_outbox.stats}")
+
+
+def build_pipeline(fetcher, dedup_store, urls=None, poll_interval=None, notify=None, store=None,
+                   stage_config=None, report_interval=None, scheduler=None, prioritizer=None):
+    """
+    Wire the fetch → normalize → dedup → enrich → store → notify pipeline.
+    
+    Args:
+        fetcher (FeedFetcher): Fetches the feeds each poll
+        dedup_store (DedupStore): Store of processed entry fingerprints
+        urls (dict, optional): Feeds to poll, URLS by default
+        poll_interval (float, optional): Seconds between checks for due feeds, FEED_SCHEDULER_TICK_SECONDS
+            by default
+        notify (callable, optional): Called with each digest batch, send_digest by default
+        store (callable, optional): Called with each analyzed entry list and on_stored, a callback
+            to call with each entry once it is written; store_analyzed_entries_in_db by default
+            (skipped when STORE_ANALYZED_ENTRIES is off)
+        stage_config (dict, optional): Per-stage overrides of PIPELINE_STAGES
+        report_interval (float, optional): Seconds between stats reports
+        scheduler (FeedScheduler, optional): Decides when each feed is polled, built from FEED_SCHEDULE
+            and FEED_PROFILES by default
+        prioritizer (HeadlinePrioritizer, optional): Orders and ages entries waiting for analysis,
+            built from HEADLINE_PRIORITY by default
+    Returns:
+        Pipeline: The pipeline, ready to run
+    """
+    urls = urls or URLS
+    scheduler = scheduler or FeedScheduler(urls, profiles=FEED_PROFILES, **FEED_SCHEDULE)
+    prioritizer = prioritizer or HeadlinePrioritizer(urls, **HEADLINE_PRIORITY)
+    notify = notify or send_digest
+    if store is None and STORE_ANALYZED_ENTRIES:
+        store = store_analyzed_entries_in_db
+    config = {name: {**options, **(stage_config or {}).get(name, {})} for name, options in PIPELINE_STAGES.items()}
+    answer_executor = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENT_REQUESTS, thread_name_prefix="chain-answer")
+
+    # Fetch and normalize spans of each entry, recorded only once dedup accepts it so
+    # later polls of an already processed headline do not extend its trace
+    pending_spans = {}
+    # Priority assessment of each entry between dedup and enrich
+    assessments = {}
+    # Failed analysis attempts of each entry waiting to be retried
+    analysis_attempts = {}
+    # Feed URL and raw entry behind each headline between normalize and storage, settled with
+    # the fetcher once the headline is written or filtered out
+    held = {}
+    # Settling also runs on the headline writer's flush thread
+    held_lock = threading.Lock()
+    # Paginated feed entries a previous run fetched past the watermark but never settled
+    replay = fetcher.unsettled()
+
+    def instrumented(name, handler, trace=True):
+        # Times every handler call and, with tracing on, records a span on each headline it handled
+        def run(item):
+            started_at, start = time.time(), time.perf_counter()
+            result = handler(item)
+            pipeline_stage_seconds.observe(time.perf_counter() - start, stage=name)
+            if tracer.enabled and trace:
+                handled = result if isinstance(result, dict) else item
+                for entry in handled if isinstance(handled, list) else [handled]:
+                    if isinstance(entry, dict):
+                        tracer.record(headline_trace_id(entry), name, started_at, time.time())
+            return result
+        return run
+
+    def settle(entry):
+        # Tell the fetcher one raw entry behind this headline is handled, so a restart doesn't replay it
+        with held_lock:
+            raw_entries = held.get(headline_trace_id(entry))
+            if not raw_entries:
+                return
+            url, raw_entry = raw_entries.pop()
+            if not raw_entries:
+                del held[headline_trace_id(entry)]
+        fetcher.settle(url, raw_entry)
+
+    def finish(entry):
+        # The headline is stored, or deliberately left unanalyzed: keep its fingerprint across restarts
+        dedup_store.confirm(entry['title'], entry['summary'])
+        settle(entry)
+
+    def fetch():
+        dedup_store.maybe_evict()
+        get_near_duplicates().prune()
+        items = []
+        if replay:
+            replayed_at = time.time()
+            for source, url, raw_entry in replay:
+                entry_data = SOURCE_TO_RESPONSE_OBJECT_MAP[source].from_feed_entry(raw_entry, url)
+                if entry_data is not None:
+                    # Fingerprinted by the previous run but never stored, so dedup has to let it through again
+                    entry = entry_data.model_dump()
+                    dedup_store.discard(entry['title'], entry['summary'])
+                items.append((source, url, raw_entry, replayed_at, replayed_at))
+            print(f"Replaying {len(replay)} entries fetched but not stored by the previous run")
+            replay.clear()
+        due = scheduler.due()
+        if not due:
+            return items
+        polled_at = time.time()
+        for result in fetcher.fetch_all(due):
+            scheduler.record_result(result)
+            record_feed_result(result)
+            if result.error:
+                print(f"Error fetching {result.source} feed {result.url}: {result.error}")
+            elif not result.not_modified:
+                fetched_at = time.time()
+                items.extend((result.source, result.url, raw_entry, polled_at, fetched_at)
+                             for raw_entry in result.entries)
+        return items
+
+    def normalize(item):
+        source, url, raw_entry, polled_at, fetched_at = item
+        started_at = time.time()
+        entry_data = SOURCE_TO_RESPONSE_OBJECT_MAP[source].from_feed_entry(raw_entry, url)
+        if entry_data is None:
+            fetcher.settle(url, raw_entry)
+            return None
+        entry = entry_data.model_dump()
+        with held_lock:
+            held.setdefault(headline_trace_id(entry), []).append((url, raw_entry))
+        if tracer.enabled:
+            pending_spans[headline_trace_id(entry)] = [
+                ("fetch", polled_at, fetched_at, {"source": source}),
+                ("normalize", started_at, time.time(), {}),
+            ]
+        return entry
+
+    def dedup(entry):
+        spans = pending_spans.pop(headline_trace_id(entry), ()) if tracer.enabled else ()
+        # Only process if we haven't seen this entry before; in flight until stored, so a crash
+        # before then doesn't leave it marked as processed
+        if dedup_store.check_and_add(entry['title'], entry['summary'], in_flight=True):
+            dedup_results.inc(result="new")
+            for name, start, end, attributes in spans:
+                tracer.record(headline_trace_id(entry), name, start, end, **attributes)
+            assessments[headline_trace_id(entry)] = prioritizer.assess(entry)
+            return entry
+        dedup_results.inc(result="duplicate")
+        settle(entry)
+        return None
+
+    def analysis_priority(entry):
+        assessment = assessments.get(headline_trace_id(entry))
+        return -assessment.score if assessment is not None else 0.0
+
+    def enrich(entry):
+        trace_id = headline_trace_id(entry)
+        assessment = assessments.pop(trace_id, None) or prioritizer.assess(entry)
+        failed_attempts = analysis_attempts.pop(trace_id, 0)
+        stale_action = prioritizer.stale_action(assessment)
+        if stale_action == "drop":
+            analyses.inc(tier=assessment.tier, outcome="dropped")
+            finish(entry)
+            return None
+        try:
+            with tracer.use_trace(trace_id if tracer.enabled else None):
+                analyzed_entry = analyze_story_entry(entry, answer_executor, brief=stale_action == "brief")
+        except LLMRequestError as e:
+            attempt = failed_attempts + 1
+            if attempt < ANALYSIS_MAX_ATTEMPTS:
+                # Back on the enrich queue, keeping its assessment so it ages from the original admission
+                analysis_attempts[trace_id] = attempt
+                assessments[trace_id] = assessment
+                delay = ANALYSIS_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1)
+                analyses.inc(tier=assessment.tier, outcome="retried")
+                print(f"Analysis attempt {attempt} of {ANALYSIS_MAX_ATTEMPTS} failed for {entry['title']!r}, "
+                      f"retrying in {delay:.0f}s: {e}")
+                pipeline.requeue("enrich", entry, delay)
+                return None
+            # Rather than store an empty analysis, give up on the entry: a paginated feed entry stays
+            # unsettled so the next start replays it, and forgetting its fingerprint lets an RSS feed
+            # that still lists it after it next changes bring it back
+            dedup_store.discard(entry['title'], entry['summary'])
+            with held_lock:
+                held.pop(trace_id, None)
+            analyses.inc(tier=assessment.tier, outcome="failed")
+            print(f"Analysis failed {attempt} times for {entry['title']!r}, giving up: {e}")
+            return None
+        analyzed_entry["priority_tier"] = assessment.tier
+        if stale_action is None and analyzed_entry.get("decided_by") == "relevance_triage":
+            outcome = "triaged"
+        else:
+            outcome = stale_action or "full"
+        analyses.inc(tier=assessment.tier, outcome=outcome)
+        time_to_analysis_seconds.observe(time.time() - assessment.admitted_at, tier=assessment.tier)
+        return analyzed_entry
+
+    def store_entry(analyzed_entry):
+        if store is not None:
+            # Settled only once written, so a crash in the flush window or a dropped or dead-lettered
+            # document leaves the entry pending for the next start
+            store([analyzed_entry], on_stored=finish)
+        else:
+            finish(analyzed_entry)
+        return analyzed_entry
+
+    def notify_batch(analyzed_entries):
+        notify(analyzed_entries)
+        if tracer.enabled:
+            queued_at = time.time()
+            for entry in analyzed_entries:
+                breakdown = tracer.breakdown(headline_trace_id(entry))
+                if breakdown is not None:
+                    headline_seconds.observe(queued_at - breakdown["started_at"])
+
+    pipeline = Pipeline(
+        SourceStage("fetch", fetch, interval=FEED_SCHEDULER_TICK_SECONDS if poll_interval is None else poll_interval),
+        [
+            Stage("normalize", instrumented("normalize", normalize, trace=False), **config["normalize"]),
+            Stage("dedup", instrumented("dedup", dedup, trace=False), **config["dedup"]),
+            Stage("enrich", instrumented("enrich", enrich), priority=analysis_priority, **config["enrich"]),
+            Stage("store", instrumented("store", store_entry), **config["store"]),
+            Stage("notify", instrumented("notify", notify_batch), **config["notify"]),
+        ],
+        report_interval=PIPELINE_REPORT_INTERVAL_SECONDS if report_interval is None else report_interval,
+        report=report_pipeline_stats,
+    )
+    feed_poll_interval.set_function(
+        # Query strings are dropped from the label, they carry API keys
+        lambda: {(feed["source"], feed["url"].split("?")[0]): feed["interval"] for feed in scheduler.snapshot()}
+    )
+    pipeline_queue_depth.set_function(
+        lambda: {(name,): stats["queue_depth"] for name, stats in pipeline.snapshot().items()}
+    )
+    return pipeline
+
+
+def ensure_headline_indexes():
+    """
+    Create the news-headlines indexes the pipeline and dashboard rely on,
+    first moving documents stored under the legacy id to the content-hash id.
+    
+    Returns:
+        list: Names of the indexes
+    """
+    from mongo_adapter import NEWS_HEADLINES_INDEXES, backfill_news_headline_ids
+
+    adapter = get_mongo_adapter()
+    # Headlines stored under the pre-content-hash id would otherwise be duplicated on re-processing
+    backfilled = backfill_news_headline_ids(adapter)
+    if any(backfilled.values()):
+        print(f"Moved legacy news-headlines ids to content hashes: {backfilled}")
+    return adapter.ensure_indexes("news-headlines", NEWS_HEADLINES_INDEXES)
+
+
+def parse_rss_feeds():
+    """
+    Continuously poll the RSS feeds in URLS and run new entries through the
+    staged pipeline: fetch, normalize, dedup, enrich (LLM analysis), store
+    in MongoDB and notify by email. Stages run concurrently, connected by
+    bounded queues.
+    """
+    try:
+        ensure_headline_indexes()
+    except Exception as e:
+        print(f"Could not ensure news-headlines indexes: {e}")
+
+    # Persistent store of processed entry fingerprints (title + summary)
+    dedup_store = DedupStore(DEDUP_DB_PATH, ttl_seconds=DEDUP_TTL_SECONDS)
+    print(f"Loaded {len(dedup_store)} processed entry fingerprints in {dedup_store.load_seconds:.3f}s")
+    if dedup_store.released_in_flight:
+        print(f"Forgot {dedup_store.released_in_flight} fingerprints of entries the previous run never stored")
+    watermarks = WatermarkStore(FEED_WATERMARKS_PATH)
+    fetcher = FeedFetcher(max_workers=FEED_FETCH_MAX_WORKERS, timeout=FEED_FETCH_TIMEOUT_SECONDS,
+                          watermarks=watermarks, max_pages=FEED_MAX_PAGES, page_concurrency=FEED_PAGE_CONCURRENCY)
+
+    # Digests left over from a previous run are sent as soon as the outbox starts
+    outbox = get_notification_outbox().start()
+    pipeline = build_pipeline(fetcher, dedup_store)
+    metrics_server = None
+    if METRICS_PORT:
+        try:
+            metrics_server = MetricsServer(metrics, tracer, host=METRICS_HOST, port=METRICS_PORT).start()
+            print(f"Serving metrics on http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+        except OSError as e:
+            print(f"Could not start the metrics server on port {METRICS_PORT}: {e}")
+    try:
+        asyncio.run(pipeline.run())
+    finally:
+        if metrics_server is not None:
+            metrics_server.stop()
+        if headline_writer is not None:
+            headline_writer.close()
+        outbox.close()
+        get_default_sender().close()
+        fetcher.close()
+        watermarks.close()
+        dedup_store.close()
 
 if __name__ == "__main__":
     parse_rss_feeds()
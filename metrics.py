@@ -0,0 +1,327 @@
+import bisect
+import contextvars
+import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Latency buckets in seconds, from sub-millisecond parsing up to slow LLM calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, per label combination"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def total(self) -> float:
+        """Sum over every label combination"""
+        with self._lock:
+            return sum(self._values.values())
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, key)} {value}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """Value that goes up and down; set directly or read from a callback at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None
+
+    def set(self, value: float, **labels: Any) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, function: Callable[[], Dict[Tuple[str, ...], float]]) -> None:
+        """Read the values at scrape time from function, which returns {label values tuple: value}"""
+        self._function = function
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        if self._function is not None:
+            try:
+                values.update(self._function())
+            except Exception as e:
+                print(f"Failed to collect gauge {self.name}: {e}")
+        return [f"{self.name}{_format_labels(self.label_names, key)} {value}" for key, value in values.items()]
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets, per label combination"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per key: [count per bucket (+Inf last), sum]
+        self._values: Dict[Tuple[str, ...], List[Any]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts_sum = self._values.get(key)
+            if counts_sum is None:
+                counts_sum = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            counts_sum[0][index] += 1
+            counts_sum[1] += value
+
+    @contextmanager
+    def time(self, **labels: Any):
+        """Observe the duration of the with block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: Any) -> int:
+        counts_sum = self._values.get(self._key(labels))
+        return sum(counts_sum[0]) if counts_sum else 0
+
+    def sum(self, **labels: Any) -> float:
+        counts_sum = self._values.get(self._key(labels))
+        return counts_sum[1] if counts_sum else 0.0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: "OrderedDict[str, _Metric]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> Any:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help: str, labels: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Iterable[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+class Span:
+    __slots__ = ("name", "start", "end", "attributes")
+
+    def __init__(self, name: str, start: float, end: float, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.start = start
+        self.end = end
+        self.attributes = attributes or {}
+
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("current_trace", default=None)
+
+
+class Tracer:
+    """Per-headline spans kept for the most recent traces
+
+    Spans are recorded against a trace id (the headline's content
+    fingerprint). span() without an explicit trace id uses the trace set by
+    the enclosing use_trace() block, which is carried into worker threads
+    when they are started with contextvars.copy_context().run.
+    """
+
+    def __init__(self, enabled: bool = True, max_traces: int = 1000):
+        """Create a tracer
+
+        Args:
+            enabled: When False, spans are not recorded
+            max_traces: Most recent traces kept in memory
+        """
+        self.enabled = enabled
+        self.max_traces = max_traces
+        self._traces: "OrderedDict[str, List[Span]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, trace_id: Optional[str], name: str, start: float, end: float, **attributes: Any) -> None:
+        """Record a span with explicit wall-clock start and end timestamps"""
+        if not self.enabled or not trace_id:
+            return
+        with self._lock:
+            spans = self._traces.get(trace_id)
+            if spans is None:
+                spans = self._traces[trace_id] = []
+                while len(self._traces) > self.max_traces:
+                    self._traces.popitem(last=False)
+            spans.append(Span(name, start, end, attributes))
+
+    @contextmanager
+    def span(self, name: str, trace_id: Optional[str] = None, **attributes: Any):
+        """Record the with block as a span of trace_id (or the current trace)"""
+        trace_id = trace_id or _current_trace.get()
+        if not self.enabled or not trace_id:
+            yield
+            return
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.record(trace_id, name, start, time.time(), **attributes)
+
+    @contextmanager
+    def use_trace(self, trace_id: Optional[str]):
+        """Make trace_id the current trace inside the with block"""
+        token = _current_trace.set(trace_id)
+        try:
+            yield
+        finally:
+            _current_trace.reset(token)
+
+    def trace_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._traces)
+
+    def breakdown(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        """Spans of a trace with offsets from its first span, plus per-stage and total durations"""
+        with self._lock:
+            spans = list(self._traces.get(trace_id, []))
+        if not spans:
+            return None
+        origin = min(span.start for span in spans)
+        by_stage: Dict[str, float] = {}
+        for span in spans:
+            by_stage[span.name] = by_stage.get(span.name, 0.0) + span.end - span.start
+        return {
+            "trace_id": trace_id,
+            "started_at": origin,
+            "total_seconds": max(span.end for span in spans) - origin,
+            "by_stage_seconds": by_stage,
+            "spans": [
+                {"name": span.name, "offset_seconds": span.start - origin,
+                 "duration_seconds": span.end - span.start, **span.attributes}
+                for span in sorted(spans, key=lambda s: s.start)
+            ],
+        }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "MetricsServer"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        path = self.path.split("?")[0].rstrip("/")
+        if path == "/metrics":
+            self._send(200, self.server.registry.render(), "text/plain; version=0.0.4")
+        elif path == "/traces":
+            self._send(200, json.dumps(self.server.tracer.trace_ids()), "application/json")
+        elif path.startswith("/traces/"):
+            breakdown = self.server.tracer.breakdown(path[len("/traces/"):])
+            if breakdown is None:
+                self._send(404, json.dumps({"error": "unknown trace"}), "application/json")
+            else:
+                self._send(200, json.dumps(breakdown, default=str), "application/json")
+        else:
+            self._send(404, "not found\n", "text/plain")
+
+    def _send(self, status: int, body: str, content_type: str) -> None:
+        payload = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class MetricsServer(ThreadingHTTPServer):
+    """Serves /metrics (Prometheus text format), /traces and /traces/<trace id>"""
+
+    daemon_threads = True
+
+    def __init__(self, registry: MetricsRegistry, tracer: Tracer, host: str = "127.0.0.1", port: int = 9108):
+        super().__init__((host, port), _Handler)
+        self.registry = registry
+        self.tracer = tracer
+
+    def start(self) -> "MetricsServer":
+        threading.Thread(target=self.serve_forever, name="metrics-server", daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
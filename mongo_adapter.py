@@ -1,5 +1,45 @@
-from typing import List, Dict, Any
-from pymongo import MongoClient
+import threading
+import time
+from typing import List, Dict, Any, Callable, Iterable, Optional, Tuple
+from pymongo import ASCENDING, DESCENDING, TEXT, DeleteOne, IndexModel, MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
+
+from dedup_store import FINGERPRINT_BYTES, content_fingerprint
+
+
+# Indexes backing the pipeline's upserts and the dashboard's queries on news-headlines
+NEWS_HEADLINES_INDEXES = [
+    IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    IndexModel([("companies_tickers.tickers_mentioned", ASCENDING)], name="tickers_mentioned"),
+    IndexModel([("source", ASCENDING), ("stored_at", DESCENDING)], name="source_stored_at"),
+    IndexModel([("stored_at", DESCENDING), ("_id", DESCENDING)], name="stored_at_id"),
+    IndexModel([("title", TEXT), ("summary", TEXT)], name="title_summary_text"),
+]
+
+# Headlines stored before upserts were keyed on content hashes carry a raw "<title>_<summary>" id
+LEGACY_HEADLINE_ID_QUERY = {"id": {"$not": {"$regex": f"^[0-9a-f]{{{2 * FINGERPRINT_BYTES}}}$"}}}
+
+
+def backfill_news_headline_ids(adapter: "MongoAdapter") -> Dict[str, int]:
+    """Move news-headlines documents with a legacy id onto the content-hash id
+    
+    Re-processed headlines are upserted on content_fingerprint(title, summary),
+    so a document keeping its old id would never be matched and the headline
+    would be stored twice. Legacy duplicates of one headline are merged,
+    keeping the earliest stored_at. Must run before the unique id index is
+    built, which legacy duplicates would otherwise block; a no-op once done.
+    
+    Returns:
+        Counts of rekeyed and merged documents
+    """
+    return adapter.rekey_documents(
+        "news-headlines",
+        LEGACY_HEADLINE_ID_QUERY,
+        lambda doc: content_fingerprint(doc.get("title") or "", doc.get("summary") or "").hex(),
+        key="id",
+        projection={"title": 1, "summary": 1},
+        keep_earliest="stored_at",
+    )
 
 
 class MongoAdapter:
@@ -54,6 +94,508 @@ class MongoAdapter:
         collection = self.db[collection_name]
         collection.insert_many(items)
     
+    def ensure_indexes(self, collection_name: str, indexes: List[IndexModel]) -> List[str]:
+        """Create any missing indexes from a managed index set
+        
+        Existing indexes with the same definition are left alone. Each index is
+        created separately so one failure (e.g. a unique index over legacy
+        duplicates) does not prevent the rest from being built.
+        
+        Args:
+            collection_name: Name of the collection to index
+            indexes: Managed index definitions
+            
+        Returns:
+            Names of the indexes that are in place
+        """
+        collection = self.db[collection_name]
+        created = []
+        for index in indexes:
+            try:
+                created.extend(collection.create_indexes([index]))
+            except OperationFailure as e:
+                print(f"Failed to create index {index.document.get('name')} on {collection_name}: {e}")
+        return created
+    
+    def explain_query(self, collection_name: str, query: Optional[Dict[str, Any]] = None,
+                      sort: Optional[List[Tuple[str, int]]] = None, limit: int = 0) -> Dict[str, Any]:
+        """Summarise how the server executes a find
+        
+        Args:
+            collection_name: Name of the collection queried
+            query: Filter to explain
+            sort: Sort specification, as passed to cursor.sort
+            limit: Limit applied to the find, 0 for none
+            
+        Returns:
+            Dict with the winning plan's stages, indexes used, whether it scans the
+            whole collection, and docs/keys examined vs returned
+        """
+        cursor = self.db[collection_name].find(query or {})
+        if sort:
+            cursor = cursor.sort(sort)
+        if limit:
+            cursor = cursor.limit(limit)
+        explain = cursor.explain()
+
+        planner = explain.get("queryPlanner", {})
+        winning_plan = planner.get("winningPlan", {})
+        winning_plan = winning_plan.get("queryPlan", winning_plan)
+        stages, index_names = [], []
+
+        def walk(stage: Dict[str, Any]) -> None:
+            stages.append(stage.get("stage"))
+            if stage.get("indexName"):
+                index_names.append(stage["indexName"])
+            for child_key in ("inputStage", "outerStage", "innerStage"):
+                if isinstance(stage.get(child_key), dict):
+                    walk(stage[child_key])
+            for child in stage.get("inputStages", []):
+                walk(child)
+
+        walk(winning_plan)
+        stats = explain.get("executionStats", {})
+        return {
+            "stages": [s for s in stages if s],
+            "indexes_used": index_names,
+            "collection_scan": "COLLSCAN" in stages,
+            "docs_examined": stats.get("totalDocsExamined"),
+            "keys_examined": stats.get("totalKeysExamined"),
+            "returned": stats.get("nReturned"),
+            "execution_time_ms": stats.get("executionTimeMillis"),
+        }
+    
+    def count_documents(self, collection_name: str, query: Optional[Dict[str, Any]] = None) -> int:
+        """Count documents matching a filter on the server
+        
+        An unfiltered count uses the collection metadata (estimated_document_count),
+        which is constant time regardless of collection size.
+        
+        Args:
+            collection_name: Name of the collection to count
+            query: Filter to count matches of
+            
+        Returns:
+            Number of matching documents
+        """
+        collection = self.db[collection_name]
+        if not query:
+            return collection.estimated_document_count()
+        return collection.count_documents(query)
+    
+    def paginate(self, collection_name: str, query: Optional[Dict[str, Any]] = None, page_size: int = 25,
+                 after: Optional[Tuple[Any, Any]] = None, skip: int = 0,
+                 projection: Optional[Dict[str, Any]] = None, sort_field: str = "stored_at",
+                 descending: bool = True) -> Tuple[List[Dict[str, Any]], Optional[Tuple[Any, Any]]]:
+        """Read one page of a collection using keyset (seek) pagination
+        
+        Documents are ordered by (sort_field, _id). Passing the cursor returned
+        for the previous page as after seeks straight to the next page through
+        the index instead of skipping over every earlier document; skip is only
+        a fallback for jumping to a page whose cursor is unknown.
+        
+        Args:
+            collection_name: Name of the collection to read from
+            query: Filter applied before paginating
+            page_size: Number of documents per page
+            after: (sort value, _id) cursor of the last document of the previous page
+            skip: Documents to skip when no cursor is available
+            projection: Fields to return
+            sort_field: Field to order by
+            descending: Newest (largest) first when True
+            
+        Returns:
+            (documents, cursor for the next page or None when this is the last page)
+        """
+        collection = self.db[collection_name]
+        conditions = [query] if query else []
+        if after is not None:
+            value, last_id = after
+            op = "$lt" if descending else "$gt"
+            conditions.append({"$or": [
+                {sort_field: {op: value}},
+                {sort_field: value, "_id": {op: last_id}},
+            ]})
+        query_filter = {"$and": conditions} if len(conditions) > 1 else (conditions[0] if conditions else {})
+
+        direction = DESCENDING if descending else ASCENDING
+        cursor = collection.find(query_filter, projection).sort([(sort_field, direction), ("_id", direction)])
+        if after is None and skip:
+            cursor = cursor.skip(skip)
+        documents = list(cursor.limit(page_size + 1))
+
+        next_cursor = None
+        if len(documents) > page_size:
+            documents = documents[:page_size]
+            last = documents[-1]
+            next_cursor = (last.get(sort_field), last["_id"])
+        return documents, next_cursor
+    
+    def find_since(self, collection_name: str, since: float, projection: Optional[Dict[str, Any]] = None,
+                   sort_field: str = "stored_at", limit: int = 1000) -> List[Dict[str, Any]]:
+        """Documents whose sort_field is at or after since, oldest first
+        
+        Served by a range scan of the (sort_field, _id) index, so the cost is
+        proportional to the new documents rather than the collection.
+        
+        Args:
+            collection_name: Name of the collection to read from
+            since: Lowest sort_field value to return
+            projection: Fields to return (sort_field and _id are always included)
+            sort_field: Field to order by
+            limit: Most documents to return
+        
+        Returns:
+            Matching documents in ascending sort_field order
+        """
+        collection = self.db[collection_name]
+        if projection is not None:
+            projection = {**projection, sort_field: 1}
+        cursor = collection.find({sort_field: {"$gte": since}}, projection)
+        return list(cursor.sort([(sort_field, ASCENDING), ("_id", ASCENDING)]).limit(limit))
+    
+    def collection_watermark(self, collection_name: str, field: str = "stored_at") -> Tuple[Any, int]:
+        """Cheap fingerprint of a collection's contents for invalidating cached reads
+        
+        The newest field value (one key of the (field, _id) index) catches
+        inserts, and the metadata document count catches deletes. In-place
+        updates that leave field alone are not seen.
+        
+        Args:
+            collection_name: Name of the collection
+            field: Insert timestamp field, newest first in an index
+            
+        Returns:
+            (newest field value or None when empty, estimated document count)
+        """
+        collection = self.db[collection_name]
+        newest = list(collection.find({}, {field: 1, "_id": 0}).sort([(field, DESCENDING)]).limit(1))
+        return (newest[0].get(field) if newest else None), collection.estimated_document_count()
+    
+    def watch_inserts(self, collection_name: str, max_await_time_ms: int = 1000) -> Any:
+        """Change stream of documents inserted into a collection (upserts that insert included)
+        
+        Change streams need a replica set or sharded cluster; on a standalone
+        server this raises pymongo.errors.OperationFailure.
+        
+        Returns:
+            A pymongo ChangeStream; each change carries the document as "fullDocument"
+        """
+        return self.db[collection_name].watch(
+            [{"$match": {"operationType": "insert"}}], max_await_time_ms=max_await_time_ms
+        )
+    
+    def bulk_upsert_items(self, collection_name: str, items: List[Dict[str, Any]], key: str = "id",
+                          set_on_insert: Iterable[str] = ()) -> Dict[str, int]:
+        """Idempotently upsert items in a single unordered bulk write
+        
+        Args:
+            collection_name: Name of the collection to write to
+            items: List of dictionaries to upsert; each must contain key
+            key: Field identifying a document, matched on for the upsert
+            set_on_insert: Fields only written when the document is first inserted
+                (e.g. a first-stored timestamp)
+            
+        Returns:
+            Counts of upserted, modified and matched documents
+        """
+        if not items:
+            return {"upserted": 0, "modified": 0, "matched": 0}
+
+        set_on_insert = set(set_on_insert)
+        operations = []
+        for item in items:
+            fields = {k: v for k, v in item.items() if k != "_id"}
+            update = {"$set": {k: v for k, v in fields.items() if k not in set_on_insert}}
+            insert_only = {k: v for k, v in fields.items() if k in set_on_insert}
+            if insert_only:
+                update["$setOnInsert"] = insert_only
+            operations.append(UpdateOne({key: item[key]}, update, upsert=True))
+
+        result = self.db[collection_name].bulk_write(operations, ordered=False)
+        return {
+            "upserted": result.upserted_count,
+            "modified": result.modified_count,
+            "matched": result.matched_count,
+        }
+    
+    def rekey_documents(self, collection_name: str, query: Dict[str, Any],
+                        derive_key: Callable[[Dict[str, Any]], Any], key: str = "id",
+                        projection: Optional[Dict[str, Any]] = None, keep_earliest: Optional[str] = None,
+                        batch_size: int = 500) -> Dict[str, int]:
+        """Rewrite the key of documents matching query, merging those that end up sharing a key
+        
+        For one-off migrations to a new upsert key. Each matching document gets
+        key = derive_key(document). When a document with that key already exists
+        (or an earlier document of this run took it) the matching document is
+        deleted instead, and the survivor keeps the earliest keep_earliest value.
+        
+        Args:
+            collection_name: Name of the collection to migrate
+            query: Filter selecting the documents still carrying an old key
+            derive_key: Computes the new key from a document
+            key: Field holding the key
+            projection: Fields derive_key needs (key, _id and keep_earliest are always included)
+            keep_earliest: Field whose smallest value survives a merge (e.g. a first-stored timestamp)
+            batch_size: Documents rewritten per bulk write
+            
+        Returns:
+            Counts of rekeyed and merged (deleted) documents
+        """
+        collection = self.db[collection_name]
+        keep_projection = {keep_earliest: 1} if keep_earliest else {}
+        if projection is not None:
+            projection = {**projection, key: 1, **keep_projection}
+        # Collect ids up front: rewritten documents leave the filter while a cursor is open over it
+        ids = [doc["_id"] for doc in collection.find(query, {"_id": 1})]
+        counts = {"rekeyed": 0, "merged": 0}
+        for i in range(0, len(ids), batch_size):
+            docs = list(collection.find({"_id": {"$in": ids[i:i + batch_size]}}, projection))
+            new_keys = {doc["_id"]: derive_key(doc) for doc in docs}
+            keepers = {
+                doc[key]: doc
+                for doc in collection.find({key: {"$in": list(set(new_keys.values()))}}, {key: 1, **keep_projection})
+            }
+            operations = []
+            for doc in docs:
+                new_key = new_keys[doc["_id"]]
+                keeper = keepers.get(new_key)
+                if keeper is None or keeper["_id"] == doc["_id"]:
+                    operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": {key: new_key}}))
+                    keepers[new_key] = {**doc, key: new_key}
+                    counts["rekeyed"] += 1
+                    continue
+                operations.append(DeleteOne({"_id": doc["_id"]}))
+                counts["merged"] += 1
+                earliest = doc.get(keep_earliest) if keep_earliest else None
+                if earliest is not None and (keeper.get(keep_earliest) is None or earliest < keeper[keep_earliest]):
+                    operations.append(UpdateOne({"_id": keeper["_id"]}, {"$set": {keep_earliest: earliest}}))
+                    keeper[keep_earliest] = earliest
+            if operations:
+                collection.bulk_write(operations, ordered=True)
+        return counts
+    
     def close(self) -> None:
         """Close the MongoDB connection"""
         self.client.close()
+
+
+class BufferedWriter:
+    """Batches upserts into a collection, flushing by batch size or age
+    
+    Items are buffered in memory and written with MongoAdapter.bulk_upsert_items
+    once max_batch_size items are pending or the oldest pending item is
+    max_delay_seconds old, whichever comes first. A background thread started
+    on the first add() enforces the time bound.
+    
+    A failed batch is retried with exponential backoff. Documents the server
+    rejects individually (BulkWriteError write errors: validation, size,
+    duplicate keys) are split off and dead-lettered at once, and the rest of
+    the batch counts as written; any other item is dead-lettered after
+    max_attempts failed writes. Dead letters go to dead_letter_collection.
+    At most max_pending items are buffered: add() blocks up to
+    max_block_seconds for room, then drops the item. An item added with
+    on_written has it called once the item is in the collection, and never
+    if the item is dropped or dead-lettered.
+    """
+    
+    def __init__(self, adapter: MongoAdapter, collection_name: str, key: str = "id",
+                 set_on_insert: Iterable[str] = (), max_batch_size: int = 100,
+                 max_delay_seconds: float = 2.0,
+                 on_flush: Optional[Callable[[int, float, Optional[Exception]], None]] = None,
+                 max_attempts: int = 8, retry_backoff_seconds: float = 0.5, max_backoff_seconds: float = 30.0,
+                 max_pending: int = 10_000, max_block_seconds: float = 5.0,
+                 dead_letter_collection: Optional[str] = None,
+                 on_discard: Optional[Callable[[int, str], None]] = None):
+        """Create a writer
+        
+        Args:
+            adapter: MongoAdapter to write through
+            collection_name: Name of the collection to write to
+            key: Field identifying a document
+            set_on_insert: Fields only written when the document is first inserted
+            max_batch_size: Flush once this many items are pending
+            max_delay_seconds: Flush once the oldest pending item is this old
+            on_flush: Called after each batch write with (batch size, seconds, exception or None)
+            max_attempts: Failed writes after which an item is dead-lettered
+            retry_backoff_seconds: Delay before the first retry, doubled per consecutive failure
+            max_backoff_seconds: Longest delay between retries
+            max_pending: Most items buffered at once
+            max_block_seconds: How long add() waits for room in a full buffer before dropping the item
+            dead_letter_collection: Collection receiving rejected items, "<collection_name>-dead-letter"
+                by default
+            on_discard: Called with (item count, "dead_letter" or "dropped") for items that won't be written
+        """
+        self.adapter = adapter
+        self.collection_name = collection_name
+        self.key = key
+        self.set_on_insert = tuple(set_on_insert)
+        self.max_batch_size = max_batch_size
+        self.max_delay_seconds = max_delay_seconds
+        self.on_flush = on_flush
+        self.max_attempts = max_attempts
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.max_pending = max_pending
+        self.max_block_seconds = max_block_seconds
+        self.dead_letter_collection = dead_letter_collection or f"{collection_name}-dead-letter"
+        self.on_discard = on_discard
+        # (item, failed write attempts so far, on_written)
+        self._pending: List[Tuple[Dict[str, Any], int, Optional[Callable[[Dict[str, Any]], None]]]] = []
+        self._oldest: Optional[float] = None
+        self._retry_at = 0.0
+        self._consecutive_failures = 0
+        self._lock = threading.Lock()
+        self._room = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"written": 0, "flushes": 0, "errors": 0, "dead_lettered": 0, "dropped": 0}
+    
+    def add(self, item: Dict[str, Any], on_written: Optional[Callable[[Dict[str, Any]], None]] = None) -> bool:
+        """Queue an item, flushing immediately if the batch is full
+        
+        Args:
+            item: Document to upsert
+            on_written: Called with the item (on the flushing thread) once it has been written
+        
+        Returns:
+            False if the buffer stayed full for max_block_seconds and the item was dropped
+        """
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"mongo-writer-{self.collection_name}",
+                                                daemon=True)
+                self._thread.start()
+            if not self._room.wait_for(lambda: len(self._pending) < self.max_pending, self.max_block_seconds):
+                self.stats["dropped"] += 1
+                dropped = True
+            else:
+                dropped = False
+                self._pending.append((item, 0, on_written))
+                if self._oldest is None:
+                    self._oldest = time.monotonic()
+            full = len(self._pending) >= self.max_batch_size and time.monotonic() >= self._retry_at
+        if dropped:
+            print(f"Write buffer for {self.collection_name} is full, dropped {self.key}={item.get(self.key)!r}")
+            if self.on_discard is not None:
+                self.on_discard(1, "dropped")
+            return False
+        if full:
+            self.flush()
+        return True
+    
+    def flush(self) -> int:
+        """Write every pending item, regardless of any retry backoff
+        
+        Returns:
+            Number of items written
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending, self._oldest = self._pending, [], None
+                self._room.notify_all()
+            if not batch:
+                return 0
+            items = [item for item, _, _ in batch]
+            start = time.perf_counter()
+            try:
+                self.adapter.bulk_upsert_items(self.collection_name, items, key=self.key,
+                                               set_on_insert=self.set_on_insert)
+            except BulkWriteError as e:
+                # The write was unordered: everything without a write error was applied
+                rejected = {error["index"]: error.get("errmsg", "") for error in e.details.get("writeErrors", [])}
+                if e.details.get("writeConcernErrors"):
+                    # Applied but not acknowledged as required; the upserts are idempotent, so retry them
+                    retry = [entry for i, entry in enumerate(batch) if i not in rejected]
+                else:
+                    retry = []
+                written = [] if retry else [entry for i, entry in enumerate(batch) if i not in rejected]
+                self._failed(batch, retry, [(items[i], errmsg) for i, errmsg in rejected.items()], e)
+                if self.on_flush is not None:
+                    self.on_flush(len(batch), time.perf_counter() - start, e)
+                self._notify_written(written)
+                return len(written)
+            except Exception as e:
+                self._failed(batch, batch, [], e)
+                if self.on_flush is not None:
+                    self.on_flush(len(batch), time.perf_counter() - start, e)
+                return 0
+            if self._consecutive_failures:
+                print(f"Writes to {self.collection_name} recovered after {self._consecutive_failures} failed flushes")
+            self._consecutive_failures = 0
+            self._retry_at = 0.0
+            self.stats["written"] += len(batch)
+            self.stats["flushes"] += 1
+            if self.on_flush is not None:
+                self.on_flush(len(batch), time.perf_counter() - start, None)
+            self._notify_written(batch)
+            return len(batch)
+    
+    def _notify_written(self, written: List[Tuple[Dict[str, Any], int, Any]]) -> None:
+        for item, _, on_written in written:
+            if on_written is None:
+                continue
+            try:
+                on_written(item)
+            except Exception as e:
+                print(f"on_written hook failed for {self.key}={item.get(self.key)!r}: {e}")
+    
+    def _failed(self, batch: List[Tuple[Dict[str, Any], int, Any]], retry: List[Tuple[Dict[str, Any], int, Any]],
+                rejected: List[Tuple[Dict[str, Any], str]], error: Exception) -> None:
+        # Called under _flush_lock: requeue retryable items with backoff, dead-letter the rest
+        self.stats["errors"] += 1
+        self.stats["written"] += len(batch) - len(retry) - len(rejected)
+        dead = list(rejected)
+        requeue = []
+        for item, attempts, on_written in retry:
+            if attempts + 1 >= self.max_attempts:
+                dead.append((item, f"gave up after {attempts + 1} attempts: {error}"))
+            else:
+                requeue.append((item, attempts + 1, on_written))
+        if requeue:
+            self._consecutive_failures += 1
+            delay = min(self.max_backoff_seconds,
+                        self.retry_backoff_seconds * 2 ** (self._consecutive_failures - 1))
+            with self._lock:
+                self._pending = requeue + self._pending
+                self._oldest = self._oldest or time.monotonic()
+                self._retry_at = time.monotonic() + delay
+            if self._consecutive_failures == 1:
+                print(f"Failed to flush {len(batch)} items to {self.collection_name}, retrying with backoff: {error}")
+        if dead:
+            self._dead_letter(dead)
+    
+    def _dead_letter(self, rejected: List[Tuple[Dict[str, Any], str]]) -> None:
+        now = time.time()
+        letters = [
+            {"collection": self.collection_name, "key": item.get(self.key), "error": error, "failed_at": now,
+             "document": {k: v for k, v in item.items() if k != "_id"}}
+            for item, error in rejected
+        ]
+        try:
+            self.adapter.load_items_into_collection(self.dead_letter_collection, letters)
+        except Exception as e:
+            print(f"Could not dead-letter {len(letters)} items of {self.collection_name} "
+                  f"({self.key}s {[letter['key'] for letter in letters]}): {e}")
+        else:
+            print(f"Dead-lettered {len(letters)} items of {self.collection_name} to {self.dead_letter_collection}")
+        self.stats["dead_lettered"] += len(letters)
+        if self.on_discard is not None:
+            self.on_discard(len(letters), "dead_letter")
+    
+    def _run(self) -> None:
+        while not self._stop.wait(min(self.max_delay_seconds / 4, 0.5)):
+            with self._lock:
+                now = time.monotonic()
+                due = (self._oldest is not None and now - self._oldest >= self.max_delay_seconds
+                       and now >= self._retry_at)
+            if due:
+                self.flush()
+    
+    def close(self) -> None:
+        """Stop the background flusher and write anything still pending"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
@@ -0,0 +1,274 @@
+import hashlib
+import html
+import re
+import threading
+import time
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+from dedup_store import content_fingerprint
+
+_MAX_HASH = (1 << 32) - 1
+_SLOTS_PER_DIGEST = 16
+_TAG_RE = re.compile(r"<[^>]+>")
+_NON_WORD_RE = re.compile(r"[^a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in inc is it its of on or that the this to was were will with".split()
+)
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, strip HTML tags/entities and punctuation, collapse whitespace"""
+    text = html.unescape(_TAG_RE.sub(" ", text or "")).lower()
+    return _NON_WORD_RE.sub(" ", text).strip()
+
+
+def shingles(text: str, size: int = 1, max_words: Optional[int] = None) -> set:
+    """Set of word n-gram shingles of normalized text, stopwords removed
+
+    With max_words only the first max_words non-stopwords are shingled.
+    """
+    words = [w for w in normalize_text(text).split() if w not in STOPWORDS]
+    if max_words is not None:
+        words = words[:max_words]
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class MinHasher:
+    """MinHash signatures over shingle sets
+
+    Each shingle is hashed once with BLAKE2b into num_perm independent
+    32-bit values (one 64-byte digest per 16 slots, salted per block), and
+    a signature is the slot-wise minimum over the shingles, so a signature
+    packs into 4 * num_perm bytes and the per-slot work runs in C.
+    """
+
+    def __init__(self, num_perm: int = 32, seed: int = 1):
+        self.num_perm = num_perm
+        self._salts = [(seed * 1_000_003 + block).to_bytes(16, "little")
+                       for block in range(-(-num_perm // _SLOTS_PER_DIGEST))]
+
+    def _slot_hashes(self, shingle: str) -> array:
+        data = shingle.encode("utf-8")
+        digest = b"".join(hashlib.blake2b(data, digest_size=64, salt=salt).digest() for salt in self._salts)
+        return array("I", digest[:4 * self.num_perm])
+
+    def signature(self, shingle_set: set) -> bytes:
+        """Packed MinHash signature of a shingle set"""
+        if not shingle_set:
+            return array("I", [_MAX_HASH] * self.num_perm).tobytes()
+        return array("I", map(min, zip(*map(self._slot_hashes, shingle_set)))).tobytes()
+
+
+def estimated_jaccard(signature_a: bytes, signature_b: bytes) -> float:
+    """Fraction of matching MinHash slots, an unbiased Jaccard estimate"""
+    a, b = array("I", signature_a), array("I", signature_b)
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+class StoryCluster:
+    """A group of near-duplicate entries for the same story"""
+
+    __slots__ = ("cluster_id", "signature", "first_seen", "last_seen", "sources", "size", "analysis", "pending",
+                 "ready")
+
+    def __init__(self, cluster_id: str, signature: bytes, now: float):
+        self.cluster_id = cluster_id
+        self.signature = signature
+        self.first_seen = now
+        self.last_seen = now
+        self.sources: List[str] = []
+        self.size = 0
+        self.analysis: Optional[Dict[str, Any]] = None
+        self.pending = False
+        self.ready = threading.Event()
+
+    def __repr__(self) -> str:
+        return (f"StoryCluster(cluster_id={self.cluster_id!r}, size={self.size}, "
+                f"analyzed={self.analysis is not None}, sources={self.sources!r})")
+
+
+class NearDuplicateDetector:
+    """MinHash/LSH index of recent stories
+
+    Signatures are cut into bands; entries sharing any band land in the same
+    bucket and become candidates, which are then confirmed by estimated
+    Jaccard similarity. A lookup therefore touches a handful of buckets
+    rather than every stored story. Clusters not seen for window_seconds
+    stop matching and are dropped by prune().
+    """
+
+    def __init__(self, threshold: float = 0.6, num_perm: int = 32, bands: int = 8,
+                 window_seconds: float = 6 * 3600, shingle_size: int = 1, max_words: Optional[int] = 48,
+                 max_chars: Optional[int] = 2000):
+        """Create an empty index
+
+        Args:
+            threshold: Minimum estimated Jaccard similarity of near-duplicates
+            num_perm: MinHash permutations per signature
+            bands: LSH bands; num_perm must be divisible by it. With the
+                defaults pairs above ~0.6 similarity collide with high probability
+            window_seconds: How long a cluster keeps absorbing variants after it was last seen
+            shingle_size: Words per shingle
+            max_words: Non-stopword words of title + summary that are shingled (None for all);
+                variants of a story share their lead, and signature cost grows with every word
+            max_chars: Characters of title + summary normalized before shingling (None for all),
+                so long FMP article texts aren't cleaned in full only to be cut to max_words
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.window_seconds = window_seconds
+        self.shingle_size = shingle_size
+        self.max_words = max_words
+        self.max_chars = max_chars
+        self.hasher = MinHasher(num_perm)
+        self._band_bytes = 4 * num_perm // bands
+        self._num_bands = bands
+        # Most buckets hold one cluster, stored bare to avoid a list per bucket
+        self._buckets: Dict[int, Any] = {}
+        self.clusters: Dict[str, StoryCluster] = {}
+        self._lock = threading.Lock()
+
+    def _band_keys(self, signature: bytes):
+        # Band hashes may collide; candidates are verified by similarity anyway
+        width = self._band_bytes
+        for i in range(self._num_bands):
+            yield hash((i, signature[i * width:(i + 1) * width]))
+
+    def _bucket(self, key: int) -> List[StoryCluster]:
+        members = self._buckets.get(key)
+        if members is None:
+            return []
+        return members if isinstance(members, list) else [members]
+
+    def _bucket_add(self, key: int, cluster: StoryCluster) -> None:
+        members = self._buckets.get(key)
+        if members is None:
+            self._buckets[key] = cluster
+        elif isinstance(members, list):
+            members.append(cluster)
+        else:
+            self._buckets[key] = [members, cluster]
+
+    def _unindex(self, cluster: StoryCluster) -> None:
+        for key in self._band_keys(cluster.signature):
+            live = [c for c in self._bucket(key) if c is not cluster]
+            if len(live) > 1:
+                self._buckets[key] = live
+            elif live:
+                self._buckets[key] = live[0]
+            else:
+                self._buckets.pop(key, None)
+
+    def signature(self, title: str, summary: str) -> bytes:
+        text = f"{title} {summary}"
+        if self.max_chars is not None:
+            text = text[:self.max_chars]
+        return self.hasher.signature(shingles(text, self.shingle_size, self.max_words))
+
+    def find_signature(self, signature: bytes, now: Optional[float] = None) -> Optional[StoryCluster]:
+        """Most similar live cluster at or above the threshold, if any"""
+        now = time.time() if now is None else now
+        best, best_score, checked = None, self.threshold, set()
+        for key in self._band_keys(signature):
+            for cluster in self._bucket(key):
+                if cluster.cluster_id in checked or now - cluster.last_seen > self.window_seconds:
+                    continue
+                checked.add(cluster.cluster_id)
+                score = estimated_jaccard(cluster.signature, signature)
+                if score >= best_score:
+                    best, best_score = cluster, score
+        return best
+
+    def add_signature(self, signature: bytes, cluster_id: str, source: str = "",
+                      now: Optional[float] = None) -> Tuple[StoryCluster, bool]:
+        """Attach a signature to its near-duplicate cluster, creating one if needed
+
+        Args:
+            signature: MinHash signature of the entry
+            cluster_id: Id to give a newly created cluster
+            source: Feed the entry came from
+            now: Timestamp, defaults to time.time()
+
+        Returns:
+            (cluster, created) where created is True for a new story
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            cluster = self.find_signature(signature, now)
+            created = cluster is None
+            if created:
+                # An expired cluster under the same id must not stay reachable through its old bands
+                previous = self.clusters.get(cluster_id)
+                if previous is not None:
+                    self._unindex(previous)
+                cluster = StoryCluster(cluster_id, signature, now)
+                self.clusters[cluster_id] = cluster
+                for key in self._band_keys(signature):
+                    self._bucket_add(key, cluster)
+            cluster.last_seen = now
+            cluster.size += 1
+            if source and source not in cluster.sources:
+                cluster.sources.append(source)
+            return cluster, created
+
+    def assign(self, title: str, summary: str, source: str = "",
+               now: Optional[float] = None) -> Tuple[StoryCluster, bool]:
+        """Attach an entry to its story cluster
+
+        Args:
+            title: Entry title
+            summary: Entry summary
+            source: Feed the entry came from
+            now: Timestamp, defaults to time.time()
+
+        Returns:
+            (cluster, created) where created is True for a new story
+        """
+        return self.add_signature(
+            self.signature(title, summary), content_fingerprint(title, summary).hex(), source, now
+        )
+
+    def claim(self, cluster: StoryCluster) -> bool:
+        """Claim the right to analyze a cluster's story
+
+        Exactly one caller gets True for an unanalyzed, unclaimed cluster and
+        must call resolve() when done; everyone else can wait on cluster.ready
+        and reuse cluster.analysis. Waiters should use a timeout: a claimant
+        that hangs never sets ready.
+        """
+        with self._lock:
+            if cluster.analysis is not None or cluster.pending:
+                return False
+            cluster.pending = True
+            cluster.ready.clear()
+            return True
+
+    def resolve(self, cluster: StoryCluster, analysis: Optional[Dict[str, Any]]) -> None:
+        """Record the outcome of a claimed analysis (None on failure) and wake waiters"""
+        with self._lock:
+            if analysis is not None:
+                cluster.analysis = analysis
+            cluster.pending = False
+            cluster.ready.set()
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Drop clusters that fell out of the time window
+
+        Returns:
+            Number of clusters removed
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            expired = {cid for cid, c in self.clusters.items() if now - c.last_seen > self.window_seconds}
+            if not expired:
+                return 0
+            for cid in expired:
+                self._unindex(self.clusters.pop(cid))
+            return len(expired)
+
+    def __len__(self) -> int:
+        return len(self.clusters)
@@ -0,0 +1,232 @@
+import json
+import random
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class NotificationOutbox:
+    """Durable queue of pending email digests drained by a background sender
+
+    enqueue() only writes a row to a local SQLite file, so producers never
+    block on SMTP and nothing is lost if sending fails or the process
+    restarts. The sender thread waits coalesce_window_seconds after the
+    oldest pending digest for a recipient list, then merges every digest
+    pending for those recipients into one email. Failed sends are retried
+    with jittered exponential backoff; after max_attempts the digests are
+    kept with status "dead" for inspection instead of being dropped.
+    """
+
+    def __init__(self, send: Callable[[str, str, Optional[List[str]]], None], path: str = "outbox.sqlite3",
+                 coalesce_window_seconds: float = 30.0, max_attempts: int = 8,
+                 base_backoff_seconds: float = 5.0, max_backoff_seconds: float = 600.0,
+                 poll_interval_seconds: float = 1.0):
+        """Open (or create) the outbox
+
+        Args:
+            send: Called as send(subject, body, recipients); raises on failure
+            path: SQLite database path
+            coalesce_window_seconds: How long a digest waits for others to merge with
+            max_attempts: Attempts before a digest is marked dead
+            base_backoff_seconds: Delay before the first retry, doubled per attempt
+            max_backoff_seconds: Upper bound on the retry delay
+            poll_interval_seconds: How often the sender checks for due digests
+        """
+        self.send = send
+        self.coalesce_window_seconds = coalesce_window_seconds
+        self.max_attempts = max_attempts
+        self.base_backoff_seconds = base_backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.poll_interval_seconds = poll_interval_seconds
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stats: Dict[str, Any] = {
+            "enqueued": 0, "sent_emails": 0, "sent_digests": 0, "failures": 0, "dead": 0,
+            "last_send_seconds": None, "last_enqueue_to_send_seconds": None,
+        }
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS digests ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, subject TEXT NOT NULL, body TEXT NOT NULL, "
+            "recipients TEXT NOT NULL, created_at REAL NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+            "next_attempt_at REAL NOT NULL, status TEXT NOT NULL DEFAULT 'pending', last_error TEXT)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS digests_status ON digests (status, next_attempt_at)")
+        self.conn.commit()
+
+    def enqueue(self, subject: str, body: str, recipients: Optional[List[str]] = None) -> int:
+        """Queue a digest for sending
+
+        Args:
+            subject: Subject line
+            body: Plain-text body
+            recipients: Addresses to send to, None for the sender's default list
+
+        Returns:
+            Id of the queued digest
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self.conn.execute(
+                "INSERT INTO digests (subject, body, recipients, created_at, next_attempt_at) VALUES (?, ?, ?, ?, ?)",
+                (subject, body, json.dumps(recipients), now, now + self.coalesce_window_seconds),
+            )
+            self.conn.commit()
+            self.stats["enqueued"] += 1
+        self._wake.set()
+        return cursor.lastrowid
+
+    def enqueue_many(self, messages: List[Tuple[str, str, Optional[List[str]]]]) -> int:
+        """Queue several (subject, body, recipients) digests in one transaction
+
+        Returns:
+            Number of digests queued
+        """
+        now = time.time()
+        with self._lock:
+            self.conn.executemany(
+                "INSERT INTO digests (subject, body, recipients, created_at, next_attempt_at) VALUES (?, ?, ?, ?, ?)",
+                [(subject, body, json.dumps(recipients), now, now + self.coalesce_window_seconds)
+                 for subject, body, recipients in messages],
+            )
+            self.conn.commit()
+            self.stats["enqueued"] += len(messages)
+        self._wake.set()
+        return len(messages)
+
+    def queue_depth(self) -> int:
+        """Number of digests waiting to be sent"""
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM digests WHERE status = 'pending'").fetchone()[0]
+
+    def oldest_pending_age(self) -> float:
+        """Seconds since the oldest pending digest was enqueued, 0 when empty"""
+        with self._lock:
+            oldest = self.conn.execute("SELECT MIN(created_at) FROM digests WHERE status = 'pending'").fetchone()[0]
+        return time.time() - oldest if oldest else 0.0
+
+    def _due_groups(self, now: float) -> List[List[tuple]]:
+        with self._lock:
+            due_recipients = [row[0] for row in self.conn.execute(
+                "SELECT DISTINCT recipients FROM digests WHERE status = 'pending' AND next_attempt_at <= ?", (now,)
+            )]
+            return [
+                self.conn.execute(
+                    "SELECT id, subject, body, created_at, attempts FROM digests "
+                    "WHERE status = 'pending' AND recipients = ? ORDER BY id", (recipients,)
+                ).fetchall()
+                for recipients in due_recipients
+            ]
+
+    def _recipients_of(self, digest_id: int) -> Optional[List[str]]:
+        with self._lock:
+            return json.loads(self.conn.execute("SELECT recipients FROM digests WHERE id = ?",
+                                                (digest_id,)).fetchone()[0])
+
+    def _send_group(self, group: List[tuple]) -> bool:
+        ids = [row[0] for row in group]
+        if len(group) == 1:
+            subject, body = group[0][1], group[0][2]
+        else:
+            subject = f"{len(group)} headline digests since {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(group[0][3]))}"
+            body = ("\n\n" + "#" * 80 + "\n\n").join(row[2] for row in group)
+
+        start = time.monotonic()
+        try:
+            self.send(subject, body, self._recipients_of(ids[0]))
+        except Exception as e:
+            self._record_failure(group, str(e))
+            return False
+
+        now = time.time()
+        with self._lock:
+            self.conn.execute(f"DELETE FROM digests WHERE id IN ({','.join('?' * len(ids))})", ids)
+            self.conn.commit()
+        self.stats["sent_emails"] += 1
+        self.stats["sent_digests"] += len(group)
+        self.stats["last_send_seconds"] = time.monotonic() - start
+        self.stats["last_enqueue_to_send_seconds"] = now - group[0][3]
+        return True
+
+    def _record_failure(self, group: List[tuple], error: str) -> None:
+        self.stats["failures"] += 1
+        attempts = max(row[4] for row in group) + 1
+        now = time.time()
+        with self._lock:
+            for row in group:
+                if attempts >= self.max_attempts:
+                    self.conn.execute("UPDATE digests SET status = 'dead', attempts = ?, last_error = ? WHERE id = ?",
+                                      (attempts, error, row[0]))
+                    self.stats["dead"] += 1
+                else:
+                    delay = min(self.max_backoff_seconds, self.base_backoff_seconds * 2 ** (attempts - 1))
+                    self.conn.execute(
+                        "UPDATE digests SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                        (attempts, now + delay * random.uniform(0.5, 1.5), error, row[0]),
+                    )
+            self.conn.commit()
+        print(f"Failed to send {len(group)} digest(s) (attempt {attempts}): {error}")
+
+    def drain_once(self, now: Optional[float] = None, deadline: Optional[float] = None) -> int:
+        """Send every digest group that is due
+
+        Args:
+            now: Reference timestamp, defaults to time.time()
+            deadline: time.monotonic() after which no further group is started; with a
+                deadline draining also stops at the first failed send, since the
+                rest would most likely wait out the same SMTP timeout
+
+        Returns:
+            Number of digests sent
+        """
+        before = self.stats["sent_digests"]
+        for group in self._due_groups(time.time() if now is None else now):
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            if not self._send_group(group) and deadline is not None:
+                break
+        return self.stats["sent_digests"] - before
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.drain_once()
+            except Exception as e:
+                print(f"Notification outbox error: {e}")
+            self._wake.wait(self.poll_interval_seconds)
+            self._wake.clear()
+
+    def start(self) -> "NotificationOutbox":
+        """Start the background sender thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="notification-outbox", daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self, flush: bool = True, flush_timeout_seconds: float = 10.0) -> None:
+        """Stop the sender, optionally trying to send what is pending first
+
+        Digests that aren't sent stay in the outbox and go out after the next
+        start, so shutdown never waits out SMTP timeouts for every pending group.
+
+        Args:
+            flush: Ignore the coalescing window and backoff and send what is pending now
+            flush_timeout_seconds: No new send is started after this long, and
+                flushing stops at the first failure
+        """
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if flush:
+            self.drain_once(now=float("inf"), deadline=time.monotonic() + flush_timeout_seconds)
+            depth = self.queue_depth()
+            if depth:
+                print(f"Left {depth} digest(s) in the outbox for the next start")
+        self.conn.close()
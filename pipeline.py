@@ -0,0 +1,301 @@
+import asyncio
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set
+
+
+class StageStats:
+    """Counters for one pipeline stage"""
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.received = 0
+        self.processed = 0
+        self.emitted = 0
+        self.dropped = 0
+        self.errors = 0
+        self.requeued = 0
+        self.busy_workers = 0
+        self.busy_seconds = 0.0
+
+    def snapshot(self, queue: Optional[asyncio.Queue] = None, workers: int = 0) -> Dict[str, Any]:
+        elapsed = max(time.monotonic() - self.started_at, 1e-9)
+        return {
+            "received": self.received,
+            "processed": self.processed,
+            "emitted": self.emitted,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "requeued": self.requeued,
+            "throughput_per_sec": self.processed / elapsed,
+            "queue_depth": queue.qsize() if queue is not None else 0,
+            "queue_capacity": queue.maxsize if queue is not None else 0,
+            "busy_workers": self.busy_workers,
+            "workers": workers,
+            "utilization": self.busy_seconds / (elapsed * workers) if workers else 0.0,
+        }
+
+
+class Stage:
+    """A pipeline stage: a bounded input queue drained by a pool of workers
+
+    The handler is a blocking function run on the stage's own thread pool.
+    It receives one item (or a list of up to batch_size items when batching)
+    and returns None to drop it, a list to emit several items downstream, or
+    any other value to emit it as a single item. Workers block on a full
+    downstream queue, which is how backpressure propagates upstream.
+
+    With a priority function the input queue is a priority queue: the
+    queued item with the lowest priority(item) is handed out first, ties in
+    arrival order.
+    """
+
+    def __init__(self, name: str, handler: Callable[[Any], Any], workers: int = 1, queue_size: int = 100,
+                 batch_size: int = 1, batch_timeout: float = 0.0, priority: Optional[Callable[[Any], float]] = None):
+        """Create a stage
+
+        Args:
+            name: Stage name used in stats
+            handler: Blocking function processing an item (or a batch)
+            workers: Number of concurrent workers
+            queue_size: Capacity of the stage's input queue
+            batch_size: When > 1, hand the handler lists of up to this many items
+            batch_timeout: Seconds to wait for a batch to fill before handing over what is there
+            priority: Optional sort key of queued items, lowest first
+        """
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
+        self.priority = priority
+        self.queue: Optional[asyncio.Queue] = None
+        self.stats = StageStats()
+        self.executor: Optional[ThreadPoolExecutor] = None
+
+
+class SourceStage:
+    """The first stage: repeatedly calls produce() and feeds its items into the pipeline
+
+    produce() is blocking and returns a list of items, or None once the
+    source is exhausted. interval is the pause between calls.
+    """
+
+    def __init__(self, name: str, produce: Callable[[], Optional[List[Any]]], interval: float = 0.0):
+        self.name = name
+        self.produce = produce
+        self.interval = interval
+        self.workers = 1
+        self.queue = None
+        self.stats = StageStats()
+        self.executor: Optional[ThreadPoolExecutor] = None
+
+
+class Pipeline:
+    """Chain of stages connected by bounded asyncio queues
+
+    Each stage has its own worker count and thread pool, so a slow stage
+    only saturates its own workers while upstream stages keep running until
+    the queue in front of the slow stage fills up. A handler can hand an
+    item back to a stage for a later attempt with requeue().
+    """
+
+    def __init__(self, source: SourceStage, stages: List[Stage], report_interval: float = 60.0,
+                 report: Optional[Callable[[Dict[str, Dict[str, Any]]], None]] = None):
+        """Create a pipeline
+
+        Args:
+            source: Stage producing the items
+            stages: Processing stages in order
+            report_interval: Seconds between stats reports, 0 to disable
+            report: Called with snapshot() every report_interval; prints a table by default
+        """
+        self.source = source
+        self.stages = stages
+        self.report_interval = report_interval
+        self.report = report or print_snapshot
+        self._stopping: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Requeued items waiting out their delay
+        self._delayed: Set[asyncio.Task] = set()
+        # Tie-breaker keeping equal-priority items in arrival order
+        self._sequence = itertools.count()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Per-stage throughput, counters and queue depth"""
+        snapshot = {self.source.name: self.source.stats.snapshot(workers=1)}
+        for stage in self.stages:
+            snapshot[stage.name] = stage.stats.snapshot(stage.queue, stage.workers)
+        return snapshot
+
+    def stop(self) -> None:
+        """Ask the source to stop; run() returns once in-flight items have drained"""
+        if self._stopping is not None:
+            self._stopping.set()
+
+    def requeue(self, name: str, item: Any, delay: float = 0.0) -> None:
+        """Put item back on the named stage's queue after delay seconds
+
+        Safe to call from a handler. stop() cuts pending delays short, so
+        requeued items are still handled while the pipeline drains.
+        """
+        stage = next(stage for stage in self.stages if stage.name == name)
+        # Scheduled before the calling handler returns, so a draining run() sees it
+        self._loop.call_soon_threadsafe(self._schedule_requeue, stage, item, delay)
+
+    def _schedule_requeue(self, stage: Stage, item: Any, delay: float) -> None:
+        task = asyncio.ensure_future(self._requeue(stage, item, delay))
+        self._delayed.add(task)
+        task.add_done_callback(self._delayed.discard)
+
+    async def _requeue(self, stage: Stage, item: Any, delay: float) -> None:
+        try:
+            await asyncio.wait_for(self._stopping.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+        if stage.priority is not None:
+            item = (stage.priority(item), next(self._sequence), item)
+        await stage.queue.put(item)
+        stage.stats.received += 1
+        stage.stats.requeued += 1
+
+    async def _emit(self, index: int, result: Any, stats: StageStats) -> None:
+        # The last stage is a sink; whatever it returns goes nowhere
+        if index >= len(self.stages):
+            return
+        if result is None:
+            stats.dropped += 1
+            return
+        items = result if isinstance(result, list) else [result]
+        stage = self.stages[index]
+        for item in items:
+            if stage.priority is not None:
+                item = (stage.priority(item), next(self._sequence), item)
+            await stage.queue.put(item)
+            stage.stats.received += 1
+            stats.emitted += 1
+
+    async def _get(self, stage: Stage) -> Any:
+        item = await stage.queue.get()
+        return item[2] if stage.priority is not None else item
+
+    async def _run_source(self) -> None:
+        loop = asyncio.get_running_loop()
+        stats = self.source.stats
+        while not self._stopping.is_set():
+            stats.busy_workers = 1
+            start = time.monotonic()
+            try:
+                items = await loop.run_in_executor(self.source.executor, self.source.produce)
+            except Exception as e:
+                stats.errors += 1
+                print(f"[{self.source.name}] error: {e}")
+                items = []
+            finally:
+                stats.busy_workers = 0
+                stats.busy_seconds += time.monotonic() - start
+            if items is None:
+                return
+            stats.processed += 1
+            await self._emit(0, items, stats)
+            if self.source.interval:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.source.interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _next_batch(self, stage: Stage) -> List[Any]:
+        batch = [await self._get(stage)]
+        deadline = time.monotonic() + stage.batch_timeout
+        while len(batch) < stage.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._get(stage), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run_worker(self, index: int) -> None:
+        loop = asyncio.get_running_loop()
+        stage = self.stages[index]
+        stats = stage.stats
+        while True:
+            if stage.batch_size > 1:
+                items = await self._next_batch(stage)
+                payload = items
+            else:
+                payload = await self._get(stage)
+                items = [payload]
+            stats.busy_workers += 1
+            start = time.monotonic()
+            try:
+                result = await loop.run_in_executor(stage.executor, stage.handler, payload)
+            except Exception as e:
+                stats.errors += 1
+                print(f"[{stage.name}] error: {e}")
+                result = None
+            finally:
+                stats.busy_workers -= 1
+                stats.busy_seconds += time.monotonic() - start
+            stats.processed += len(items)
+            try:
+                await self._emit(index + 1, result, stats)
+            finally:
+                for _ in items:
+                    stage.queue.task_done()
+
+    async def _run_reporter(self) -> None:
+        while True:
+            await asyncio.sleep(self.report_interval)
+            self.report(self.snapshot())
+
+    async def run(self) -> Dict[str, Dict[str, Any]]:
+        """Run until the source is exhausted or stop() is called, then drain
+
+        Returns:
+            Final snapshot()
+        """
+        self._stopping = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        self.source.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=self.source.name)
+        workers = []
+        for index, stage in enumerate(self.stages):
+            queue_type = asyncio.PriorityQueue if stage.priority is not None else asyncio.Queue
+            stage.queue = queue_type(maxsize=stage.queue_size)
+            stage.executor = ThreadPoolExecutor(max_workers=stage.workers, thread_name_prefix=stage.name)
+            workers.extend(asyncio.create_task(self._run_worker(index)) for _ in range(stage.workers))
+        reporter = asyncio.create_task(self._run_reporter()) if self.report_interval else None
+
+        try:
+            await self._run_source()
+            # Stages drain in order so nothing is emitted into an already-joined queue; requeued
+            # items can land in front of a drained stage, so repeat until none are pending
+            while True:
+                for stage in self.stages:
+                    await stage.queue.join()
+                if not self._delayed:
+                    break
+                await asyncio.gather(*self._delayed)
+        finally:
+            for task in list(self._delayed):
+                task.cancel()
+            for task in workers + ([reporter] if reporter else []):
+                task.cancel()
+            await asyncio.gather(*workers, *([reporter] if reporter else []), return_exceptions=True)
+            for stage in [self.source] + self.stages:
+                stage.executor.shutdown(wait=False)
+        return self.snapshot()
+
+
+def print_snapshot(snapshot: Dict[str, Dict[str, Any]]) -> None:
+    """Print a one-line-per-stage summary of a Pipeline.snapshot()"""
+    print("Pipeline stats:")
+    for name, s in snapshot.items():
+        print(f"  {name:<10} processed={s['processed']:<7} dropped={s['dropped']:<6} errors={s['errors']:<4} "
+              f"requeued={s['requeued']:<4} "
+              f"rate={s['throughput_per_sec']:.2f}/s queue={s['queue_depth']}/{s['queue_capacity']} "
+              f"busy={s['busy_workers']}/{s['workers']} util={s['utilization']:.0%}")
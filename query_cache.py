@@ -0,0 +1,126 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import bson
+from bson import json_util
+
+
+def query_key(query: Optional[Dict[str, Any]], page: int, per_page: int,
+              projection: Optional[Dict[str, Any]] = None, anchor: Any = None) -> str:
+    """Normalized key of one dashboard page read
+
+    Key order inside the query and projection doesn't matter, and BSON types
+    (ObjectId, dates, regexes) are encoded as Extended JSON so equal queries
+    from different sessions share an entry.
+
+    Args:
+        query: Mongo filter as the user entered it
+        page: Page number
+        per_page: Documents per page
+        projection: Fields returned
+        anchor: Keyset cursor the page starts after, if any
+
+    Returns:
+        Canonical JSON string
+    """
+    return json_util.dumps([query or {}, page, per_page, projection or {}, anchor], sort_keys=True,
+                           separators=(",", ":"))
+
+
+def result_size(value: Any) -> int:
+    """Approximate bytes held by a cached result (BSON size of its documents)"""
+    if isinstance(value, dict):
+        return len(bson.encode(value))
+    if isinstance(value, (list, tuple)):
+        return sum(result_size(item) for item in value) + 8 * len(value)
+    return 16
+
+
+class QueryResultCache:
+    """Shared LRU cache of query results invalidated by a collection watermark
+
+    Each entry remembers the collection watermark (see
+    MongoAdapter.collection_watermark) it was read at and how long the read
+    took. A lookup under a different watermark is stale and re-reads, so new
+    headlines show up on the next rerun without any explicit invalidation.
+    Entries are evicted least recently used first once their total size
+    passes max_bytes, and max_age_seconds bounds how long in-place updates
+    (which leave the watermark alone) can stay hidden.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_age_seconds: float = 300.0):
+        """Create a cache
+
+        Args:
+            max_bytes: Total approximate size of cached results
+            max_age_seconds: Age after which an entry is re-read even under the same watermark
+        """
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        # key -> (watermark, value, size, seconds the read took, cached at)
+        self._entries: "OrderedDict[Hashable, Tuple[Any, Any, int, float, float]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stale": 0, "evictions": 0, "saved_seconds": 0.0}
+
+    @property
+    def size_bytes(self) -> int:
+        """Approximate bytes currently cached"""
+        return self._bytes
+
+    @property
+    def hit_ratio(self) -> float:
+        """Share of lookups served from the cache"""
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def _drop(self, key: Hashable) -> None:
+        self._bytes -= self._entries.pop(key)[2]
+
+    def get(self, key: Hashable, watermark: Any) -> Tuple[bool, Any]:
+        """(True, value) when key was cached under watermark and is fresh, else (False, None)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                cached_watermark, value, _, seconds, cached_at = entry
+                if cached_watermark == watermark and time.time() - cached_at < self.max_age_seconds:
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    self.stats["saved_seconds"] += seconds
+                    return True, value
+                self._drop(key)
+                self.stats["stale"] += 1
+            self.stats["misses"] += 1
+            return False, None
+
+    def put(self, key: Hashable, watermark: Any, value: Any, seconds: float = 0.0) -> None:
+        """Cache value read under watermark; seconds is what the read cost, credited on each hit"""
+        size = result_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (watermark, value, size, seconds, time.time())
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+
+    def get_or_compute(self, key: Hashable, watermark: Any, compute: Callable[[], Any]) -> Any:
+        """Cached value of key under watermark, calling compute() (timed) on a miss"""
+        hit, value = self.get(key, watermark)
+        if hit:
+            return value
+        start = time.perf_counter()
+        value = compute()
+        self.put(key, watermark, value, time.perf_counter() - start)
+        return value
+
+    def clear(self) -> None:
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
@@ -1,5 +1,22 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict
+from typing import ClassVar, List, Optional, Dict
+
+
+def tickers_from_tags(tags: List[Dict]) -> List[str]:
+    """Extract tickers from feed tags with scheme "stock-symbol" (e.g. "NYS:BLK" -> "BLK")"""
+    tickers = []
+    for tag in tags or []:
+        if tag.get('scheme') != 'stock-symbol' or not tag.get('term'):
+            continue
+        ticker = tag['term'].split(':')[-1].strip().upper()
+        if ticker and ticker not in tickers:
+            tickers.append(ticker)
+    return tickers
+
+
+def tickers_from_symbol(symbol: Optional[str]) -> List[str]:
+    """Wrap an FMP "symbol" field (possibly empty or comma separated) as a ticker list"""
+    return [s.strip().upper() for s in (symbol or '').split(',') if s.strip()]
 
 
 class BloombergResponseObject(BaseModel):
@@ -8,6 +25,7 @@ class BloombergResponseObject(BaseModel):
     published: str = Field(default="", description="Publication date and time")
     summary: str = Field(default="", description="Summary of the article")
     source: str = Field(description="Source URL of the RSS feed")
+    tickers: List[str] = Field(default_factory=list, description="Tickers tagged by the feed itself")
     
     @classmethod
     def from_feed_entry(cls, entry: Dict, source_url: str) -> "BloombergResponseObject":
@@ -16,7 +34,8 @@ class BloombergResponseObject(BaseModel):
             link=entry.get('link', ''),
             published=entry.get('published', ''),
             summary=entry.get('summary', ''),
-            source=source_url
+            source=source_url,
+            tickers=tickers_from_tags(entry.get('tags', []))
         )
     
 
@@ -26,7 +45,8 @@ class FMPResponseObject(BaseModel):
     published: str = Field(default="", description="Publication date and time")
     summary: str = Field(default="", description="Summary of the article")
     source: str = Field(description="Source URL of the RSS feed")
-    sources_to_ignore: List[str] = ["zacks.com", "seekingalpha"]
+    tickers: List[str] = Field(default_factory=list, description="Tickers tagged by the feed itself")
+    sources_to_ignore: ClassVar[List[str]] = ["zacks.com", "seekingalpha"]
     
     @classmethod
     def from_feed_entry(cls, entry: Dict, source_url: str) -> "BloombergResponseObject":
@@ -39,7 +59,8 @@ class FMPResponseObject(BaseModel):
             link=entry.get('url', ''),
             published=entry.get('publishedDate', ''),
             summary=entry.get('text', ''),
-            source=source_url
+            source=source_url,
+            tickers=tickers_from_symbol(entry.get('symbol'))
         )
     
 
@@ -49,6 +70,7 @@ class FMPPressReleaseResponseObject(BaseModel):
     published: str = Field(default="", description="Publication date and time")
     summary: str = Field(default="", description="Summary of the article")
     source: str = Field(description="Source URL of the RSS feed")
+    tickers: List[str] = Field(default_factory=list, description="Tickers tagged by the feed itself")
     
     @classmethod
     def from_feed_entry(cls, entry: Dict, source_url: str) -> "BloombergResponseObject":    
@@ -57,7 +79,8 @@ class FMPPressReleaseResponseObject(BaseModel):
             link=entry.get('url', ''),
             published=entry.get('date', ''),
             summary=entry.get('text', ''),
-            source=source_url
+            source=source_url,
+            tickers=tickers_from_symbol(entry.get('symbol'))
         )
     
 
@@ -0,0 +1,275 @@
+import csv
+import json
+import re
+import threading
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Legal-form suffixes stripped to derive the short alias of a company name
+_COMPANY_SUFFIXES = (
+    "inc", "incorporated", "corp", "corporation", "co", "company", "ltd", "limited", "plc", "group",
+    "holdings", "holding", "sa", "ag", "nv", "se", "lp", "llc", "the",
+)
+_CASHTAG_RE = re.compile(r"\$([A-Z]{1,5}(?:\.[A-Z])?)\b")
+_EXCHANGE_TICKER_RE = re.compile(
+    r"\b(?:NYSE|NYS|NASDAQ|Nasdaq|NasdaqGS|NasdaqGM|AMEX|NYSEAMERICAN|OTC|OTCQX|TSX|LSE)\s*:\s*([A-Z]{1,5}(?:\.[A-Z])?)\b"
+)
+# A capitalized name followed by a legal-form suffix ("Vanguard Group Inc."): a company mention
+# even when the company isn't in the universe
+_COMPANY_MENTION_RE = re.compile(
+    r"((?:[A-Z][\w&'.-]*\s+){0,3}[A-Z][\w&'-]*),?\s+"
+    r"(?:Inc|Incorporated|Corp|Corporation|Co|Company|Ltd|Limited|PLC|plc|Group|Holdings|LLC|LP|SA|AG|NV|SE)(?![\w-])"
+)
+# Single-word company aliases that are also everyday words in headlines ("Inflation Target",
+# "Visa Applications", "Trade Gap"); a match on one of these alone is never taken as final
+COMMON_WORD_ALIASES = frozenset("""
+    alphabet american anthem apple ball block booking carnival carrier caterpillar coherent compass corning crown
+    delta dollar dover edge energy first fox frontier gap general global gold hess key lucid match mosaic nasdaq
+    national news nov oracle pool progressive public shell signature snap southern square state sun tapestry target
+    unity united visa waters
+""".split())
+
+
+def _normalize(text: str) -> str:
+    """Lowercase and blank out non-alphanumerics, keeping character offsets aligned with text"""
+    return "".join(ch.lower()[0] if ch.isalnum() else " " for ch in text)
+
+
+def company_aliases(name: str) -> Set[str]:
+    """Normalized aliases for a company name: the full name and the name without legal suffixes"""
+    words = _normalize(name).split()
+    aliases = {" ".join(words)} if words else set()
+    while words and words[-1] in _COMPANY_SUFFIXES:
+        words = words[:-1]
+    while words and words[0] == "the":
+        words = words[1:]
+    if words:
+        aliases.add(" ".join(words))
+    return aliases
+
+
+class AhoCorasick:
+    """Multi-pattern string matcher (Aho-Corasick automaton)
+
+    Matching is a single pass over the text regardless of how many patterns
+    are loaded.
+    """
+
+    def __init__(self, patterns: Iterable[Tuple[str, str]]):
+        """Build the automaton
+
+        Args:
+            patterns: (pattern, value) pairs; value is reported for each match
+        """
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, str]]] = [[]]
+        for pattern, value in patterns:
+            self._add(pattern, value)
+        self._build()
+
+    def _add(self, pattern: str, value: str) -> None:
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append((len(pattern), value))
+
+    def _build(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def iter_matches(self, text: str):
+        """Yield (start, end, value) for every pattern occurrence in text"""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for length, value in out[state]:
+                yield i - length + 1, i + 1, value
+
+
+class TickerUniverse:
+    """Known tickers with their company names and sectors"""
+
+    def __init__(self, companies: Optional[Iterable[Dict[str, str]]] = None):
+        """Create a universe
+
+        Args:
+            companies: Dicts with "symbol", "name" and optionally "sector"
+        """
+        self.names: Dict[str, str] = {}
+        self.sectors: Dict[str, str] = {}
+        for company in companies or []:
+            symbol = (company.get("symbol") or "").strip().upper()
+            if not symbol:
+                continue
+            self.names[symbol] = (company.get("name") or "").strip()
+            if company.get("sector"):
+                self.sectors[symbol] = company["sector"].strip()
+
+    @classmethod
+    def load(cls, path: str) -> "TickerUniverse":
+        """Load a universe from a CSV (symbol,name[,sector] header) or JSON list file"""
+        with open(path, newline="", encoding="utf-8") as f:
+            if path.lower().endswith(".json"):
+                return cls(json.load(f))
+            return cls(csv.DictReader(f))
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.names
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+class ExtractionResult:
+    """Locally extracted tickers/companies and whether they can be trusted without the LLM
+
+    candidates holds tickers of ambiguous company-name matches (a common
+    word like "Target"); they are not in tickers and leave the result
+    unconfident.
+    """
+
+    def __init__(self, tickers: List[str], companies: List[str], confident: bool, method: str,
+                 candidates: Optional[List[str]] = None):
+        self.tickers = tickers
+        self.companies = companies
+        self.confident = confident
+        self.method = method
+        self.candidates = candidates or []
+
+    def as_companies_tickers(self) -> Dict[str, List[str]]:
+        """Shape the result like determine_direct_ticker_companies_mentioned's output"""
+        return {"tickers_mentioned": self.tickers, "companies_mentioned": self.companies}
+
+    def __repr__(self) -> str:
+        return (f"ExtractionResult(tickers={self.tickers!r}, companies={self.companies!r}, "
+                f"confident={self.confident}, method={self.method!r}, candidates={self.candidates!r})")
+
+
+class LocalTickerExtractor:
+    """Dictionary-based extraction of directly mentioned tickers and companies
+
+    Three signals are combined: tickers tagged by the feed itself (Bloomberg
+    stock-symbol tags, FMP symbol fields), explicit ticker notation in the
+    text ($AAPL, NYSE: BLK) and company names from the universe found with an
+    Aho-Corasick matcher. Company-name matches must start with a capital
+    letter in the original text, so "price target" does not match Target.
+
+    That guard is useless on Title-Case headlines, so a name match only
+    counts when its alias is unambiguous: multi-word ("Target Corporation"),
+    or one word that isn't an everyday word (see COMMON_WORD_ALIASES).
+    Ambiguous matches are kept as candidates for the LLM to confirm.
+
+    The result is confident when the feed tagged tickers, or when explicit
+    tickers or unambiguous names were found and nothing points to a missed
+    company: no ambiguous candidates and no "<Name> Inc."-style mention of a
+    company outside the universe. Otherwise the caller should fall back to
+    the LLM.
+    """
+
+    def __init__(self, universe: Optional[TickerUniverse] = None,
+                 common_words: Iterable[str] = COMMON_WORD_ALIASES):
+        """Build the matcher
+
+        Args:
+            universe: Known tickers and company names
+            common_words: Single-word aliases treated as ambiguous
+        """
+        self.universe = universe or TickerUniverse()
+        self.common_words = frozenset(common_words)
+        self._aliases = {
+            alias: symbol
+            for symbol, name in self.universe.names.items()
+            for alias in company_aliases(name)
+        }
+        patterns = [(f" {alias} ", symbol) for alias, symbol in self._aliases.items()]
+        self._matcher = AhoCorasick(patterns) if patterns else None
+        self._lock = threading.Lock()
+        self.stats = {"local": 0, "llm_fallback": 0}
+
+    def _explicit_tickers(self, text: str) -> List[str]:
+        found = _CASHTAG_RE.findall(text) + _EXCHANGE_TICKER_RE.findall(text)
+        if len(self.universe):
+            found = [t for t in found if t in self.universe]
+        return found
+
+    def _company_matches(self, text: str) -> Tuple[List[str], List[str]]:
+        """(unambiguous, ambiguous) tickers of company names found in text"""
+        if self._matcher is None:
+            return [], []
+        padded = f" {text} "
+        normalized = _normalize(padded)
+        matches: Dict[str, bool] = {}
+        for start, end, symbol in self._matcher.iter_matches(normalized):
+            # Pattern includes the padding spaces; the name itself starts one char later
+            if not padded[start + 1].isupper():
+                continue
+            ambiguous = normalized[start + 1:end - 1] in self.common_words
+            matches[symbol] = matches.get(symbol, True) and ambiguous
+        return ([symbol for symbol, ambiguous in matches.items() if not ambiguous],
+                [symbol for symbol, ambiguous in matches.items() if ambiguous])
+
+    def _unknown_company_mentioned(self, text: str) -> bool:
+        """Whether text names a company with a legal suffix that no universe alias covers"""
+        for match in _COMPANY_MENTION_RE.finditer(text):
+            words = _normalize(match.group(1)).split()
+            # "Rivals BlackRock Inc." is resolved by its tail "blackrock"
+            if not any(" ".join(words[i:]) in self._aliases for i in range(len(words))):
+                return True
+        return False
+
+    def extract(self, title: str, summary: str, tagged_tickers: Optional[List[str]] = None) -> ExtractionResult:
+        """Extract tickers and companies from an entry
+
+        Args:
+            title: Entry title
+            summary: Entry summary
+            tagged_tickers: Tickers supplied by the feed for this entry
+
+        Returns:
+            ExtractionResult; confident is False when the LLM should check the entry
+        """
+        text = f"{title}\n{summary}"
+        tickers: List[str] = []
+        methods = []
+        dictionary, ambiguous = self._company_matches(text)
+        for source, found in (("feed_tags", tagged_tickers or []),
+                              ("explicit", self._explicit_tickers(text)),
+                              ("dictionary", dictionary)):
+            new = [t for t in found if t not in tickers]
+            if new:
+                methods.append(source)
+                tickers.extend(new)
+        candidates = [t for t in ambiguous if t not in tickers]
+
+        companies = [self.universe.names[t] for t in tickers if self.universe.names.get(t)]
+        # Feed tags are authoritative; anything else must leave nothing unexplained
+        confident = bool(tagged_tickers) or (
+            bool(tickers) and not candidates and not self._unknown_company_mentioned(text)
+        )
+        with self._lock:
+            self.stats["local" if confident else "llm_fallback"] += 1
+        return ExtractionResult(tickers, companies, confident, "+".join(methods) or "none", candidates)
+
+    def llm_avoided_ratio(self) -> float:
+        """Fraction of extractions answered locally without the LLM"""
+        total = self.stats["local"] + self.stats["llm_fallback"]
+        return self.stats["local"] / total if total else 0.0
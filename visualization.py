@@ -0,0 +1,262 @@
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+import networkx as nx
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+
+def build_analysis_graph(analysis: Dict[str, Any]) -> nx.DiGraph:
+    """Graph of an analyzed headline: root (orange) -> questions (blue) -> ticker answers (plum)
+
+    Node positions are stored in the "pos" attribute and colors in "color".
+    """
+    G = nx.DiGraph()
+
+    title = str(analysis.get('title', ''))
+    companies = (analysis.get('companies_tickers') or {}).get('companies_mentioned', [])
+    companies_str = ', '.join(companies) if companies else 'No companies mentioned'
+    root_text = f"{title}\n{companies_str}"
+    G.add_node(root_text, pos=(0, 0), color='orange')
+
+    qa_pairs = analysis.get('question_and_answers') or []
+    num_questions = len(qa_pairs)
+    vertical_spacing = 4.0
+    for i, qa in enumerate(qa_pairs):
+        # Questions are centered vertically around the root
+        y_pos = ((num_questions - 1) / 2 - i) * vertical_spacing
+        question = str(qa.get('question', {}))
+        G.add_node(question, pos=(2, y_pos), color='lightblue')
+        G.add_edge(root_text, question)
+
+        answers = qa.get('answer') or []
+        num_answers = len(answers)
+        for j, answer in enumerate(answers):
+            answer_y = y_pos + (j - (num_answers - 1) / 2) * (vertical_spacing / 3)
+            answer_text = f"{answer.get('symbol', '')}\n{answer.get('reasoning', '')}"
+            G.add_node(answer_text, pos=(4, answer_y), color='plum')
+            G.add_edge(question, answer_text)
+    return G
+
+
+def analysis_content_hash(analysis: Dict[str, Any]) -> str:
+    """Hash of the fields the graph is drawn from, so edits to a document invalidate its render"""
+    content = {
+        "title": analysis.get('title', ''),
+        "companies_tickers": analysis.get('companies_tickers') or {},
+        "question_and_answers": analysis.get('question_and_answers') or [],
+    }
+    return hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+def render_analysis_png(analysis: Dict[str, Any], dpi: int = 100) -> bytes:
+    """Rasterize the analysis graph to PNG
+
+    Uses a standalone Agg Figure rather than pyplot, so renders are safe to
+    run concurrently on worker threads.
+    """
+    G = build_analysis_graph(analysis)
+    pos = nx.get_node_attributes(G, 'pos')
+    colors = [G.nodes[node]['color'] for node in G.nodes()]
+
+    fig = Figure(figsize=(20, 15))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    nx.draw(G, pos, ax=ax,
+            node_color=colors,
+            node_size=8000,
+            font_size=7,
+            font_weight='bold',
+            arrows=True,
+            edge_color='gray',
+            width=2,
+            arrowsize=20,
+            with_labels=True,
+            bbox=dict(facecolor='white', edgecolor='none', alpha=0.7))
+    ax.margins(0.2)
+    ax.set_title(f"Analysis Visualization: {str(analysis.get('title', ''))[:50]}...")
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', bbox_inches='tight', dpi=dpi)
+    return buf.getvalue()
+
+
+def analysis_graph_json(analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """Nodes (label, position, color) and edges of the analysis graph for a client-side renderer"""
+    G = build_analysis_graph(analysis)
+    ids = {node: i for i, node in enumerate(G.nodes())}
+    return {
+        "nodes": [
+            {"id": ids[node], "label": node, "x": data['pos'][0], "y": data['pos'][1], "color": data['color']}
+            for node, data in G.nodes(data=True)
+        ],
+        "edges": [{"source": ids[u], "target": ids[v]} for u, v in G.edges()],
+    }
+
+
+_GRAPH_HTML = """<div id="graph" style="width:100%;height:{height}px;border:1px solid #eee"></div>
+<script>
+const graph = {graph};
+const colors = {{orange: "#ffa500", lightblue: "#add8e6", plum: "#dda0dd"}};
+const svgNS = "http://www.w3.org/2000/svg";
+const el = document.getElementById("graph");
+const svg = document.createElementNS(svgNS, "svg");
+svg.setAttribute("width", "100%");
+svg.setAttribute("height", "100%");
+el.appendChild(svg);
+const xs = graph.nodes.map(n => n.x), ys = graph.nodes.map(n => n.y);
+const minX = Math.min(...xs), maxX = Math.max(...xs), minY = Math.min(...ys), maxY = Math.max(...ys);
+const W = 1000, H = Math.max(400, (maxY - minY) * 60 + 120);
+let view = [0, 0, W, H];
+svg.setAttribute("viewBox", view.join(" "));
+const px = x => 110 + (maxX > minX ? (x - minX) / (maxX - minX) : 0.5) * (W - 220);
+const py = y => 60 + (maxY > minY ? (maxY - y) / (maxY - minY) : 0.5) * (H - 120);
+for (const e of graph.edges) {{
+  const s = graph.nodes[e.source], t = graph.nodes[e.target];
+  const line = document.createElementNS(svgNS, "line");
+  line.setAttribute("x1", px(s.x)); line.setAttribute("y1", py(s.y));
+  line.setAttribute("x2", px(t.x)); line.setAttribute("y2", py(t.y));
+  line.setAttribute("stroke", "gray"); line.setAttribute("stroke-width", 1.5);
+  svg.appendChild(line);
+}}
+for (const n of graph.nodes) {{
+  const g = document.createElementNS(svgNS, "g");
+  const title = document.createElementNS(svgNS, "title");
+  title.textContent = n.label;
+  const rect = document.createElementNS(svgNS, "rect");
+  rect.setAttribute("x", px(n.x) - 100); rect.setAttribute("y", py(n.y) - 16);
+  rect.setAttribute("width", 200); rect.setAttribute("height", 32); rect.setAttribute("rx", 8);
+  rect.setAttribute("fill", colors[n.color] || n.color);
+  const text = document.createElementNS(svgNS, "text");
+  text.setAttribute("x", px(n.x)); text.setAttribute("y", py(n.y) + 4);
+  text.setAttribute("text-anchor", "middle"); text.setAttribute("font-size", 10);
+  text.setAttribute("font-family", "sans-serif");
+  const first = n.label.split("\\n")[0];
+  text.textContent = first.length > 38 ? first.slice(0, 36) + "..." : first;
+  g.append(title, rect, text);
+  svg.appendChild(g);
+}}
+// Wheel zooms around the cursor; hover a node for its full text
+svg.addEventListener("wheel", ev => {{
+  ev.preventDefault();
+  const k = ev.deltaY > 0 ? 1.1 : 0.9, r = svg.getBoundingClientRect();
+  const cx = view[0] + (ev.clientX - r.left) / r.width * view[2];
+  const cy = view[1] + (ev.clientY - r.top) / r.height * view[3];
+  view = [cx - (cx - view[0]) * k, cy - (cy - view[1]) * k, view[2] * k, view[3] * k];
+  svg.setAttribute("viewBox", view.join(" "));
+}});
+</script>"""
+
+
+def analysis_graph_html(analysis: Dict[str, Any], height: int = 600) -> str:
+    """Self-contained HTML/SVG page drawing the analysis graph in the browser, no server-side rendering"""
+    graph = json.dumps(analysis_graph_json(analysis)).replace("</", "<\\/")
+    return _GRAPH_HTML.format(graph=graph, height=height)
+
+
+class VisualizationCache:
+    """LRU cache of rendered graphs keyed by (document id, content hash), optionally backed by a directory"""
+
+    def __init__(self, max_memory_entries: int = 128, directory: Optional[str] = None):
+        """Create a cache
+
+        Args:
+            max_memory_entries: Renders kept in memory
+            directory: Directory renders are also written to and read back from, None for memory only
+        """
+        self.max_memory_entries = max_memory_entries
+        self.directory = directory
+        self._memory: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: Tuple[str, str]) -> str:
+        doc_id, content_hash = key
+        safe_id = "".join(ch if ch.isalnum() else "_" for ch in doc_id)
+        return os.path.join(self.directory, f"{safe_id}-{content_hash}.png")
+
+    def _remember(self, key: Tuple[str, str], image: bytes) -> None:
+        self._memory[key] = image
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: Tuple[str, str]) -> Optional[bytes]:
+        with self._lock:
+            image = self._memory.get(key)
+            if image is not None:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return image
+        if self.directory and os.path.exists(self._path(key)):
+            with open(self._path(key), "rb") as f:
+                image = f.read()
+            with self._lock:
+                self._remember(key, image)
+                self.stats["disk_hits"] += 1
+            return image
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def put(self, key: Tuple[str, str], image: bytes) -> None:
+        with self._lock:
+            self._remember(key, image)
+        if self.directory:
+            tmp_path = self._path(key) + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(image)
+            os.replace(tmp_path, self._path(key))
+
+
+class VisualizationRenderer:
+    """Renders analysis graphs on a worker pool, serving repeats from a VisualizationCache
+
+    Concurrent requests for the same document and content share one render.
+    """
+
+    def __init__(self, cache: Optional[VisualizationCache] = None, max_workers: int = 2, dpi: int = 100):
+        self.cache = cache or VisualizationCache()
+        self.dpi = dpi
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="viz-render")
+        self._in_flight: Dict[Tuple[str, str], Future] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(doc_id: Any, analysis: Dict[str, Any]) -> Tuple[str, str]:
+        return str(doc_id), analysis_content_hash(analysis)
+
+    def _render(self, key: Tuple[str, str], analysis: Dict[str, Any]) -> bytes:
+        try:
+            image = render_analysis_png(analysis, dpi=self.dpi)
+            self.cache.put(key, image)
+            return image
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def submit(self, doc_id: Any, analysis: Dict[str, Any]) -> Future:
+        """Future resolving to the PNG bytes of the analysis graph; already resolved on a cache hit"""
+        key = self.key(doc_id, analysis)
+        image = self.cache.get(key)
+        if image is not None:
+            future: Future = Future()
+            future.set_result(image)
+            return future
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is None:
+                future = self._executor.submit(self._render, key, analysis)
+                self._in_flight[key] = future
+            return future
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
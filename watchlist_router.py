@@ -0,0 +1,148 @@
+import json
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+
+from ticker_extractor import TickerUniverse, company_aliases
+
+
+def entry_symbols(entry: Dict) -> Set[str]:
+    """Tickers of an analyzed entry: directly mentioned ones and those named in the answers"""
+    symbols = set((entry.get("companies_tickers") or {}).get("tickers_mentioned") or [])
+    symbols.update(entry.get("tickers") or [])
+    for qa in entry.get("question_and_answers") or []:
+        for answer in qa.get("answer") or []:
+            if isinstance(answer, dict) and answer.get("symbol"):
+                symbols.add(answer["symbol"])
+    return {symbol.strip().upper() for symbol in symbols if isinstance(symbol, str) and symbol.strip()}
+
+
+class Subscriber:
+    """A digest recipient and the tickers, companies and sectors they follow"""
+
+    def __init__(self, email: str, tickers: Iterable[str] = (), companies: Iterable[str] = (),
+                 sectors: Iterable[str] = (), all_headlines: bool = False):
+        """Create a subscriber
+
+        Args:
+            email: Address the personalised digest is sent to
+            tickers: Ticker symbols to follow
+            companies: Company names to follow, matched on their normalized aliases
+            sectors: Sectors to follow, matched through the ticker universe
+            all_headlines: Receive every headline regardless of the watchlists
+        """
+        self.email = email
+        self.tickers = {t.strip().upper() for t in tickers if t.strip()}
+        self.companies = {alias for name in companies for alias in company_aliases(name)}
+        self.sectors = {s.strip().lower() for s in sectors if s.strip()}
+        self.all_headlines = all_headlines
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Subscriber":
+        return cls(data["email"], data.get("tickers", ()), data.get("companies", ()),
+                   data.get("sectors", ()), data.get("all_headlines", False))
+
+    def __repr__(self) -> str:
+        return (f"Subscriber({self.email!r}, tickers={len(self.tickers)}, companies={len(self.companies)}, "
+                f"sectors={len(self.sectors)}, all_headlines={self.all_headlines})")
+
+
+class WatchlistRouter:
+    """Routes analyzed entries to the subscribers whose watchlists they match
+
+    Watchlists are kept as inverted indexes (ticker -> subscribers, company
+    alias -> subscribers, sector -> subscribers), so matching an entry costs
+    one lookup per symbol, company and sector it mentions plus the size of
+    the matching posting lists, independent of how many subscribers there are.
+    """
+
+    def __init__(self, subscribers: Iterable[Subscriber] = (), universe: Optional[TickerUniverse] = None):
+        """Create a router
+
+        Args:
+            subscribers: Initial subscribers
+            universe: Ticker universe used to map tickers to sectors
+        """
+        self.universe = universe or TickerUniverse()
+        self._sectors = {symbol: sector.lower() for symbol, sector in self.universe.sectors.items()}
+        self._subscribers: Dict[str, Subscriber] = {}
+        self._by_ticker: Dict[str, Set[str]] = {}
+        self._by_company: Dict[str, Set[str]] = {}
+        self._by_sector: Dict[str, Set[str]] = {}
+        self._all_headlines: Set[str] = set()
+        self._lock = threading.Lock()
+        for subscriber in subscribers:
+            self.add_subscriber(subscriber)
+
+    @classmethod
+    def load(cls, path: str, universe: Optional[TickerUniverse] = None) -> "WatchlistRouter":
+        """Load subscribers from a JSON list of {"email", "tickers", "companies", "sectors", "all_headlines"}"""
+        with open(path, encoding="utf-8") as f:
+            return cls((Subscriber.from_dict(item) for item in json.load(f)), universe)
+
+    def _index(self, subscriber: Subscriber, add: bool) -> None:
+        for index, keys in ((self._by_ticker, subscriber.tickers),
+                            (self._by_company, subscriber.companies),
+                            (self._by_sector, subscriber.sectors)):
+            for key in keys:
+                if add:
+                    index.setdefault(key, set()).add(subscriber.email)
+                else:
+                    postings = index.get(key)
+                    if postings is not None:
+                        postings.discard(subscriber.email)
+                        if not postings:
+                            del index[key]
+        if subscriber.all_headlines:
+            (self._all_headlines.add if add else self._all_headlines.discard)(subscriber.email)
+
+    def add_subscriber(self, subscriber: Subscriber) -> None:
+        """Add a subscriber, replacing any existing one with the same email"""
+        with self._lock:
+            previous = self._subscribers.pop(subscriber.email, None)
+            if previous is not None:
+                self._index(previous, add=False)
+            self._subscribers[subscriber.email] = subscriber
+            self._index(subscriber, add=True)
+
+    def remove_subscriber(self, email: str) -> None:
+        """Remove a subscriber if present"""
+        with self._lock:
+            subscriber = self._subscribers.pop(email, None)
+            if subscriber is not None:
+                self._index(subscriber, add=False)
+
+    def match(self, entry: Dict) -> Set[str]:
+        """Emails of the subscribers an analyzed entry should be sent to"""
+        symbols = entry_symbols(entry)
+        companies = {
+            alias
+            for name in (entry.get("companies_tickers") or {}).get("companies_mentioned") or []
+            if isinstance(name, str)
+            for alias in company_aliases(name)
+        }
+        sectors = {self._sectors[symbol] for symbol in symbols if symbol in self._sectors}
+
+        with self._lock:
+            matched = set(self._all_headlines)
+            for index, keys in ((self._by_ticker, symbols), (self._by_company, companies),
+                                (self._by_sector, sectors)):
+                for key in keys:
+                    postings = index.get(key)
+                    if postings:
+                        matched |= postings
+        return matched
+
+    def route(self, entries: List[Dict]) -> Dict[str, List[Dict]]:
+        """Group entries by the subscribers they match
+
+        Returns:
+            Email -> matching entries, in their original order; subscribers without matches are left out
+        """
+        routed: Dict[str, List[Dict]] = {}
+        for entry in entries:
+            for email in self.match(entry):
+                routed.setdefault(email, []).append(entry)
+        return routed
+
+    def __len__(self) -> int:
+        return len(self._subscribers)